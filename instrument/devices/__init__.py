@@ -13,6 +13,7 @@ from .data_management import *
 
 #import generic devices 
 from .generic_motors import *
+from .lazy_device import *
 from .ad_plugin_classes import *
 from .ad_make_dets import *
 from .ad_make_dets import *
@@ -25,9 +26,14 @@ from .s1id_slits import *
 
 #import soft devices
 from .s1id_FPGAs import *
-#from .pso_fly_device import *
+from .pso_fly_device import *
+from .live_ic import *
+from .image_stats import *
 
 #import measurement devices
+#area detector IOCs are contacted concurrently, within one startup deadline;
+#offline detectors become placeholders (see `show_det_startup()`)
+import_det_modules(__name__, ["ge_panels", "retiga", "pixiradv2", "pointgrey", "varex", "pilatus"])
 # from .s1ide_scalers import *
 # rom .flir_oryx import *   #currently only at 20-ID
 from .ge_panels import *
@@ -6,11 +6,22 @@ objects themselves; see `DETECTOR.py` files for generation.
 `find_det_version()` tries to automatically find the version of ADcore
 that the det is running; starting up a different version of a det IOC
 should therefore be accommodated without additional work by 
-Bluesky user. 
+Bluesky user. The version found is kept in `adcore_versions` (a JSON file,
+`ADCORE_VERSION_CACHE` in iconfig); while an entry is fresh
+(`ADCORE_VERSION_TTL`), `make_det()` uses it right away, only checking
+that the IOC answers at all (`DET_CONNECTION_CHECK_TIMEOUT`), and reads
+the live version in the background. If the version changed to one that
+needs other plugin classes, it warns; re-run `make_det()` (or restart the
+session) to rebuild the detector.
 
 Blueprints take into account whether dets run on WIN or LIN machines;
 this changes the structure of the read and write paths. Paths generated
 by `make_WIN_paths()` and `make_LIN_paths()`.
+
+Detector classes are memoized by `make_det_class()`: detectors with the
+same cam, ADcore plugin classes, mixin and plugin set share one class, and
+their paths (`READ_PATH`, `WRITE_PATH`) and plugin control dictionaries
+are instance attributes.
  
 Custom plugin classes are generated by .ad_plugin_classes, and 
 `ad_plugin_classes.py` must be contained in the same folder. 
@@ -26,6 +37,12 @@ FIXME: Win/Lin path formulations don't work for all detectors
 
 __all__ = [
     "make_det",
+    "make_dets",
+    "OfflineDetector",
+    "import_det_modules",
+    "show_det_startup",
+    "ADCoreVersionCache",
+    "adcore_versions",
 ]
 
 #import for logging
@@ -35,6 +52,9 @@ logger.info(__file__)
 
 #import custom plugin classes
 from .ad_plugin_classes import *
+from .lazy_device import LazyDevice
+from .config_cache import ConfigCache
+from .config_cache import DiffStagingMixin
 
 #import from ophyd
 from ophyd import EpicsSignal
@@ -45,10 +65,252 @@ from ophyd import ADComponent
 #import other stuff
 import os
 import bluesky.plan_stubs as bps
+import concurrent.futures
+import datetime
+import importlib
+import json
+import pathlib
+import pyRestTable
+import threading
+import time
+from contextlib import contextmanager
+from .. import iconfig
+
+
+#one deadline for constructing all area detectors at startup (seconds), started once
+#per session by the first `import_det_modules()` or `make_dets()` call and applied to
+#the calls made within them (see `_startup_scope()`); detectors not ready by then
+#become `LazyDevice` proxies that retry in the background
+DET_STARTUP_DEADLINE = iconfig.get("DET_STARTUP_DEADLINE", 30)
+_startup_deadline = None
+_startup = threading.local()     #.active: this thread works for the startup
+
+#seconds `make_det()` waits for the IOC when the ADcore version comes from the cache
+DET_CONNECTION_CHECK_TIMEOUT = iconfig.get("DET_CONNECTION_CHECK_TIMEOUT", 2.0)
+
+#device name -> dict(prefix, status, seconds, reason), see `show_det_startup()`
+DET_STARTUP = {}
+_startup_lock = threading.Lock()
+
+
+def _start_deadline():
+    """Start the startup deadline clock, once per session. Returns True if
+    this call started it, i.e. it is the startup."""
+    global _startup_deadline
+    with _startup_lock:
+        if _startup_deadline is not None:
+            return False
+        _startup_deadline = time.monotonic() + DET_STARTUP_DEADLINE
+        return True
+
+
+def _in_startup():
+    return getattr(_startup, "active", False)
+
+
+@contextmanager
+def _startup_scope(active = True):
+    """Apply the startup deadline to this thread's calls (if `active`)."""
+    previous = _in_startup()
+    _startup.active = previous or active
+    try:
+        yield
+    finally:
+        _startup.active = previous
+
+
+def _remaining():
+    """Seconds left before the startup deadline (0 once it has passed) for
+    calls made during startup; None otherwise, so later calls (re-running
+    `make_det()`, `LazyDevice` retries) use the normal timeouts."""
+    if _startup_deadline is None or not _in_startup():
+        return None
+    return max(_startup_deadline - time.monotonic(), 0.0)
+
+
+def _log_startup(name, prefix, status, t0, reason = None):
+    with _startup_lock:
+        DET_STARTUP[name] = dict(prefix = prefix, status = status, seconds = time.monotonic() - t0, reason = reason)
+
+
+class OfflineDetector(object):
+    """
+    Placeholder for an area detector that could not be created at
+    startup (IOC not reachable or startup deadline passed).
+
+    It is falsy, so `if det:` checks still work, and any attribute access
+    raises an `AttributeError` naming the detector. Re-run its `make_det()`
+    once the IOC is up.
+    """
+
+    def __init__(self, name, prefix, reason):
+        self.name = name
+        self.prefix = prefix
+        self.reason = reason
+        self.connected = False
+
+    def __bool__(self):
+        return False
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(name={self.name!r}, prefix={self.prefix!r}, reason={self.reason!r})"
+
+    def __getattr__(self, attr):
+        raise AttributeError(f"{self.name} ({self.prefix}) is offline: {self.reason}. Re-create it once the IOC is up.")
+
+class ADCoreVersionCache(object):
+    """
+    ADcore version of each detector IOC (by prefix), kept on disk so
+    `make_det()` can pick the plugin classes without waiting for the IOC.
+    
+    An entry is trusted for `ttl` seconds after it was last verified;
+    `make_det()` checks the live version in the background either way.
+    
+    PARAMETERS
+    
+    path *str or pathlib.Path* :
+        JSON file of the cache (created on first write).
+        
+    ttl *float* :
+        Seconds an entry is used without reading the IOC first. (default : 7 days)
+    """
+    
+    def __init__(self, path, ttl = 7*24*3600):
+        self.path = pathlib.Path(path)
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = None
+        
+    def _load(self):
+        if self._entries is None:
+            try:
+                self._entries = json.loads(self.path.read_text())
+            except FileNotFoundError:
+                self._entries = {}
+            except ValueError:
+                logger.warning(f"Could not parse {self.path}, starting with an empty ADcore version cache.")
+                self._entries = {}
+        return self._entries
+    
+    def _save(self):
+        self.path.parent.mkdir(parents = True, exist_ok = True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self._entries, indent = 2, sort_keys = True))
+        tmp.replace(self.path)  #atomic, so a crash never leaves half a file
+        
+    def get(self, det_prefix):
+        """Cache entry (dict with "version", "verified", "date") or None."""
+        with self._lock:
+            entry = self._load().get(det_prefix)
+        return dict(entry) if entry is not None else None
+    
+    def cached_version(self, det_prefix):
+        """Cached ADcore version of `det_prefix` if verified within `ttl`, else None."""
+        entry = self.get(det_prefix)
+        if entry is None or time.time() - entry["verified"] > self.ttl:
+            return None
+        return entry["version"]
+    
+    def set(self, det_prefix, version):
+        """Record `version` as just verified for `det_prefix`."""
+        with self._lock:
+            self._load()[det_prefix] = dict(
+                version = version,
+                verified = time.time(),
+                date = datetime.datetime.now().isoformat(timespec = "seconds"),
+            )
+            try:
+                self._save()
+            except OSError as exinfo:
+                logger.warning(f"Could not write {self.path}: {exinfo}")
+            
+    def forget(self, det_prefix = None):
+        """Remove the entry of `det_prefix`, or all entries."""
+        with self._lock:
+            if det_prefix is None:
+                self._load().clear()
+            else:
+                self._load().pop(det_prefix, None)
+            self._save()
+            
+    def show(self):
+        """Print the cached versions as a table."""
+        table = pyRestTable.Table()
+        table.labels = ["prefix", "ADcore", "verified", "fresh"]
+        with self._lock:
+            entries = dict(self._load())
+        for prefix, entry in sorted(entries.items()):
+            fresh = time.time() - entry["verified"] <= self.ttl
+            table.addRow([prefix, entry["version"], entry["date"], fresh])
+        print(table)
+        
+        
+def _get_version_cache_path():
+    path = iconfig.get("ADCORE_VERSION_CACHE")
+    if path is None:
+        path = pathlib.Path.home() / ".config" / "Bluesky_adcore_versions.json"
+    return pathlib.Path(path)
+
+
+adcore_versions = ADCoreVersionCache(
+    _get_version_cache_path(), 
+    ttl = iconfig.get("ADCORE_VERSION_TTL", 7*24*3600),
+)
+
+
+def read_adcore_version(det_prefix, timeout = None):
+    """ 
+    Read the ADcore version of a detector IOC from its ADCoreVersion PV
+    (e.g., '3.2.1'). Old IOCs without that PV are assumed to be v1.9.1.
+    
+    PARAMETERS 
+    
+    det_prefix *str* : 
+        IOC prefix of the detector; must end with ":". (example : "s1_pixirad2:")
+        
+    timeout *float or None* :
+        Connection timeout in seconds. If None, the default of EpicsSignal.
+        (default : None)
+    
+    Raises `TimeoutError` if the IOC is not reachable at all.
+    """
+    
+    kwargs = dict(connection_timeout = timeout) if timeout else {}
+    try:
+        #first try to connect to ADCoreVersion PV
+        adcore_pv = det_prefix + "cam1:ADCoreVersion_RBV"
+        adcore_version = EpicsSignal(adcore_pv, name = "adcore_version")
+        version = adcore_version.get(**kwargs) #returns something that looks like '3.2.1'
+    
+    except TimeoutError: #as exinfo:
+        #old IOCs have no ADCoreVersion PV; only assume v1.9 if the cam answers at all
+        acquire = EpicsSignal(det_prefix + "cam1:Acquire", name = "acquire")
+        try:
+            acquire.get(connection_timeout = 1.0)
+        except TimeoutError:
+            raise TimeoutError(f"{det_prefix} IOC is not reachable.")
+        version = '1.9.1'
+        logger.warning(f"Finding {det_prefix} AD version timed out. Assuming mininum version 1.9.")
+        
+    return version
+
+
+def _check_ioc(det_prefix, timeout):
+    """Raise `TimeoutError` unless the cam of `det_prefix` connects within `timeout` s."""
+    acquire = EpicsSignal(det_prefix + "cam1:Acquire", name = "acquire")
+    try:
+        acquire.wait_for_connection(timeout = timeout)
+    except TimeoutError:
+        raise TimeoutError(f"{det_prefix} IOC is not reachable.")
+    finally:
+        acquire.destroy()
+
 
 #try to find ADcore version of det
 def find_det_version(
-    det_prefix
+    det_prefix,
+    timeout = None,
+    version = None,
 ):
     
     """ 
@@ -62,64 +324,66 @@ def find_det_version(
     
     det_prefix *str* : 
         IOC prefix of the detector; must end with ":". (example : "s1_pixirad2:")
-    """
+        
+    timeout *float or None* :
+        Connection timeout in seconds. If None, the default of EpicsSignal.
+        (default : None)
+        
+    version *str or None* :
+        ADcore version to use (e.g., from `adcore_versions`). If None, it is 
+        read from the IOC and recorded in `adcore_versions`. (default : None)
     
-    try:
-        #first try to connect to ADCoreVersion PV
-        adcore_pv = det_prefix + "cam1:ADCoreVersion_RBV"
-        adcore_version = EpicsSignal(adcore_pv, name = "adcore_version")
-        version = adcore_version.get() #returns something that looks like '3.2.1'
+    Raises `TimeoutError` if the IOC is not reachable at all.
+    """
     
-    except TimeoutError: #as exinfo: #TODO: add check if IOC is running to make error more specific
-        version = '1.9.1'
-        logger.warning(f"Finding {det_prefix} AD version timed out. Assuming mininum version 1.9.")
+    if version is None:
+        version = read_adcore_version(det_prefix, timeout = timeout)
+        adcore_versions.set(det_prefix, version)
         
-    
-    finally: 
-        #after trying and excepting, select the plugin versions needed
-        version_bits = version.split('.')
-        if version_bits[0] == '1' and version_bits[1] == '9':   #for v1.9
-            Det_CamBase = MPE_CamBase
-            Det_ImagePlugin = MPE_ImagePlugin
-            Det_PvaPlugin = MPE_PvaPlugin
-            Det_ProcessPlugin = MPE_ProcessPlugin
-            Det_TransformPlugin = MPE_TransformPlugin
-            Det_OverlayPlugin = MPE_OverlayPlugin
-            Det_ROIPlugin = MPE_ROIPlugin
-            Det_TIFFPlugin = MPE_TIFFPlugin
-            Det_HDF5Plugin = MPE_HDF5Plugin
-            #logger.info('Using vanilla plugins.')
-            
-        elif version_bits[0] == '3' and any(x == version_bits[1] for x in ['1', '2', '3']): #for versions '3.1','3.2','3.3'
-            Det_CamBase = MPE_CamBase_V31
-            Det_ImagePlugin = MPE_ImagePlugin_V31
-            Det_PvaPlugin = MPE_PvaPlugin_V31
-            Det_ProcessPlugin = MPE_ProcessPlugin_V31
-            Det_TransformPlugin = MPE_TransformPlugin_V31
-            Det_OverlayPlugin = MPE_OverlayPlugin_V31
-            Det_ROIPlugin = MPE_ROIPlugin_V31
-            Det_TIFFPlugin = MPE_TIFFPlugin_V31
-            Det_HDF5Plugin = MPE_HDF5Plugin_V31
-            #logger.info("Using V31 plugins.")
-            
-        elif version_bits[0] == '3' and not any(x == version_bits[1] for x in ['1','2','3']):  #for versions '3.4' and higher
-            Det_CamBase = MPE_CamBase_V34
-            Det_ImagePlugin = MPE_ImagePlugin_V34
-            Det_PvaPlugin = MPE_PvaPlugin_V34
-            Det_ProcessPlugin = MPE_ProcessPlugin_V34
-            Det_TransformPlugin = MPE_TransformPlugin_V34
-            Det_OverlayPlugin = MPE_OverlayPlugin_V34
-            Det_ROIPlugin = MPE_ROIPlugin_V34
-            Det_TIFFPlugin = MPE_TIFFPlugin_V34
-            Det_HDF5Plugin = MPE_HDF5Plugin_V34
-            #logger.info('Using V34 plugins.')    
-                
-        else:
-            raise ValueError(f"""MPE custom plugins have not been generated for this version of ADcore = {version}. 
-                             Are you running the correct IOC version for {det_prefix}?""")
+    #select the plugin versions needed
+    version_bits = version.split('.')
+    if version_bits[0] == '1' and version_bits[1] == '9':   #for v1.9
+        Det_CamBase = MPE_CamBase
+        Det_ImagePlugin = MPE_ImagePlugin
+        Det_PvaPlugin = MPE_PvaPlugin
+        Det_ProcessPlugin = MPE_ProcessPlugin
+        Det_TransformPlugin = MPE_TransformPlugin
+        Det_OverlayPlugin = MPE_OverlayPlugin
+        Det_ROIPlugin = MPE_ROIPlugin
+        Det_TIFFPlugin = MPE_TIFFPlugin
+        Det_HDF5Plugin = MPE_HDF5Plugin
+        #logger.info('Using vanilla plugins.')
         
-        logger.info(f"Trying detector with prefix {det_prefix}, using ADcore v{version}.")  
+    elif version_bits[0] == '3' and any(x == version_bits[1] for x in ['1', '2', '3']): #for versions '3.1','3.2','3.3'
+        Det_CamBase = MPE_CamBase_V31
+        Det_ImagePlugin = MPE_ImagePlugin_V31
+        Det_PvaPlugin = MPE_PvaPlugin_V31
+        Det_ProcessPlugin = MPE_ProcessPlugin_V31
+        Det_TransformPlugin = MPE_TransformPlugin_V31
+        Det_OverlayPlugin = MPE_OverlayPlugin_V31
+        Det_ROIPlugin = MPE_ROIPlugin_V31
+        Det_TIFFPlugin = MPE_TIFFPlugin_V31
+        Det_HDF5Plugin = MPE_HDF5Plugin_V31
+        #logger.info("Using V31 plugins.")
+        
+    elif version_bits[0] == '3' and not any(x == version_bits[1] for x in ['1','2','3']):  #for versions '3.4' and higher
+        Det_CamBase = MPE_CamBase_V34
+        Det_ImagePlugin = MPE_ImagePlugin_V34
+        Det_PvaPlugin = MPE_PvaPlugin_V34
+        Det_ProcessPlugin = MPE_ProcessPlugin_V34
+        Det_TransformPlugin = MPE_TransformPlugin_V34
+        Det_OverlayPlugin = MPE_OverlayPlugin_V34
+        Det_ROIPlugin = MPE_ROIPlugin_V34
+        Det_TIFFPlugin = MPE_TIFFPlugin_V34
+        Det_HDF5Plugin = MPE_HDF5Plugin_V34
+        #logger.info('Using V34 plugins.')    
+            
+    else:
+        raise ValueError(f"""MPE custom plugins have not been generated for this version of ADcore = {version}. 
+                         Are you running the correct IOC version for {det_prefix}?""")
     
+    logger.info(f"Trying detector with prefix {det_prefix}, using ADcore v{version}.")  
+
     return [Det_CamBase, 
             Det_ImagePlugin, 
             Det_PvaPlugin, 
@@ -207,6 +471,186 @@ def find_det_version(
 #     return [CONTROLS_ROOT, LOCAL_ROOT, IMAGE_DIR]
 
 
+#generated classes, shared by detectors built alike (see `make_det_class()`)
+_cam_classes = {}
+_det_classes = {}
+_class_lock = threading.RLock()
+
+
+class EmptyFastsweepMixin(object):
+    """Stand-in for detectors without custom configuration methods."""
+    
+    #TODO: Can this be generalized for a detector??
+
+
+def make_cam_class(make_cam_plugin, Det_CamBase):
+    """Memoized `make_cam_plugin(Det_CamBase = Det_CamBase)`."""
+    key = (make_cam_plugin, Det_CamBase)
+    with _class_lock:
+        if key not in _cam_classes:
+            _cam_classes[key] = make_cam_plugin(Det_CamBase = Det_CamBase)
+        return _cam_classes[key]
+
+
+def make_det_class(
+    make_cam_plugin,
+    plugin_classes,
+    det_mixin = None,
+    pva1_exists = False,
+    use_tiff1 = True,
+    use_hdf1 = True,
+):
+    """ 
+    Area detector class (`MPEAreaDetector`) for the given cam factory, 
+    plugin classes (as returned by `find_det_version()`), mixin and 
+    optional plugins. Classes are memoized on those inputs, so detectors
+    built alike (e.g., ge1-ge5) share one class and ophyd only builds it once.
+    
+    PARAMETERS
+    
+    make_cam_plugin *function* : 
+        Detector-specific cam class factory in `DETECTOR.py` file.
+        
+    plugin_classes *list of classes* :
+        Cam base and plugin classes for the ADcore version, from `find_det_version()`.
+        
+    det_mixin *Mixin class* : 
+        Detector-specific mixin, or None. (default : None)
+        
+    pva1_exists, use_tiff1, use_hdf1 *Boolean* :
+        As in `make_det()`. (defaults : False, True, True)
+    """
+    
+    det_mixin = det_mixin or EmptyFastsweepMixin
+    key = (make_cam_plugin, tuple(plugin_classes), det_mixin, bool(pva1_exists), bool(use_tiff1), bool(use_hdf1))
+    with _class_lock:
+        if key not in _det_classes:
+            _det_classes[key] = _build_det_class(make_cam_plugin, plugin_classes, det_mixin, pva1_exists, use_tiff1, use_hdf1)
+        return _det_classes[key]
+
+
+def _build_det_class(make_cam_plugin, plugin_classes, det_mixin, pva1_exists, use_tiff1, use_hdf1):
+    [Det_CamBase, 
+    Det_ImagePlugin, 
+    Det_PvaPlugin, 
+    Det_ProcessPlugin, 
+    Det_TransformPlugin, 
+    Det_OverlayPlugin,
+    Det_ROIPlugin, 
+    Det_TIFFPlugin,
+    Det_HDF5Plugin] = plugin_classes
+    
+    #generate detector-specific cam plugin (defined in `DETECTOR.py` file) using correct CamBase version
+    Det_CamPlugin = make_cam_class(make_cam_plugin, Det_CamBase) 
+    
+    #create a general class for making an area detector using plugin and mixin inputs defined above
+    class MPEAreaDetector(DiffStagingMixin, det_mixin, SingleTrigger, DetectorBase):
+        """
+        Area detector with MPE plugins. File paths and plugin control are
+        per instance, so one class serves every detector of its kind.
+        Staging only writes the stage_sigs that differ (`DiffStagingMixin`).
+        """
+        
+        #define plugins here
+        cam = ADComponent(Det_CamPlugin, "cam1:")
+        image1 = ADComponent(Det_ImagePlugin, "image1:")
+        #caveat in case pva1 does not exist
+        if pva1_exists:
+            pva1 = ADComponent(Det_PvaPlugin, "Pva1:")
+        proc1 = ADComponent(Det_ProcessPlugin, "Proc1:")
+        trans1 = ADComponent(Det_TransformPlugin, "Trans1:")
+        over1 = ADComponent(Det_OverlayPlugin, "Over1:")
+        roi1 = ADComponent(Det_ROIPlugin, "ROI1:")
+        
+        #define file writing plugins
+        if use_tiff1:
+            tiff1 = ADComponent(Det_TIFFPlugin, "TIFF1:",
+                            write_path_template = "/",     #set per instance, see `__init__`
+                            read_path_template = "/")
+        
+        if use_hdf1:
+            hdf1 = ADComponent(Det_HDF5Plugin, "HDF1:",
+                            write_path_template = "/", 
+                            read_path_template = "/")
+        
+        def __init__(
+            self, 
+            *args, 
+            READ_PATH = None, 
+            WRITE_PATH = None, 
+            default_plugin_control = None, 
+            custom_plugin_control = None, 
+            **kwargs
+        ):
+            super().__init__(*args, **kwargs)
+            self.READ_PATH = READ_PATH
+            self.WRITE_PATH = WRITE_PATH
+            self.default_plugin_control = default_plugin_control or {}
+            self.custom_plugin_control = custom_plugin_control or {}
+            #monitored settings, so `enable_plugins()` and `stage()` only write what differs
+            self.plugin_cache = self._stage_cache = ConfigCache(f"{self.name}_plugins", devices = [self])
+            for attr in ("tiff1", "hdf1"):
+                if attr in self.component_names and WRITE_PATH is not None:
+                    plugin = getattr(self, attr)
+                    plugin.write_path_template = WRITE_PATH
+                    plugin.read_path_template = READ_PATH if READ_PATH is not None else WRITE_PATH
+        
+        #add a method to the object that will enable/disable plugins as desired
+        def enable_plugins(
+            self, 
+            default_plugin_control = None, #plugin_control keys become defaults (det-specific); None uses the det's own
+            custom_plugin_control = None   #non-default values; None uses the det's own
+        ):
+            """ 
+            Object method for enabling or disabling plugins as needed for a given det. 
+            
+            Only plugins whose enable state or `nd_array_port` differ from the 
+            target are written, all in one `bps.mv()` (see `plugin_cache`).
+            
+            PARAMETERS 
+            
+            self : 
+                Attaches method to objects belonging to the `MPEAreaDetector` class. 
+                
+            plugin_control *dict* : 
+                Default options for enabling/disabling plugins and filling in `DETECTOR.nd_array_port` field.
+                
+            """
+            
+            if default_plugin_control is None:
+                default_plugin_control = self.default_plugin_control
+            if custom_plugin_control is None:
+                custom_plugin_control = self.custom_plugin_control
+            
+            #allow changes to dictionary from custom dictionary
+            plugin_control = {**default_plugin_control, **custom_plugin_control}   #merges dictionaries so that input kwargs overrides defaults 
+            
+            #caveats for plugins that don't exist
+            if not pva1_exists and plugin_control["use_pva1"]:
+                raise ValueError("Warning! Request to enable Pva1 plugin, but it doesn't exist.")
+            if not use_tiff1 and plugin_control["use_tiff1"]:
+                raise ValueError("Warning! Request to enable TIFF1 plugin, but it doesn't exist. Check DET.py file.")
+            if not use_hdf1 and plugin_control["use_hdf1"]:
+                raise ValueError("Warning! Request to enable HDF1 plugin, but it doesn't exist. Check DET.py file.")
+            
+            #enabling/disabling; disabled plugins keep their port
+            args = []
+            for plugin in ("image1", "pva1", "proc1", "trans1", "over1", "roi1", "tiff1", "hdf1"):
+                if plugin not in self.component_names:
+                    continue
+                obj = getattr(self, plugin)
+                if plugin_control[f"use_{plugin}"]:
+                    args += [obj.enable, 1, obj.nd_array_port, plugin_control[f"ndport_{plugin}"]]
+                else:
+                    args += [obj.enable, 0]
+            
+            #one concurrent move of the plugins that differ
+            yield from self.plugin_cache.write_if_new(*args)
+
+
+    return MPEAreaDetector
+
+
 def make_det(
     det_prefix,
     device_name,
@@ -221,9 +665,10 @@ def make_det(
     pva1_exists = False,
     use_tiff1 = True,
     use_hdf1 = True,
+    adcore_version = None,
 ):
     """ 
-    Function to generate detector object or assign it as `None` if timeout.
+    Function to generate detector object, or an `OfflineDetector` placeholder if timeout.
     
     PARAMETERS 
     
@@ -271,22 +716,36 @@ def make_det(
         as whether the plugin should be enabled. For some dets, hdf1 isn't
         initialized with image dimensions and will throw and error. 
         (default : True)
+        
+    adcore_version *str or None* :
+        ADcore version to build the detector for. If None, the version in 
+        `adcore_versions` is used when it is fresh (and checked against the 
+        IOC in the background), otherwise it is read from the IOC. 
+        (default : None)
+        
+    With a cached version the ADcore version is not read here; the IOC is
+    only checked to answer within `DET_CONNECTION_CHECK_TIMEOUT` (or the
+    startup deadline, if shorter), so an offline IOC still gives an
+    `OfflineDetector`.
             
     """
-        
-    #use `find_det_version()` to select plugin versions based on ADCore version
-    [Det_CamBase, 
-    Det_ImagePlugin, 
-    Det_PvaPlugin, 
-    Det_ProcessPlugin, 
-    Det_TransformPlugin, 
-    Det_OverlayPlugin,
-    Det_ROIPlugin, 
-    Det_TIFFPlugin,
-    Det_HDF5Plugin] = find_det_version(det_prefix = det_prefix) 
     
-    #generate detector-specific cam plugin (defined in `DETECTOR.py` file) using correct CamBase version
-    Det_CamPlugin = make_cam_plugin(Det_CamBase = Det_CamBase) 
+    #use `find_det_version()` to select plugin versions based on ADCore version
+    t0 = time.monotonic()
+    cached_version = None
+    if adcore_version is None:
+        cached_version = adcore_versions.cached_version(det_prefix)
+        adcore_version = cached_version
+    try:
+        if _remaining() == 0:
+            raise TimeoutError(f"{det_prefix} not contacted, startup deadline passed.")
+        if cached_version is not None:
+            _check_ioc(det_prefix, min(_remaining() or DET_CONNECTION_CHECK_TIMEOUT, DET_CONNECTION_CHECK_TIMEOUT))
+        plugin_classes = find_det_version(det_prefix = det_prefix, timeout = _remaining(), version = adcore_version) 
+    except TimeoutError as exinfo:
+        logger.warning(f"FAILED: DETECTOR NOT CREATED. {exinfo} Using a placeholder for {device_name}.")
+        _log_startup(device_name, det_prefix, "offline", t0, reason = str(exinfo))
+        return OfflineDetector(device_name, det_prefix, str(exinfo))
     
     #FIXME -- need standardized linux and windows paths/mounts
     # #generate read and write paths for WIN or LIN machines
@@ -308,120 +767,192 @@ def make_det(
     
     #add protection in case det_mixin is not defined yet
     if not det_mixin:
-        class EmptyFastsweepMixin(object):
-            print(f"Custom configuration methods have not been configured for detector = {det_prefix}.")  
-            
-            #TODO: Can this be generalized for a detector??
-            
-        det_mixin = EmptyFastsweepMixin
-    
-    #create a general class for making an area detector using plugin and mixin inputs defined above
-    class MPEAreaDetector(det_mixin, SingleTrigger, DetectorBase):
-        
-        #define plugins here
-        cam = ADComponent(Det_CamPlugin, "cam1:")
-        image1 = ADComponent(Det_ImagePlugin, "image1:")
-        #caveat in case pva1 does not exist
-        if pva1_exists:
-            pva1 = ADComponent(Det_PvaPlugin, "Pva1:")
-        proc1 = ADComponent(Det_ProcessPlugin, "Proc1:")
-        trans1 = ADComponent(Det_TransformPlugin, "Trans1:")
-        over1 = ADComponent(Det_OverlayPlugin, "Over1:")
-        roi1 = ADComponent(Det_ROIPlugin, "ROI1:")
-        
-        #define file writing plugins
-        if use_tiff1:
-            tiff1 = ADComponent(Det_TIFFPlugin, "TIFF1:",
-                            write_path_template = WRITE_PATH,
-                            read_path_template = READ_PATH)
-        
-        if use_hdf1:
-            hdf1 = ADComponent(Det_HDF5Plugin, "HDF1:",
-                            write_path_template = WRITE_PATH, 
-                            read_path_template = READ_PATH)
-        
-        #add a method to the object that will enable/disable plugins as desired
-        def enable_plugins(
-            self, 
-            default_plugin_control = default_plugin_control, #plugin_control keys become defaults (det-specific)
-            custom_plugin_control = custom_plugin_control   #non-default values 
-        ):
-            """ 
-            Object method for enabling or disabling plugins as needed for a given det. 
-            
-            PARAMETERS 
-            
-            self : 
-                Attaches method to objects belonging to the `MPEAreaDetector` class. 
-                
-            plugin_control *dict* : 
-                Default options for enabling/disabling plugins and filling in `DETECTOR.nd_array_port` field.
-                
-            """
-            
-            #allow changes to dictionary from custom dictionary
-            plugin_control = {**default_plugin_control, **custom_plugin_control}   #merges dictionaries so that input kwargs overrides defaults 
-            
-            #enabling/disabling
-            if plugin_control["use_image1"]:
-                yield from bps.mv(self.image1.enable, 1, self.image1.nd_array_port, plugin_control["ndport_image1"])
-            else: 
-                yield from bps.mv(self.image1.enable, 0)
-        
-            #extra caveats in case pva1 doesn't exist
-            if pva1_exists and plugin_control["use_pva1"]:
-                yield from bps.mv(self.pva1.enable, 1, self.pva1.nd_array_port, plugin_control["ndport_pva1"])
-            elif pva1_exists and not plugin_control["use_pva1"]: 
-                yield from bps.mv(self.pva1.enable, 0)
-            elif not pva1_exists and plugin_control["use_pva1"]:
-                raise ValueError("Warning! Request to enable Pva1 plugin, but it doesn't exist.")
-                
-            if plugin_control["use_proc1"]:
-                yield from bps.mv(self.proc1.enable, 1, self.proc1.nd_array_port, plugin_control["ndport_proc1"])
-            else:
-                yield from bps.mv(self.proc1.enable, 0)
-                
-            if plugin_control["use_trans1"]:
-                yield from bps.mv(self.trans1.enable, 1, self.trans1.nd_array_port, plugin_control["ndport_trans1"])
-            else: 
-                yield from bps.mv(self.trans1.enable, 0)
-                
-            if plugin_control["use_over1"]:
-                yield from bps.mv(self.over1.enable, 1, self.over1.nd_array_port, plugin_control["ndport_over1"])
-            else:
-                yield from bps.mv(self.over1.enable, 0)
-                
-            if plugin_control["use_roi1"]:
-                yield from bps.mv(self.roi1.enable, 1, self.roi1.nd_array_port, plugin_control["ndport_roi1"])
-            else:
-                yield from bps.mv(self.roi1.enable, 0)
-            
-            if use_tiff1 and plugin_control['use_tiff1']:
-                yield from bps.mv(self.tiff1.enable, 1, self.tiff1.nd_array_port, plugin_control["ndport_tiff1"])
-            elif use_tiff1 and not plugin_control["use_tiff1"]:
-                yield from bps.mv(self.tiff1.enable, 0)
-            elif not use_hdf1 and plugin_control["use_tiff1"]:
-                raise ValueError("Warning! Request to enable TIFF1 plugin, but it doesn't exist. Check DET.py file.")
-  
-            if use_hdf1 and plugin_control['use_hdf1']:
-                yield from bps.mv(self.hdf1.enable, 1, self.hdf1.nd_array_port, plugin_control["ndport_hdf1"])
-            elif use_hdf1 and not plugin_control["use_hdf1"]:
-                yield from bps.mv(self.hdf1.enable, 0)
-            elif not use_hdf1 and plugin_control["use_hdf1"]:
-                raise ValueError("Warning! Request to enable HDF1 plugin, but it doesn't exist. Check DET.py file.")
-  
+        print(f"Custom configuration methods have not been configured for detector = {det_prefix}.")  
+    
+    #area detector class for this cam, ADcore version and plugin set (memoized)
+    MPEAreaDetector = make_det_class(
+        make_cam_plugin = make_cam_plugin,
+        plugin_classes = plugin_classes,
+        det_mixin = det_mixin,
+        pva1_exists = pva1_exists,
+        use_tiff1 = use_tiff1,
+        use_hdf1 = use_hdf1,
+    )
     
     #generate object using class defined above
     try: 
-        area_detector = MPEAreaDetector(det_prefix, name = device_name, labels = ("Detector",))
+        area_detector = MPEAreaDetector(
+            det_prefix, 
+            name = device_name, 
+            labels = ("Detector",),
+            READ_PATH = READ_PATH,
+            WRITE_PATH = WRITE_PATH,
+            default_plugin_control = default_plugin_control,
+            custom_plugin_control = custom_plugin_control,
+        )
         logger.info(f"SUCCESS. {device_name} created.")
+        _log_startup(device_name, det_prefix, "ok", t0)
         
     except TimeoutError as exinfo:
-        area_detector = None
+        area_detector = OfflineDetector(device_name, det_prefix, "timed out while connecting")
+        _log_startup(device_name, det_prefix, "offline", t0, reason = "timed out while connecting")
         logger.warning(f"FAILED: DETECTOR NOT CREATED. Could not create {device_name} with prefix {det_prefix}. Is the IOC running?")
 
+    #built from the cache: check the live ADcore version without holding up startup
+    if cached_version is not None and area_detector:
+        threading.Thread(
+            target = _verify_adcore_version, 
+            args = (area_detector, cached_version, det_prefix),
+            daemon = True, 
+            name = f"adcore_version_{device_name}",
+        ).start()
 
     return area_detector    
+
+
+def _verify_adcore_version(det, cached_version, prefix):
+    """
+    Read the live ADcore version of `det` (built from `cached_version`) and
+    refresh the cache. Only if the version changed to one that needs other
+    plugin classes, warn; the detector is not replaced behind the user's
+    back, since plans and their default arguments hold on to it.
+    """
+    try:
+        version = read_adcore_version(prefix)
+    except TimeoutError as exinfo:
+        logger.warning(f"Could not verify the ADcore version of {det.name}: {exinfo}")
+        return
+    adcore_versions.set(prefix, version)
+    if version == cached_version:
+        return
+    
+    try:
+        changed = find_det_version(prefix, version = version) != find_det_version(prefix, version = cached_version)
+    except ValueError as exinfo:
+        logger.error(f"{det.name}: {exinfo}")
+        return
+    if not changed:
+        logger.info(f"{det.name}: ADcore version is now {version} (was {cached_version}); same plugin classes.")
+        return
+    
+    logger.warning(f"{det.name}: ADcore version changed from {cached_version} to {version}; its plugin classes are out of date.")
+    print(
+        f"WARNING! {det.name} IOC now runs ADcore v{version} (built for v{cached_version}). "
+        f"Re-run its make_det() (or restart the session) before using it; the cache is updated."
+    )
+
+
+def make_dets(*specs):
+    """
+    Create several area detectors concurrently with `make_det()`. Returns
+    the detectors in the order of `specs`; those offline or not created 
+    before the startup deadline (`DET_STARTUP_DEADLINE` in iconfig, 
+    default 30 s, started by `import_det_modules()` or by the first 
+    `make_dets()` of the session) are `LazyDevice` proxies that keep 
+    retrying in the background and attach once the IOC is up. Later calls,
+    outside the startup, wait with the normal timeouts.
+    
+    PARAMETERS
+    
+    specs *dict* : 
+        Keyword arguments of `make_det()`, one dictionary per detector.
+    """
+    
+    startup = _start_deadline() or _in_startup()
+    
+    def create(spec):
+        with _startup_scope(startup):
+            return make_det(**spec)
+    
+    t0 = time.monotonic()
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers = max(len(specs), 1), thread_name_prefix = "make_det")
+    futures = [executor.submit(create, spec) for spec in specs]
+    with _startup_scope(startup):
+        concurrent.futures.wait(futures, timeout = _remaining())
+    executor.shutdown(wait = False)     #stragglers finish in the background
+    
+    dets = []
+    for spec, future in zip(specs, futures):
+        name, prefix = spec["device_name"], spec["det_prefix"]
+        if not future.done():
+            logger.warning(f"FAILED: DETECTOR NOT CREATED. {name} not ready by the startup deadline. Retrying in the background.")
+            _log_startup(name, prefix, "offline", t0, reason = "startup deadline")
+            dets.append(_lazy_det(spec, future, "startup deadline"))
+        elif future.exception() is not None:
+            logger.error(f"FAILED: DETECTOR NOT CREATED. {name}: {future.exception()}")
+            _log_startup(name, prefix, "error", t0, reason = str(future.exception()))
+            dets.append(OfflineDetector(name, prefix, str(future.exception())))
+        elif not future.result():
+            dets.append(_lazy_det(spec, future, future.result().reason))
+        else:
+            dets.append(future.result())
+    return dets
+
+
+def _lazy_det(spec, future, reason):
+    """
+    `LazyDevice` for a detector that was offline at startup: it keeps 
+    trying `make_det(**spec)` in the background and attaches once the IOC
+    is back (or the straggling startup attempt in `future` succeeds).
+    """
+    
+    def factory():
+        if future.done() and future.exception() is None and future.result():
+            return future.result()
+        return make_det(**spec)
+    
+    det = LazyDevice(factory, name = spec["device_name"])
+    det._error = reason
+    det.start_retry()
+    return det
+
+
+def import_det_modules(package, module_names):
+    """
+    Import the detector modules `module_names` of `package` concurrently,
+    so their IOCs are contacted (and, if offline, time out) in parallel.
+    Starts the startup deadline (once per session) and waits until it at 
+    most; detector modules still importing then give up at once, and the 
+    usual `from .x import *` afterwards picks the modules up.
+    
+    PARAMETERS
+    
+    package *str* : 
+        Package of the modules (e.g., `__name__` of `devices/__init__.py`).
+        
+    module_names *list of str* :
+        Module names relative to `package` (e.g., "ge_panels").
+    """
+    
+    def target(module_name):
+        with _startup_scope():
+            try:
+                importlib.import_module(f"{package}.{module_name}")
+            except Exception as exinfo:
+                #raised again by the regular import
+                logger.error(f"Could not import {module_name}: {exinfo}")
+    
+    _start_deadline()
+    threads = [
+        threading.Thread(target = target, args = (module_name,), daemon = True, name = f"import_{module_name}")
+        for module_name in module_names
+    ]
+    for thread in threads:
+        thread.start()
+    with _startup_scope():
+        for thread in threads:
+            thread.join(timeout = _remaining())
+
+
+def show_det_startup():
+    """Print how long each area detector took to create, slowest first."""
+    table = pyRestTable.Table()
+    table.labels = ["detector", "prefix", "status", "seconds", "reason"]
+    with _startup_lock:
+        entries = dict(DET_STARTUP)
+    for name, entry in sorted(entries.items(), key = lambda item: -item[1]["seconds"]):
+        table.addRow([name, entry["prefix"], entry["status"], f"{entry['seconds']:.2f}", entry["reason"] or ""])
+    print(table)
     
     
     
@@ -81,6 +81,9 @@ from ophyd.areadetector.plugins import ROIPlugin_V34
 from ophyd.areadetector.plugins import TIFFPlugin_V34
 from ophyd.areadetector.plugins import HDF5Plugin_V34
 
+#stage only what differs (see `config_cache.py`)
+from .config_cache import DiffStagingMixin
+
 #import iterative file writers from apstools
 from apstools.devices.area_detector_support import AD_EpicsTIFFIterativeWriter
 from apstools.devices.area_detector_support import AD_EpicsHDF5IterativeWriter
@@ -92,51 +95,56 @@ class MPE_PluginMixin_V31(PluginBase_V31):...
 class MPE_PluginMixin_V34(PluginBase_V34):...
 
 #generate custom cambase classes
-class MPE_CamBase(CamBase): ...
+class MPE_CamBase(DiffStagingMixin, CamBase): ...
 
-class MPE_CamBase_V31(CamBase): 
+class MPE_CamBase_V31(DiffStagingMixin, CamBase): 
     """Contains updates to CamBase since v22."""
     pool_max_buffers = None
     
-class MPE_CamBase_V34(CamBase):
+class MPE_CamBase_V34(DiffStagingMixin, CamBase):
     """Contains updates to CamBase since v22."""
     pool_max_buffers = None
     
 
 #generate custom plugin classes
-class MPE_ImagePlugin(ImagePlugin):...
-class MPE_ImagePlugin_V31(ImagePlugin_V31):...
-class MPE_ImagePlugin_V34(ImagePlugin_V34):...
+class MPE_ImagePlugin(DiffStagingMixin, ImagePlugin):...
+class MPE_ImagePlugin_V31(DiffStagingMixin, ImagePlugin_V31):...
+class MPE_ImagePlugin_V34(DiffStagingMixin, ImagePlugin_V34):...
 
-class MPE_PvaPlugin(PvaPlugin):...
-class MPE_PvaPlugin_V31(PvaPlugin_V31):...
-class MPE_PvaPlugin_V34(PvaPlugin_V34):...
+class MPE_PvaPlugin(DiffStagingMixin, PvaPlugin):...
+class MPE_PvaPlugin_V31(DiffStagingMixin, PvaPlugin_V31):...
+class MPE_PvaPlugin_V34(DiffStagingMixin, PvaPlugin_V34):...
 
-class MPE_ProcessPlugin(ProcessPlugin):...
-class MPE_ProcessPlugin_V31(ProcessPlugin_V31):...
-class MPE_ProcessPlugin_V34(ProcessPlugin_V34):...
+class MPE_ProcessPlugin(DiffStagingMixin, ProcessPlugin):...
+class MPE_ProcessPlugin_V31(DiffStagingMixin, ProcessPlugin_V31):...
+class MPE_ProcessPlugin_V34(DiffStagingMixin, ProcessPlugin_V34):...
 
-class MPE_TransformPlugin(TransformPlugin):...
-class MPE_TransformPlugin_V31(TransformPlugin_V31):...
-class MPE_TransformPlugin_V34(TransformPlugin_V34):...
+class MPE_TransformPlugin(DiffStagingMixin, TransformPlugin):...
+class MPE_TransformPlugin_V31(DiffStagingMixin, TransformPlugin_V31):...
+class MPE_TransformPlugin_V34(DiffStagingMixin, TransformPlugin_V34):...
 
-class MPE_OverlayPlugin(OverlayPlugin):...
-class MPE_OverlayPlugin_V31(OverlayPlugin_V31):...
-class MPE_OverlayPlugin_V34(OverlayPlugin_V34):...
+class MPE_OverlayPlugin(DiffStagingMixin, OverlayPlugin):...
+class MPE_OverlayPlugin_V31(DiffStagingMixin, OverlayPlugin_V31):...
+class MPE_OverlayPlugin_V34(DiffStagingMixin, OverlayPlugin_V34):...
 
-class MPE_ROIPlugin(ROIPlugin):...
-class MPE_ROIPlugin_V31(ROIPlugin_V31):...
-class MPE_ROIPlugin_V34(ROIPlugin_V34):...
+class MPE_ROIPlugin(DiffStagingMixin, ROIPlugin):...
+class MPE_ROIPlugin_V31(DiffStagingMixin, ROIPlugin_V31):...
+class MPE_ROIPlugin_V34(DiffStagingMixin, ROIPlugin_V34):...
 
 
 #create custom file writer classes
-class MPE_TIFFPlugin(AD_EpicsTIFFIterativeWriter, TIFFPlugin):...
-class MPE_TIFFPlugin_V31(AD_EpicsTIFFIterativeWriter, TIFFPlugin_V31):...
-class MPE_TIFFPlugin_V34(AD_EpicsTIFFIterativeWriter, TIFFPlugin_V34):...
-
-class MPE_HDF5Plugin(AD_EpicsHDF5IterativeWriter, HDF5Plugin):...
-class MPE_HDF5Plugin_V31(AD_EpicsHDF5IterativeWriter, HDF5Plugin_V31):...
-class MPE_HDF5Plugin_V34(AD_EpicsHDF5IterativeWriter, HDF5Plugin_V34):
+class MPE_FileWriterStaging(DiffStagingMixin):
+    """Stage only what differs, after the apstools writer has reset the
+    file name, path and capture; capture is always restarted."""
+    always_stage = ("capture",)
+
+class MPE_TIFFPlugin(AD_EpicsTIFFIterativeWriter, MPE_FileWriterStaging, TIFFPlugin):...
+class MPE_TIFFPlugin_V31(AD_EpicsTIFFIterativeWriter, MPE_FileWriterStaging, TIFFPlugin_V31):...
+class MPE_TIFFPlugin_V34(AD_EpicsTIFFIterativeWriter, MPE_FileWriterStaging, TIFFPlugin_V34):...
+
+class MPE_HDF5Plugin(AD_EpicsHDF5IterativeWriter, MPE_FileWriterStaging, HDF5Plugin):...
+class MPE_HDF5Plugin_V31(AD_EpicsHDF5IterativeWriter, MPE_FileWriterStaging, HDF5Plugin_V31):...
+class MPE_HDF5Plugin_V34(AD_EpicsHDF5IterativeWriter, MPE_FileWriterStaging, HDF5Plugin_V34):
     """Contains some updates to HDF plugin."""
     pool_max_buffers = None
 
@@ -14,6 +14,8 @@ logger.info(__file__)
 
 import apstools.devices
 
+from .lazy_device import LazyDevice
+
 
 class MyAPSMachine(apstools.devices.ApsMachineParametersDevice):
 
@@ -24,4 +26,5 @@ class MyAPSMachine(apstools.devices.ApsMachineParametersDevice):
     global_feedback_v = None
 
 
-aps = MyAPSMachine(name="aps")
+#built on first use; retried in the background if the PVs are unreachable
+aps = LazyDevice(lambda: MyAPSMachine(name="aps"), name="aps")
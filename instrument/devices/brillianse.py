@@ -202,62 +202,64 @@ class BrillianSeMixin(object):
 
 if "20-ID" in beamline: 
     
-    brse1 = make_det(
-        det_prefix = "",    #FIXME: add prefix
-        device_name = "brse1",
-        READ_PATH = READ_PATH["brse1"],
-        WRITE_PATH = WRITE_PATH["brse1"],
-        make_cam_plugin = make_brillianse_cam,
-        default_plugin_control = brse1_plugin_control,
-        det_mixin = BrillianSeMixin, 
-        ioc_WIN = True, 
-        pva1_exists = True,
-        use_hdf1= True,
-        use_tiff1 = True
-    )    
-
-    brse2 = make_det(
-        det_prefix = "",    #FIXME: add prefix
-        device_name = "brse2",
-        READ_PATH = READ_PATH["brse2"],
-        WRITE_PATH = WRITE_PATH["brse2"],
-        make_cam_plugin = make_brillianse_cam,
-        default_plugin_control = brse2_plugin_control,
-        det_mixin = BrillianSeMixin, 
-        ioc_WIN = True, 
-        pva1_exists = True,
-        use_hdf1= True,
-        use_tiff1 = True
-    )   
+    brse1, brse2 = make_dets(
+        dict(
+            det_prefix = "",    #FIXME: add prefix
+            device_name = "brse1",
+            READ_PATH = READ_PATH["brse1"],
+            WRITE_PATH = WRITE_PATH["brse1"],
+            make_cam_plugin = make_brillianse_cam,
+            default_plugin_control = brse1_plugin_control,
+            det_mixin = BrillianSeMixin,
+            ioc_WIN = True,
+            pva1_exists = True,
+            use_hdf1= True,
+            use_tiff1 = True
+        ),
+        dict(
+            det_prefix = "",    #FIXME: add prefix
+            device_name = "brse2",
+            READ_PATH = READ_PATH["brse2"],
+            WRITE_PATH = WRITE_PATH["brse2"],
+            make_cam_plugin = make_brillianse_cam,
+            default_plugin_control = brse2_plugin_control,
+            det_mixin = BrillianSeMixin,
+            ioc_WIN = True,
+            pva1_exists = True,
+            use_hdf1= True,
+            use_tiff1 = True
+        ),
+    )
     
     
 
 if "1-ID" in beamline: 
     
-    brse3 = make_det(
-        det_prefix = "",    #FIXME: add prefix
-        device_name = "brse3",
-        READ_PATH = READ_PATH["brse3"],
-        WRITE_PATH = WRITE_PATH["brse3"],
-        make_cam_plugin = make_brillianse_cam,
-        default_plugin_control = brse3_plugin_control,
-        det_mixin = BrillianSeMixin, 
-        ioc_WIN = True, 
-        pva1_exists = True,
-        use_hdf1= True,
-        use_tiff1 = True
-    )  
-    
-    brseKA1 = make_det(
-        det_prefix = "433KA1:",   
-        device_name = "brseKA1",
-        READ_PATH = READ_PATH["brseKA1"],
-        WRITE_PATH = WRITE_PATH["brseKA1"],
-        make_cam_plugin = make_brillianse_cam,
-        default_plugin_control = brseKA1_plugin_control,
-        det_mixin = BrillianSeMixin, 
-        ioc_WIN = True, 
-        pva1_exists = True,
-        use_hdf1= True,
-        use_tiff1 = True
-    )  
\ No newline at end of file
+    brse3, brseKA1 = make_dets(
+        dict(
+            det_prefix = "",    #FIXME: add prefix
+            device_name = "brse3",
+            READ_PATH = READ_PATH["brse3"],
+            WRITE_PATH = WRITE_PATH["brse3"],
+            make_cam_plugin = make_brillianse_cam,
+            default_plugin_control = brse3_plugin_control,
+            det_mixin = BrillianSeMixin,
+            ioc_WIN = True,
+            pva1_exists = True,
+            use_hdf1= True,
+            use_tiff1 = True
+        ),
+        dict(
+            det_prefix = "433KA1:",
+            device_name = "brseKA1",
+            READ_PATH = READ_PATH["brseKA1"],
+            WRITE_PATH = WRITE_PATH["brseKA1"],
+            make_cam_plugin = make_brillianse_cam,
+            default_plugin_control = brseKA1_plugin_control,
+            det_mixin = BrillianSeMixin,
+            ioc_WIN = True,
+            pva1_exists = True,
+            use_hdf1= True,
+            use_tiff1 = True
+        ),
+    )
\ No newline at end of file
@@ -0,0 +1,301 @@
+"""
+Write-if-different configuration cache backed by CA monitors.
+
+Generalizes `write_if_new()` (see `plans/auxiliary_ad.py`) from a single
+signal to whole devices. A `ConfigCache` watches every signal of its
+devices that it is asked about, keeps the last monitored value, and drops
+writes that would not change anything. When a signal disconnects (e.g., an
+IOC reboots), its cached value is forgotten; `invalidate()` does the same
+by hand.
+
+Used by `plans/config_engine.configure_pvs()`, by the FPGA devices in
+`s1id_FPGAs.py` (see `fpga_cache`), and by `DiffStagingMixin`, which
+stages only the stage_sigs that differ (MPE area detectors, their
+plugins, and `MPEMotor`).
+
+USAGE::
+
+    #in a plan, only write the signals that differ
+    yield from fpga_cache.write_if_new(
+        softglue.fs1_mask, '1',
+        fake_gate.scan, "Passive",
+    )
+
+    #after an IOC reboot (also happens automatically on disconnect)
+    fpga_cache.invalidate(softglue)
+"""
+
+__all__ = [
+    "ConfigCache",
+    "DiffStagingMixin",
+    "values_match",
+]
+
+#import for logging
+import logging
+logger = logging.getLogger(__name__)
+logger.info(__file__)
+
+#import other stuff
+from bluesky import plan_stubs as bps
+from collections import OrderedDict
+from contextlib import contextmanager
+import math
+import numpy as np
+import threading
+
+
+def values_match(signal, current, target):
+    """
+    Return True if `current` (as read from `signal`) already equals `target`.
+
+    Handles enum signals written by string but monitored by index, numeric
+    values, link strings with stray whitespace, and arrays.
+
+    PARAMETERS
+
+    signal *ophyd signal* :
+        Signal the values belong to (used for enum strings).
+
+    current :
+        Value last read from `signal`.
+
+    target :
+        Value about to be written.
+    """
+
+    if current is None or target is None:
+        return False
+
+    #arrays (e.g., userArrayCalc .BB fields)
+    if isinstance(current, (np.ndarray, list, tuple)) or isinstance(target, (np.ndarray, list, tuple)):
+        current = np.asarray(current)
+        target = np.asarray(target)
+        return current.shape == target.shape and bool(np.array_equal(current, target))
+
+    #enums are monitored as index but usually written as string
+    try:
+        enum_strs = tuple(getattr(signal, "enum_strs", None) or ())
+    except Exception:
+        enum_strs = ()
+    if enum_strs:
+        if isinstance(target, str) and not isinstance(current, str) and target in enum_strs:
+            return enum_strs.index(target) == current
+        if isinstance(current, str) and not isinstance(target, str) and current in enum_strs:
+            return enum_strs.index(current) == target
+
+    #strings (link fields, softGlue signal names)
+    if isinstance(current, str) or isinstance(target, str):
+        return str(current).strip() == str(target).strip()
+
+    try:
+        return math.isclose(current, target, rel_tol=1e-9, abs_tol=1e-12)
+    except TypeError:
+        return current == target
+
+
+class ConfigCache(object):
+    """
+    Keeps monitored last-known values for signals of `devices` and drops
+    writes that would not change anything.
+
+    Signals are subscribed the first time the cache sees them, so the first
+    configuration after startup (or after invalidation) writes everything.
+
+    PARAMETERS
+
+    name *str* :
+        Name of the cache, for logging.
+
+    devices *list of ophyd devices* :
+        Devices whose signals are cached. Signals of other devices are
+        always written. (default : ())
+
+    always_write *list of ophyd signals* :
+        Signals that must be written every time, e.g. those whose write
+        has a side effect like a pulse or PROC. (default : ())
+    """
+
+    #thread-local values remembered inside `scratch()` (dry runs)
+    _scratch = threading.local()
+
+    def __init__(self, name, devices = (), always_write = ()):
+        self.name = name
+        self._devices = set(devices)
+        self._always_write = set(always_write)
+        self._known = {}        #signal -> last known value
+        self._tracked = set()   #signals with active subscriptions
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(name={self.name!r}, tracked={len(self._tracked)})"
+
+    def covers(self, signal, value = None):
+        """
+        True if `signal` belongs to one of the cached devices. Array values
+        are never cached: monitoring a waveform resends all of it on every
+        change.
+        """
+        if signal in self._always_write:
+            return False
+        if isinstance(value, (np.ndarray, list, tuple)):
+            return False
+        obj = signal
+        while obj is not None:
+            if obj in self._devices:
+                return True
+            obj = getattr(obj, "parent", None)
+        return False
+
+    def _on_value(self, value = None, obj = None, **kwargs):
+        with self._lock:
+            self._known[obj] = value
+
+    def _on_meta(self, obj = None, connected = None, **kwargs):
+        if connected is False:
+            with self._lock:
+                self._known.pop(obj, None)
+            logger.info(f"{self.name}: {obj.name} disconnected, cached value dropped.")
+
+    def track(self, signal):
+        """Start monitoring `signal` (only once per signal)."""
+        if signal in self._tracked:
+            return
+        self._tracked.add(signal)
+        signal.subscribe(self._on_value, event_type = signal.SUB_VALUE, run = True)
+        if hasattr(signal, "SUB_META"):
+            signal.subscribe(self._on_meta, event_type = signal.SUB_META, run = False)
+
+    @classmethod
+    @contextmanager
+    def scratch(cls):
+        """
+        Context manager for dry runs (see `utils/plan_simulator.py`): values
+        remembered by any cache in this thread are kept apart and dropped
+        on exit, so writes that never happened are not skipped later.
+        """
+        previous = getattr(cls._scratch, "values", None)
+        cls._scratch.values = dict(previous or {})
+        try:
+            yield
+        finally:
+            cls._scratch.values = previous
+
+    def remember(self, signal, value):
+        """Record `value` as known for `signal` after a confirmed write."""
+        if self.covers(signal, value):
+            scratch = getattr(self._scratch, "values", None)
+            if scratch is not None:
+                scratch[(self, signal)] = value
+                return
+            self.track(signal)
+            with self._lock:
+                self._known[signal] = value
+
+    def is_set(self, signal, value):
+        """True if `signal` is cached and already holds `value`."""
+        if not self.covers(signal, value):
+            return False
+        scratch = getattr(self._scratch, "values", None)
+        if scratch is not None and (self, signal) in scratch:
+            return values_match(signal, scratch[(self, signal)], value)
+        self.track(signal)
+        with self._lock:
+            if signal not in self._known:
+                return False
+            current = self._known[signal]
+        return values_match(signal, current, value)
+
+    def invalidate(self, device = None):
+        """
+        Forget cached values so the next configuration writes everything.
+
+        PARAMETERS
+
+        device *ophyd device or signal or None* :
+            Only forget values of signals belonging to `device`. If None,
+            forget everything (e.g., after an IOC reboot). (default : None)
+        """
+        with self._lock:
+            if device is None:
+                self._known.clear()
+            else:
+                for signal in list(self._known):
+                    obj = signal
+                    while obj is not None and obj is not device:
+                        obj = getattr(obj, "parent", None)
+                    if obj is device:
+                        self._known.pop(signal)
+        logger.info(f"{self.name}: invalidated {'all' if device is None else device.name}.")
+
+    def filter_entries(self, entries):
+        """Return only the `ConfigEntry` objects that would change a value."""
+        kept = [entry for entry in entries if not self.is_set(entry.signal, entry.value)]
+        logger.debug(f"{self.name}: {len(entries) - len(kept)} of {len(entries)} writes skipped.")
+        return kept
+
+    def write_if_new(self, *args):
+        """
+        Plan stub like `bps.mv()`, but only moves signals whose value differs.
+
+        PARAMETERS
+
+        args :
+            Alternating signal, value pairs, as for `bps.mv()`.
+        """
+        if len(args) % 2:
+            raise ValueError("write_if_new() needs signal, value pairs.")
+
+        changed = []
+        for signal, value in zip(args[::2], args[1::2]):
+            if value is not None and not self.is_set(signal, value):
+                changed += [signal, value]
+
+        if changed:
+            yield from bps.mv(*changed)
+            for signal, value in zip(changed[::2], changed[1::2]):
+                self.remember(signal, value)
+
+
+class DiffStagingMixin(object):
+    """
+    Mixin for ophyd devices: `stage()` only puts the stage_sigs whose
+    monitored value differs from the target, so `unstage()` only restores
+    what was changed. Settings that are already right are never written
+    (important for detectors like pixirad, where a redundant write can
+    start a recalibration), and their original values are not read.
+
+    Values come from one `ConfigCache` per root device (`_stage_cache`),
+    shared by its plugins and sub-devices. Callable stage_sigs values are
+    always applied, as are those named in `always_stage`.
+    """
+
+    #stage_sigs attribute names that are always put (e.g., a file writer's capture)
+    always_stage = ()
+
+    def _staging_cache(self):
+        root = self
+        while getattr(root, "parent", None) is not None:
+            root = root.parent
+        cache = root.__dict__.get("_stage_cache")
+        if cache is None:
+            cache = ConfigCache(f"{root.name}_stage", devices = [root])
+            root._stage_cache = cache
+        return cache
+
+    def stage(self):
+        all_sigs = self.stage_sigs
+        cache = self._staging_cache()
+        needed = OrderedDict()
+        for key, value in all_sigs.items():
+            signal = getattr(self, key) if isinstance(key, str) else key
+            if callable(value) or signal.attr_name in self.always_stage or not cache.is_set(signal, value):
+                needed[key] = value
+        if len(needed) < len(all_sigs):
+            logger.debug(f"{self.name}: {len(all_sigs) - len(needed)} of {len(all_sigs)} stage_sigs already set.")
+
+        self.stage_sigs = needed
+        try:
+            return super().stage()
+        finally:
+            self.stage_sigs = all_sigs
@@ -319,73 +319,71 @@ class GEMixin(object):
 if "1-ID" in beamline:       
        
     #create GE objects
-    ge1 = make_det(
-        det_prefix = "GE1:",
-        device_name = "ge1",
-        READ_PATH = READ_PATH["ge1"],
-        WRITE_PATH = WRITE_PATH["ge1"],
-        make_cam_plugin = make_GE_cam,
-        default_plugin_control = ge1_plugin_control,
-        det_mixin = GEMixin,
-        ioc_WIN = True, 
-        pva1_exists = True,
-        use_hdf1 = True,
-        use_tiff1 = False   #FIXME as needed
-    )       
-
-    ge2 = make_det(
-        det_prefix = "GE2:",
-        device_name = "ge2",
-        READ_PATH = READ_PATH["ge2"],
-        WRITE_PATH = WRITE_PATH["ge2"],
-        make_cam_plugin = make_GE_cam,
-        default_plugin_control = ge2_plugin_control,
-        det_mixin = GEMixin,
-        ioc_WIN = True, 
-        pva1_exists = True,
-        use_hdf1 = True,
-        use_tiff1 = False
-    )  
-
-    ge3 = make_det(
-        det_prefix = "GE3:",
-        device_name = "ge3",
-        READ_PATH = READ_PATH["ge3"],
-        WRITE_PATH = WRITE_PATH["ge3"],
-        make_cam_plugin = make_GE_cam,
-        default_plugin_control = ge3_plugin_control,
-        det_mixin = GEMixin,
-        ioc_WIN = True, 
-        pva1_exists = True,
-        use_hdf1 = True,
-        use_tiff1 = False
-    )  
-
-    ge4 = make_det(
-        det_prefix = "GE4:",
-        device_name = "ge4",
-        READ_PATH = READ_PATH["ge4"],
-        WRITE_PATH = WRITE_PATH["ge4"],
-        make_cam_plugin = make_GE_cam,
-        default_plugin_control = ge4_plugin_control,
-        det_mixin = GEMixin,
-        ioc_WIN = True, 
-        pva1_exists = True,
-        use_hdf1 = True, 
-        use_tiff1 = False
-    )  
-
-    ge5 = make_det(
-        det_prefix = "GE5:",
-        device_name = "ge5",
-        READ_PATH = READ_PATH["ge5"],
-        WRITE_PATH = WRITE_PATH["ge5"],
-        make_cam_plugin = make_GE_cam,
-        default_plugin_control = ge5_plugin_control,
-        det_mixin = GEMixin,
-        ioc_WIN = True, 
-        pva1_exists = True,
-        use_hdf1 = True,
-        use_tiff1 = False
-    )  
+    ge1, ge2, ge3, ge4, ge5 = make_dets(
+        dict(
+            det_prefix = "GE1:",
+            device_name = "ge1",
+            READ_PATH = READ_PATH["ge1"],
+            WRITE_PATH = WRITE_PATH["ge1"],
+            make_cam_plugin = make_GE_cam,
+            default_plugin_control = ge1_plugin_control,
+            det_mixin = GEMixin,
+            ioc_WIN = True,
+            pva1_exists = True,
+            use_hdf1 = True,
+            use_tiff1 = False   #FIXME as needed
+        ),
+        dict(
+            det_prefix = "GE2:",
+            device_name = "ge2",
+            READ_PATH = READ_PATH["ge2"],
+            WRITE_PATH = WRITE_PATH["ge2"],
+            make_cam_plugin = make_GE_cam,
+            default_plugin_control = ge2_plugin_control,
+            det_mixin = GEMixin,
+            ioc_WIN = True,
+            pva1_exists = True,
+            use_hdf1 = True,
+            use_tiff1 = False
+        ),
+        dict(
+            det_prefix = "GE3:",
+            device_name = "ge3",
+            READ_PATH = READ_PATH["ge3"],
+            WRITE_PATH = WRITE_PATH["ge3"],
+            make_cam_plugin = make_GE_cam,
+            default_plugin_control = ge3_plugin_control,
+            det_mixin = GEMixin,
+            ioc_WIN = True,
+            pva1_exists = True,
+            use_hdf1 = True,
+            use_tiff1 = False
+        ),
+        dict(
+            det_prefix = "GE4:",
+            device_name = "ge4",
+            READ_PATH = READ_PATH["ge4"],
+            WRITE_PATH = WRITE_PATH["ge4"],
+            make_cam_plugin = make_GE_cam,
+            default_plugin_control = ge4_plugin_control,
+            det_mixin = GEMixin,
+            ioc_WIN = True,
+            pva1_exists = True,
+            use_hdf1 = True,
+            use_tiff1 = False
+        ),
+        dict(
+            det_prefix = "GE5:",
+            device_name = "ge5",
+            READ_PATH = READ_PATH["ge5"],
+            WRITE_PATH = WRITE_PATH["ge5"],
+            make_cam_plugin = make_GE_cam,
+            default_plugin_control = ge5_plugin_control,
+            det_mixin = GEMixin,
+            ioc_WIN = True,
+            pva1_exists = True,
+            use_hdf1 = True,
+            use_tiff1 = False
+        ),
+    )
      
@@ -21,12 +21,17 @@ logger = logging.getLogger(__name__)
 logger.info(__file__)
 
 from ophyd import FormattedComponent, EpicsMotor, Device, Component, EpicsSignal, EpicsSignalRO
+try:
+    from .config_cache import DiffStagingMixin
+except ImportError:     #imported as a top-level module (see `sys.path` in the motor modules)
+    from config_cache import DiffStagingMixin
 
 """ 
 Begin generic device definitions here.
 """
 
-class MPEMotor(EpicsMotor):
+class MPEMotor(DiffStagingMixin, EpicsMotor):
+    #stage() only writes stage_sigs that differ (e.g., velocity), see `config_cache.py`
     #used in fastsweep plans
     backlash_dist = Component(EpicsSignal, ".BDST", kind = "config", auto_monitor = True)
     motor_step_size = Component(EpicsSignal, ".MRES", kind = "config")
@@ -0,0 +1,212 @@
+"""
+Background image statistics of an area detector, published as Signals.
+
+`ImageStatsService` follows a detector's images without reconfiguring it
+or writing files: it monitors the `pva1` PVAccess stream (needs the
+optional `p4p` package) or, failing that, the `image1` plugin's array
+counter. Every `every`-th frame goes to a worker thread that computes
+`analyze_peak()` statistics of the row and column sums (see
+`utils/image_analysis.image_stats()`, optionally binned first) and puts
+them in the service's Signals. Frames arriving while the worker is busy
+replace the one waiting, so a slow analysis never backs up the detector.
+
+Plans read the Signals like any other (`bps.rd(ge1_stats.x_centroid)`)
+and suspenders can watch them, e.g.
+`SuspendFloor(ge1_stats.total, 1e5)` for beam checks.
+
+USAGE::
+
+    ge1_stats = ImageStatsService(ge1, name = "ge1_stats", every = 10, binning = 4)
+    ge1_stats.start()       #pva1 if possible, else image1
+    ge1_stats.x_centroid.get()
+    ge1_stats.stop()
+"""
+
+__all__ = [
+    "ImageStatsService",
+]
+
+#import for logging
+import logging
+logger = logging.getLogger(__name__)
+logger.info(__file__)
+
+#import mod components from ophyd
+from ophyd import Component
+from ophyd import Device
+from ophyd import Signal
+
+#import other stuff
+from ..utils.image_analysis import image_stats
+import numpy as np
+import threading
+
+
+class ImageStatsService(Device):
+    """
+    Peak statistics of every Nth frame of `det`, computed in a worker
+    thread and published as Signals.
+
+    PARAMETERS (besides those of `ophyd.Device`)
+
+    det *area detector object* :
+        Detector made with `make_det()` (or a `LazyDevice` of one).
+
+    every *int* :
+        Analyze one frame in `every`. (default : 10)
+
+    binning *int* :
+        Sum `binning` x `binning` pixel blocks before the row/column sums;
+        positions stay in unbinned pixels. (default : 1)
+
+    source *str or None* :
+        "pva1" or "image1"; None tries pva1 first. (default : None)
+    """
+
+    x_centroid = Component(Signal, value = np.nan, kind = "hinted")
+    x_center = Component(Signal, value = np.nan, kind = "normal")
+    x_fwhm = Component(Signal, value = np.nan, kind = "normal")
+    x_peak = Component(Signal, value = np.nan, kind = "normal")
+    y_centroid = Component(Signal, value = np.nan, kind = "hinted")
+    y_center = Component(Signal, value = np.nan, kind = "normal")
+    y_fwhm = Component(Signal, value = np.nan, kind = "normal")
+    y_peak = Component(Signal, value = np.nan, kind = "normal")
+    total = Component(Signal, value = np.nan, kind = "hinted")
+    max_value = Component(Signal, value = np.nan, kind = "normal")
+    frame = Component(Signal, value = -1, kind = "normal")   #image1 array counter (pva1: frames received) of the analyzed frame
+    source = Component(Signal, value = "", kind = "config")
+
+    def __init__(self, det, *args, every = 10, binning = 1, source = None, **kwargs):
+        kwargs.setdefault("name", f"{det.name}_stats")
+        super().__init__("", *args, **kwargs)
+        self.det = det
+        self.every = every
+        self.binning = binning
+        self._source = source
+        self._count = 0
+        self._pending = None            #(frame number, image) waiting for the worker
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self._worker = None
+        self._running = False
+        self._stop_source = None        #undoes the subscription of the source
+        self.analyzed = 0
+        self.skipped = 0                #frames replaced while the worker was busy
+
+    @property
+    def running(self):
+        return self._running
+
+    def start(self):
+        """Start following the detector (pva1, else image1)."""
+        if self._running:
+            return
+        self._count = 0
+        self._running = True
+        self._worker = threading.Thread(target = self._work, daemon = True, name = f"{self.name}_worker")
+        self._worker.start()
+        if self._source in (None, "pva1"):
+            try:
+                self._start_pva()
+                return
+            except Exception as excuse:
+                if self._source == "pva1":
+                    self.stop()
+                    raise
+                logger.info(f"{self.name}: pva1 not usable ({excuse}), using image1.")
+        self._start_image1()
+
+    def stop(self):
+        """Stop following the detector; the Signals keep the last results."""
+        self._running = False
+        if self._stop_source is not None:
+            self._stop_source()
+            self._stop_source = None
+        self._wakeup.set()
+
+    def _start_pva(self):
+        from p4p.client.thread import Context   #optional, only for pva1
+
+        if "pva1" not in self.det.component_names:
+            raise AttributeError(f"{self.det.name} has no pva1 plugin")
+        pv_name = self.det.pva1.pv_name.get()
+        context = Context("pva")
+
+        def callback(value):
+            #NTNDArray, unwrapped by p4p into a shaped numpy array
+            if isinstance(value, Exception):
+                return
+            self._offer(value)
+
+        subscription = context.monitor(pv_name, callback)
+
+        def stop_source():
+            subscription.close()
+            context.close()
+
+        self._stop_source = stop_source
+        self.source.put(f"pva1:{pv_name}")
+        logger.info(f"{self.name}: following {pv_name}.")
+
+    def _start_image1(self):
+        image1 = self.det.image1
+        token = image1.array_counter.subscribe(self._on_counter, run = False)
+        self._stop_source = lambda: image1.array_counter.unsubscribe(token)
+        self.source.put("image1")
+        logger.info(f"{self.name}: following {image1.name}.")
+
+    def _on_counter(self, value = None, **kwargs):
+        #CA thread: only count here, the worker reads the image
+        self._count += 1
+        if self._count % self.every == 0:
+            with self._lock:
+                if self._pending is not None:
+                    self.skipped += 1
+                self._pending = (value, None)     #image read by the worker
+            self._wakeup.set()
+
+    def _offer(self, image):
+        #p4p thread: frames are numbered as received
+        self._count += 1
+        if self._count % self.every:
+            return
+        with self._lock:
+            if self._pending is not None:
+                self.skipped += 1
+            self._pending = (self._count, image)
+        self._wakeup.set()
+
+    def _work(self):
+        while self._running:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            with self._lock:
+                pending, self._pending = self._pending, None
+            if pending is None or not self._running:
+                continue
+            frame, image = pending
+            try:
+                if image is None:
+                    image = self.det.image1.shaped_image.get()
+                self._publish(frame, np.asarray(image))
+            except Exception as excuse:
+                logger.warning(f"{self.name}: could not analyze frame {frame}: {excuse}")
+
+    def _publish(self, frame, image):
+        if image.ndim == 3:     #color or stacked: sum the planes
+            image = image.sum(axis = -1 if image.shape[-1] <= 4 else 0)
+        horizontal, vertical = image_stats(image, binning = self.binning)
+        for prefix, stats in (("x", horizontal), ("y", vertical)):
+            getattr(self, f"{prefix}_centroid").put(_number(stats["centroid_position"]))
+            getattr(self, f"{prefix}_center").put(_number(stats["center_position"]))
+            getattr(self, f"{prefix}_fwhm").put(_number(stats["fwhm"]))
+            getattr(self, f"{prefix}_peak").put(_number(stats["maximum"][0]))
+        self.total.put(float(image.sum()))
+        self.max_value.put(float(image.max()))
+        self.frame.put(int(frame) if frame is not None else -1)
+        self.analyzed += 1
+
+
+def _number(value):
+    """Float for a Signal, NaN for results `analyze_peak()` could not find."""
+    return float(value) if value is not None else np.nan
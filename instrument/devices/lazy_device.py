@@ -0,0 +1,164 @@
+"""
+Lazy proxy for devices whose hardware may be absent at startup.
+
+`LazyDevice` stands in for a device (or detector) and builds it on first
+attribute access, which includes first use in a plan: the RunEngine reads,
+sets and stages through the proxy. If the device cannot be built or does
+not connect, the error names it and a background thread keeps retrying
+every `retry_period` seconds; once the IOC is back the proxy attaches to
+the new device, without restarting the session (or queueserver
+environment). While the thread retries, attribute access fails at once
+(e.g. for a device in `sd.baseline`); `connect()` still tries right away.
+
+USAGE::
+
+    aps = LazyDevice(lambda: MyAPSMachine(name = "aps"), name = "aps")
+    aps.available       #False until built and connected
+    aps.connect()       #build now (raises ConnectionError if not possible)
+    aps.reset()         #rebuild on next use (e.g., after an IOC changed)
+"""
+
+__all__ = [
+    "LazyDevice",
+]
+
+#import for logging
+import logging
+logger = logging.getLogger(__name__)
+logger.info(__file__)
+
+#import other stuff
+import threading
+import time
+
+
+class LazyDevice(object):
+    """
+    Proxy that builds a device on first use and retries in the background
+    while its IOC is unreachable.
+
+    PARAMETERS
+
+    factory *callable* :
+        Returns the device (e.g., `lambda: EpicsMotor(...)`). A falsy result
+        (such as an `OfflineDetector`) counts as a failure.
+
+    name *str* :
+        Name of the device. Should match the object name in python.
+
+    retry_period *float* :
+        Seconds between background attempts after a failure. (default : 30)
+
+    connection_timeout *float or None* :
+        Seconds to wait for the device to connect when it is built; None
+        uses the device's default, False skips the wait. (default : None)
+    """
+
+    def __init__(self, factory, name, retry_period = 30, connection_timeout = None):
+        self._factory = factory
+        self.name = name
+        self.retry_period = retry_period
+        self.connection_timeout = connection_timeout
+        self._device = None
+        self._error = None
+        self._lock = threading.RLock()
+        self._retry_thread = None
+
+    def _build(self):
+        device = self._factory()
+        if not device:
+            raise ConnectionError(getattr(device, "reason", "not created"))
+        if self.connection_timeout is not False:
+            kwargs = dict(timeout = self.connection_timeout) if self.connection_timeout else {}
+            try:
+                device.wait_for_connection(**kwargs)
+            except Exception:
+                _destroy(device)    #or each retry leaks a device and its CA channels
+                raise
+        return device
+
+    def _unavailable(self):
+        return ConnectionError(
+            f"{self.name} is not available: {self._error}. Retrying every {self.retry_period} s in the background."
+        )
+
+    def connect(self):
+        """Build and connect the device now if not done yet; returns it."""
+        with self._lock:
+            if self._device is None:
+                try:
+                    self._device = self._build()
+                    self._error = None
+                    logger.info(f"{self.name} created on first use.")
+                except Exception as exinfo:
+                    self._error = str(exinfo) or exinfo.__class__.__name__
+                    self.start_retry()
+                    raise self._unavailable() from exinfo
+            return self._device
+
+    def start_retry(self):
+        """Keep trying to build the device in a background thread."""
+        with self._lock:
+            if self._retry_thread is not None and self._retry_thread.is_alive():
+                return
+            self._retry_thread = threading.Thread(target = self._retry, daemon = True, name = f"lazy_{self.name}")
+            self._retry_thread.start()
+
+    def _retry(self):
+        while self._device is None:
+            time.sleep(self.retry_period)
+            try:
+                device = self._build()
+            except Exception as exinfo:
+                self._error = str(exinfo) or exinfo.__class__.__name__
+                logger.debug(f"{self.name} still not available: {self._error}")
+                continue
+            with self._lock:
+                if self._device is not None:
+                    _destroy(device)    #built meanwhile by `connect()`
+                    return
+                self._device = device
+                self._error = None
+            logger.warning(f"{self.name} is available again.")
+
+    def reset(self):
+        """Drop the device; it is built again on next use."""
+        with self._lock:
+            self._device = None
+
+    @property
+    def available(self):
+        """True if the device has been built."""
+        return self._device is not None
+
+    def __bool__(self):
+        #falsy only while known to be unavailable, like `OfflineDetector`
+        return self._device is not None or self._error is None
+
+    def __getattr__(self, attr):
+        if attr.startswith("__") or attr in ("_device", "_factory", "_lock", "_error", "_retry_thread"):
+            raise AttributeError(attr)
+        device = self._device
+        if device is None and self._retry_thread is not None and self._retry_thread.is_alive():
+            raise self._unavailable()   #do not block on a rebuild while the IOC is down
+        return getattr(device if device is not None else self.connect(), attr)
+
+    def __dir__(self):
+        names = set(super().__dir__())
+        if self._device is not None:
+            names.update(dir(self._device))
+        return sorted(names)
+
+    def __repr__(self):
+        if self._device is not None:
+            return repr(self._device)
+        state = f"unavailable: {self._error}" if self._error else "not built yet"
+        return f"{self.__class__.__name__}(name={self.name!r}, {state})"
+
+
+def _destroy(device):
+    """Release the CA channels and subscriptions of a device that is dropped."""
+    try:
+        device.destroy()
+    except Exception as exinfo:
+        logger.debug(f"Could not destroy {getattr(device, 'name', device)}: {exinfo}")
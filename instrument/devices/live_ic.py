@@ -0,0 +1,232 @@
+"""
+Live per-frame IC counts during a fly scan.
+
+The userArrayCalc records (`sample_monitor_array`, ...) can only be read
+back once the sweep is over. `LiveICCollector` monitors the scaler2
+channels feeding them (the same `_cts`/`_calc` PVs, which are processed
+once per frame) and keeps the values in a preallocated ring buffer, one row
+per frame. It is a bluesky flyer: every `bps.collect()` publishes the rows
+completed since the last one as an event page in the "live_ic" stream, so
+beam loss or a drop in transmission shows up mid-sweep
+(see `fly_and_collect(..., live = live_ic)`).
+
+Rows follow the frame counter (`frame_counter.b_value`, counted down once
+per PSO pulse): each count opens the row of that frame, numbered from 0
+since kickoff, so `live_ic_frame` is the frame number even when no IC
+channel changes. CA only posts a value when it changes, so a channel
+without an update keeps its previous value in the new row (e.g. 0 counts
+during beam loss); an update goes to the latest frame counted. A row is
+complete once the next frame is counted, or when monitoring stops.
+"""
+
+__all__ = [
+    "LiveICCollector",
+    "live_ic",
+]
+
+#import for logging
+import logging
+logger = logging.getLogger(__name__)
+logger.info(__file__)
+
+#import mod components from ophyd
+from ophyd import Component
+from ophyd import Device
+from ophyd import DeviceStatus
+from ophyd import EpicsSignalRO
+from ophyd import FormattedComponent
+
+#import other stuff
+import numpy as np
+import threading
+import time
+
+
+class LiveICCollector(Device):
+    """
+    Ring-buffered collector of the per-frame IC scaler values.
+
+    PARAMETERS (besides those of `ophyd.Device`)
+
+    capacity *int* :
+        Frames kept in the ring buffer. Rows not collected before being
+        overwritten are dropped (and counted). (default : 16384)
+
+    rate *float* :
+        Publications per second used by `fly_and_collect()`. (default : 2.0)
+
+    monitor_threshold *float or None* :
+        If set, warn when the median monitor count (`moncnt`) of newly
+        collected rows falls below it (beam loss). (default : None)
+    """
+
+    #channel names match the readback arrays of psofly1 (see `s1id_FPGAs.py`)
+    moncnt = Component(EpicsSignalRO, "_cts2.B", kind = "omitted")   #IC5-E, before the sample
+    trcnt = Component(EpicsSignalRO, "_cts2.C", kind = "omitted")    #pin diode after the sample, IC4-E
+    Emoncnt = Component(EpicsSignalRO, "_cts2.A", kind = "omitted")  #after US Kohzu slits, IC3-E
+    Etrcnt = Component(EpicsSignalRO, "_cts1.D", kind = "omitted")   #IC2-E split IC, bottom
+    cntticks = Component(EpicsSignalRO, "_calc5.VAL", kind = "omitted")  #integrated time
+    frame_counter = FormattedComponent(EpicsSignalRO, "1id:userTran10.B", kind = "omitted")  #frame_counter.b_value
+
+    channels = ("moncnt", "trcnt", "Emoncnt", "Etrcnt", "cntticks")
+
+    stream_name = "live_ic"
+
+    def __init__(self, *args, capacity = 16384, rate = 2.0, monitor_threshold = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.capacity = capacity
+        self.rate = rate
+        self.monitor_threshold = monitor_threshold
+        self._buffer = np.full((capacity, len(self.channels)), np.nan)
+        self._times = np.zeros(capacity)
+        self._last = np.full(len(self.channels), np.nan)   #latest value per channel, carried into new rows
+        self._armed = None          #frame counter at kickoff; the first count is frame 0
+        self._frames = 0            #frames counted (rows opened)
+        self._monitoring = False
+        self._published = 0
+        self.dropped_rows = 0
+        self._lock = threading.Lock()
+        self._tokens = []
+
+    def _reset(self):
+        last = np.full(len(self.channels), np.nan)
+        for column, name in enumerate(self.channels):
+            #a channel that does not change during the first frame posts nothing
+            try:
+                last[column] = getattr(self, name).get()
+            except Exception as excuse:
+                logger.debug(f"{self.name}: could not read {name}: {excuse}")
+        try:
+            armed = self.frame_counter.get()
+        except Exception as excuse:
+            logger.debug(f"{self.name}: could not read the frame counter: {excuse}")
+            armed = None
+        with self._lock:
+            self._buffer[:] = np.nan
+            self._times[:] = 0
+            self._last[:] = last
+            self._armed = armed
+            self._frames = 0
+            self._published = 0
+            self.dropped_rows = 0
+
+    def _on_counter(self, value = None, timestamp = None, **kwargs):
+        #runs in the CA callback thread: open the row of each frame counted
+        with self._lock:
+            if self._armed is None:
+                self._armed = value + 1
+            frame = int(round(self._armed - value)) - 1
+            if frame < self._frames:
+                return      #re-armed or repeated value
+            #a skipped count (monitor not delivered) still gets its row
+            self._frames = max(self._frames, frame + 1 - self.capacity)
+            while self._frames <= frame:
+                row = self._frames % self.capacity
+                self._buffer[row] = self._last
+                self._times[row] = timestamp if timestamp is not None else time.time()
+                self._frames += 1
+
+    def _on_value(self, column, value = None, **kwargs):
+        #runs in the CA callback thread: the value belongs to the latest frame counted
+        with self._lock:
+            self._last[column] = value
+            if self._frames:
+                self._buffer[(self._frames - 1) % self.capacity, column] = value
+
+    @property
+    def frames_complete(self):
+        """Frames that can no longer change: all but the open one while
+        monitoring, all of them afterwards."""
+        return self._frames - 1 if self._monitoring and self._frames else self._frames
+
+    def kickoff(self):
+        """Start monitoring (fresh buffer). While already monitoring this
+        does nothing, so it may be repeated before each `bps.collect()`."""
+        if not self._tokens:
+            self._reset()
+            self._monitoring = True
+            for column, name in enumerate(self.channels):
+                signal = getattr(self, name)
+                token = signal.subscribe(
+                    lambda column = column, **kwargs: self._on_value(column, **kwargs),
+                    run = False,
+                )
+                self._tokens.append((signal, token))
+            token = self.frame_counter.subscribe(self._on_counter, run = False)
+            self._tokens.append((self.frame_counter, token))
+        status = DeviceStatus(self)
+        status.set_finished()
+        return status
+
+    def complete(self):
+        """Stop monitoring; rows not yet collected are kept for `bps.collect()`."""
+        for signal, token in self._tokens:
+            signal.unsubscribe(token)
+        self._tokens = []
+        with self._lock:
+            self._monitoring = False
+        status = DeviceStatus(self)
+        status.set_finished()
+        return status
+
+    def latest(self, nrows = 100):
+        """The last `nrows` complete rows as a dict of arrays (for plots/checks)."""
+        with self._lock:
+            end = self.frames_complete
+            start = max(end - min(nrows, self.capacity), 0)
+            rows = np.arange(start, end)
+            values = self._buffer[rows % self.capacity].copy()
+        data = {name: values[:, column] for column, name in enumerate(self.channels)}
+        data["frame"] = rows
+        return data
+
+    def _new_rows(self):
+        """Frame numbers, times and values of the rows not yet collected."""
+        with self._lock:
+            end = self.frames_complete
+            start = self._published
+            if end - start > self.capacity:
+                dropped = end - start - self.capacity
+                self.dropped_rows += dropped
+                logger.warning(f"{self.name}: {dropped} rows overwritten before collection.")
+                start = end - self.capacity
+            rows = np.arange(start, end)
+            values = self._buffer[rows % self.capacity].copy()
+            times = self._times[rows % self.capacity].copy()
+            self._published = end
+
+        if self.monitor_threshold is not None and len(rows):
+            monitor = np.nanmedian(values[:, self.channels.index("moncnt")])
+            if monitor < self.monitor_threshold:
+                logger.warning(f"{self.name}: monitor counts {monitor:.0f} below {self.monitor_threshold} near frame {rows[-1]}.")
+                print(f"WARNING! Monitor counts dropped to {monitor:.0f} near frame {rows[-1]} (beam loss?).")
+        return rows, times, values
+
+    def describe_collect(self):
+        """Describe the per-frame rows written by `collect_pages()`."""
+        desc = {f"{self.name}_frame": dict(source = f"PV:{self.frame_counter.pvname}", dtype = "integer", shape = [])}
+        for name in self.channels:
+            signal = getattr(self, name)
+            desc[f"{self.name}_{name}"] = dict(source = f"PV:{signal.pvname}", dtype = "number", shape = [])
+        return {self.stream_name: desc}
+
+    def _page(self):
+        rows, times, values = self._new_rows()
+        data = {f"{self.name}_frame": rows}
+        for column, name in enumerate(self.channels):
+            data[f"{self.name}_{name}"] = values[:, column]
+        timestamps = {key: times for key in data}
+        return times, data, timestamps
+
+    def collect_pages(self):
+        """Yield the rows completed since the last collection as one event page."""
+        times, data, timestamps = self._page()
+        if len(times):
+            yield dict(
+                time = times.tolist(),
+                data = {key: value.tolist() for key, value in data.items()},
+                timestamps = {key: value.tolist() for key, value in timestamps.items()},
+            )
+
+
+live_ic = LiveICCollector("1ide:S2:scaler2", name = "live_ic")
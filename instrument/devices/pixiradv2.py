@@ -40,6 +40,7 @@ from ophyd.areadetector import PixiradDetectorCam
 
 #import other stuff
 from .. import iconfig
+from ..utils.hdf5_benchmark import hdf5_profile_args
 from .s1id_FPGAs import hem_info
 import bluesky.plan_stubs as bps
 
@@ -146,7 +147,6 @@ class PixiradMixin(object):
                 self.hdf1.create_directory, -5,
                 self.hdf1.auto_increment, 'Yes',
                 self.hdf1.file_template, '%s%s_%06d.h5',
-                self.hdf1.compression, 'None',
                 self.hdf1.num_data_bits, 8,
                 self.hdf1.data_bits_offset, 0,
                 self.hdf1.szip_num_pixels, 16,
@@ -154,10 +154,8 @@ class PixiradMixin(object):
                 self.hdf1.store_perform, 'Yes',
                 self.hdf1.store_attr, 'Yes',
                 self.hdf1.swmr_mode, 'Off',
-                self.hdf1.blosc_shuffle, 'Byte',
-                self.hdf1.blosc_compressor, 'BloscLZ',
-                self.hdf1.blosc_level, 5,
-                self.hdf1.xml_file_name, DEFAULT_XML_LAYOUT[self.name]
+                self.hdf1.xml_file_name, DEFAULT_XML_LAYOUT[self.name],
+                *hdf5_profile_args(self),   #compression and chunking, see `utils/hdf5_benchmark.py`
             )
         
 
@@ -356,32 +356,33 @@ class PointGreyVanillaMixin(object):
 if "1-ID" in beamline:    
 
     #create pointgrey objects on linux machine using ADaravis drivers
-    grasshopper1 = make_det(
-        det_prefix = "1idGH1:",
-        device_name = "grasshopper1",
-        READ_PATH = READ_PATH["grasshopper1"],
-        WRITE_PATH = WRITE_PATH["grasshopper1"],
-        make_cam_plugin = make_aravisPG_cam,
-        default_plugin_control = grasshopper1_plugin_control,
-        det_mixin = PointGreyARVMixin,
-        ioc_WIN = False,
-        pva1_exists = True,
-        use_hdf1 = True,
-        use_tiff1 = True
-    )
-
-    pointgrey5 = make_det(
-        det_prefix = "1idPG5:",
-        device_name = "pointgrey5",
-        READ_PATH = READ_PATH["pointgrey5"],
-        WRITE_PATH = WRITE_PATH["pointgrey5"],
-        make_cam_plugin = make_aravisPG_cam,
-        default_plugin_control = pointgrey5_plugin_control,
-        det_mixin = PointGreyARVMixin,
-        ioc_WIN = False,
-        pva1_exists = True,
-        use_hdf1 = True,
-        use_tiff1 = True
+    grasshopper1, pointgrey5 = make_dets(
+        dict(
+            det_prefix = "1idGH1:",
+            device_name = "grasshopper1",
+            READ_PATH = READ_PATH["grasshopper1"],
+            WRITE_PATH = WRITE_PATH["grasshopper1"],
+            make_cam_plugin = make_aravisPG_cam,
+            default_plugin_control = grasshopper1_plugin_control,
+            det_mixin = PointGreyARVMixin,
+            ioc_WIN = False,
+            pva1_exists = True,
+            use_hdf1 = True,
+            use_tiff1 = True
+        ),
+        dict(
+            det_prefix = "1idPG5:",
+            device_name = "pointgrey5",
+            READ_PATH = READ_PATH["pointgrey5"],
+            WRITE_PATH = WRITE_PATH["pointgrey5"],
+            make_cam_plugin = make_aravisPG_cam,
+            default_plugin_control = pointgrey5_plugin_control,
+            det_mixin = PointGreyARVMixin,
+            ioc_WIN = False,
+            pva1_exists = True,
+            use_hdf1 = True,
+            use_tiff1 = True
+        ),
     )
 
 #     pointgrey1 = make_det(
@@ -0,0 +1,239 @@
+"""
+PSO taxi & fly device, shared by the PSO controllers at 1-ID and 20-ID
+(see `s1id_FPGAs.psofly1` and `s20id_pso.s20_psofly`).
+
+Besides the taxi/fly busy records, `PSOTaxiFlyDevice` is a bluesky flyer:
+`kickoff()` starts the fly, `complete()` finishes with it, and
+`collect_pages()` (run by `bps.collect()`) reads the per-frame arrays
+registered with `set_readback_arrays()` (e.g., the IC userArrayCalcs) back
+as a single event page, one row per frame.
+
+USAGE::
+
+    psofly1.set_readback_arrays(
+        moncnt = sample_monitor_array.bb_value,
+        trcnt = sample_transmission_array.bb_value,
+    )
+
+    #after configuring the flyer and taxiing
+    yield from bps.kickoff(psofly1, wait=True)
+    yield from bps.complete(psofly1, wait=True)
+    yield from bps.collect(psofly1)
+"""
+
+__all__ = [
+    "MyBusyRecord",
+    "PSOTaxiFlyDevice",
+]
+
+#import for logging
+import logging
+logger = logging.getLogger(__name__)
+logger.info(__file__)
+
+#import mod components from ophyd
+from ophyd import DeviceStatus
+from ophyd import Component
+from ophyd import EpicsSignal
+from ophyd import EpicsSignalRO
+from ophyd import Device
+from ophyd import Signal
+
+#import other stuff
+from bluesky import plan_stubs as bps
+import numpy as np
+import time
+from apstools.synApps import BusyRecord
+
+
+class MyBusyRecord(BusyRecord):
+    timeout = Component(Signal, value=10, kind="config")
+
+    def trigger(self):
+        """
+        Start this busy record and return status to monitor completion.
+
+        This method is called from 'bps.trigger(busy, wait=True)'.
+        """
+        status = DeviceStatus(self, timeout=self.timeout.get())
+
+        def watch_state(old_value, value, **kwargs):
+            if old_value in (1, "Busy") and value not in (1, "Busy"):
+                # When busy finishes, state changes from 1 to 0.
+                status.set_finished()
+                self.state.clear_sub(watch_state)
+
+        # Push the Busy button...
+        self.state.put(1)  # use number instead of "Taxi" text or "Fly" text.
+        # Start a CA monitor on self.state, call watch_state() with updates.
+        self.state.subscribe(watch_state)
+
+        # And return the DeviceStatus object.
+        # The caller can use it to tell when the action is complete.
+        return status
+
+
+class PSOTaxiFlyDevice(Device):
+    """PSO taxi & fly device, usable as a bluesky flyer."""
+
+    taxi = Component(MyBusyRecord, "taxi", kind="omitted")
+    fly = Component(MyBusyRecord, "fly", kind="omitted")
+
+    #(spec macro vars are commented after)
+    start_position = Component(EpicsSignal, "startPos", kind="config")  #start_
+    end_position = Component(EpicsSignal, "endPos", kind="config")  #end_
+    slew_speed = Component(EpicsSignal, "slewSpeed", kind="config") #_speed
+    scan_delta = Component(EpicsSignal, "scanDelta", kind="config") #step_
+    delta_time = Component(EpicsSignalRO, "deltaTime", kind="config")   #not used
+    pulse_type = Component(EpicsSignal, "pulseType", kind="config") #_pls_type
+    detector_setup_time = Component(EpicsSignal, "detSetupTime", kind="config") #_det_setup
+    scan_control = Component(EpicsSignal, "scanControl", kind="config") #_scan_control
+
+    #name of the stream the collected frames are written to
+    stream_name = "primary"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._readback_arrays = {}
+        self._fly_status = None
+        self._kickoff_info = None
+
+    def taxi_fly_plan(self):
+        yield from bps.trigger(self.taxi, wait=True)
+        yield from bps.trigger(self.fly, wait=True)
+
+    def configure(
+            self,
+            pulse_type,
+            start_pos,
+            end_pos,
+            scan_speed_dps,
+            scan_delta,
+            gap_time
+    ):
+        """Method for configuring PSO device at beginning of flyscan.
+        Populates fields in MEDM window automatically."""
+
+        yield from bps.mv(
+            self.pulse_type, pulse_type,
+            self.start_position, start_pos,
+            self.end_position, end_pos,
+            self.slew_speed, scan_speed_dps,
+            self.scan_delta, scan_delta,
+            self.detector_setup_time, gap_time
+        )
+
+    def set_readback_arrays(self, **arrays):
+        """
+        Register the per-frame arrays read back by `collect_pages()`.
+
+        Keyword names become the data keys (prefixed with the device
+        name), values are array signals filled one element per frame with
+        the newest frame at index 0 (userArrayCalc "C?(BB>>1)+AA:BB").
+        Calling again replaces the registered arrays.
+        """
+        self._readback_arrays = dict(arrays)
+
+    def read_arrays(self, npoints = None):
+        """
+        Return the registered readback arrays in acquisition order
+        (oldest frame first), `npoints` values each (padded with NaN).
+
+        PARAMETERS
+
+        npoints *int or None* :
+            Number of frames to read back. If None, the number of frames
+            of the last kickoff. (default : None)
+        """
+        if npoints is None:
+            if self._kickoff_info is None:
+                raise RuntimeError(f"{self.name}: no kickoff yet, npoints must be given.")
+            npoints = self._kickoff_info["nframes"]
+
+        arrays = {}
+        for key, signal in self._readback_arrays.items():
+            values = np.asarray(signal.get(), dtype = float)[:npoints][::-1]  #newest frame is first
+            if len(values) < npoints:
+                logger.warning(f"{signal.name} holds {len(values)} values for {npoints} frames.")
+                values = np.concatenate([np.full(npoints - len(values), np.nan), values])
+            arrays[key] = values
+        return arrays
+
+    def kickoff(self):
+        """Start the fly (the taxi must already be done).
+        Returns a status that is finished once the fly has been started."""
+
+        start = self.start_position.get()
+        end = self.end_position.get()
+        delta = self.scan_delta.get()
+        if not delta:
+            raise ValueError(f"{self.name}: scan delta is not set, configure the flyer first.")
+        self._kickoff_info = dict(
+            start = start,
+            delta = delta if end >= start else -delta,
+            nframes = int(round(abs(end - start)/delta)),
+            speed = self.slew_speed.get(),
+            time = time.time(),
+        )
+
+        self._fly_status = self.fly.trigger()
+        status = DeviceStatus(self)
+        status.set_finished()
+        return status
+
+    def complete(self):
+        """Returns the status of the fly started by `kickoff()`."""
+        if self._fly_status is None:
+            raise RuntimeError(f"{self.name}: complete() called before kickoff().")
+        return self._fly_status
+
+    def describe_collect(self):
+        """Describe the per-frame stream written by `collect_pages()`."""
+        desc = {
+            f"{self.name}_frame": dict(source = "computed", dtype = "integer", shape = []),
+            f"{self.name}_omega": dict(source = "computed", dtype = "number", shape = []),
+        }
+        for key, signal in self._readback_arrays.items():
+            desc[f"{self.name}_{key}"] = dict(source = f"PV:{signal.pvname}", dtype = "number", shape = [])
+        return {self.stream_name: desc}
+
+    def _frame_table(self):
+        """Read the arrays back and return (times, data, timestamps),
+        one entry per frame, in acquisition order."""
+
+        info = self._kickoff_info
+        if info is None:
+            raise RuntimeError(f"{self.name}: collect() called before kickoff().")
+
+        nframes = info["nframes"]
+        frames = np.arange(nframes)
+
+        #frame centers
+        omega = info["start"] + (frames + 0.5) * info["delta"]
+
+        #approximate per-frame event times from the fly speed
+        if info["speed"]:
+            frame_time = abs(info["delta"])/info["speed"]
+        else:
+            frame_time = 0
+        times = info["time"] + (frames + 0.5) * frame_time
+
+        data = {
+            f"{self.name}_frame": frames,
+            f"{self.name}_omega": omega,
+        }
+        timestamps = {key: times for key in data}
+        for key, values in self.read_arrays(nframes).items():
+            data[f"{self.name}_{key}"] = values
+            timestamps[f"{self.name}_{key}"] = np.full(nframes, self._readback_arrays[key].timestamp)
+
+        return times, data, timestamps
+
+    def collect_pages(self):
+        """Yield all frames as a single event page."""
+        times, data, timestamps = self._frame_table()
+        yield dict(
+            time = times.tolist(),
+            data = {key: value.tolist() for key, value in data.items()},
+            timestamps = {key: value.tolist() for key, value in timestamps.items()},
+        )
@@ -231,30 +231,31 @@ class RetigaMixin(object):
 if "1-ID" in beamline:
 
     #create RETIGA objects
-    retiga_tomo = make_det(
-        det_prefix = "QIMAGE2:",
-        device_name = "retiga_tomo",
-        READ_PATH = READ_PATH["retiga_tomo"],
-        WRITE_PATH = WRITE_PATH["retiga_tomo"],
-        make_cam_plugin = make_retiga_cam,
-        default_plugin_control = retiga_tomo_plugin_control,
-        det_mixin = RetigaMixin,
-        ioc_WIN = True, 
-        pva1_exists = False,
-        use_hdf1 = False, 
-        use_tiff1 = True
-    )
-
-    retiga_nf = make_det(
-        det_prefix = "QIMAGE1:", 
-        device_name = "retiga_nf",
-        READ_PATH = READ_PATH["retiga_nf"],
-        WRITE_PATH = WRITE_PATH["retiga_nf"],
-        make_cam_plugin = make_retiga_cam,
-        default_plugin_control = retiga_nf_plugin_control,
-        det_mixin = RetigaMixin, 
-        ioc_WIN = True, 
-        pva1_exists = False, 
-        use_hdf1 = False, 
-        use_tiff1 = True
+    retiga_tomo, retiga_nf = make_dets(
+        dict(
+            det_prefix = "QIMAGE2:",
+            device_name = "retiga_tomo",
+            READ_PATH = READ_PATH["retiga_tomo"],
+            WRITE_PATH = WRITE_PATH["retiga_tomo"],
+            make_cam_plugin = make_retiga_cam,
+            default_plugin_control = retiga_tomo_plugin_control,
+            det_mixin = RetigaMixin,
+            ioc_WIN = True,
+            pva1_exists = False,
+            use_hdf1 = False,
+            use_tiff1 = True
+        ),
+        dict(
+            det_prefix = "QIMAGE1:",
+            device_name = "retiga_nf",
+            READ_PATH = READ_PATH["retiga_nf"],
+            WRITE_PATH = WRITE_PATH["retiga_nf"],
+            make_cam_plugin = make_retiga_cam,
+            default_plugin_control = retiga_nf_plugin_control,
+            det_mixin = RetigaMixin,
+            ioc_WIN = True,
+            pva1_exists = False,
+            use_hdf1 = False,
+            use_tiff1 = True
+        ),
     )
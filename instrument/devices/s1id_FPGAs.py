@@ -27,6 +27,7 @@ __all__ = [
     "frame_counter",
     "det_pulse_to_ad",
     "struck",
+    "fpga_cache",
 ]
 
 #fmt: on
@@ -37,82 +38,15 @@ logger = logging.getLogger(__name__)
 logger.info(__file__)
 
 #import mod components from ophyd
-from ophyd import DeviceStatus
 from ophyd import Component
 from ophyd import EpicsSignal
-from ophyd import EpicsSignalRO
 from ophyd import Device
-from ophyd import Signal
 
 #import other stuff
 from bluesky import plan_stubs as bps
 import time
-from apstools.synApps import BusyRecord
-
-class MyBusyRecord(BusyRecord):
-    timeout = Component(Signal, value=10, kind="config")
-
-    def trigger(self):
-        """
-        Start this busy record and return status to monitor completion.
-
-        This method is called from 'bps.trigger(busy, wait=True)'.
-        """
-        status = DeviceStatus(self, timeout=self.timeout.get())
-
-        def watch_state(old_value, value, **kwargs):
-            if old_value in (1, "Busy") and value not in (1, "Busy"):
-                # When busy finishes, state changes from 1 to 0.
-                status.set_finished()
-                self.state.clear_sub(watch_state)
-
-        # Push the Busy button...
-        self.state.put(1)  # use number instead of "Taxi" text or "Fly" text.
-        # Start a CA monitor on self.state, call watch_state() with updates.
-        self.state.subscribe(watch_state)
-
-        # And return the DeviceStatus object.
-        # The caller can use it to tell when the action is complete.
-        return status
-
-class PSOTaxiFlyDevice(Device):
-    """PSO taxi & fly device."""
-    taxi = Component(MyBusyRecord, "taxi", kind="omitted")
-    fly = Component(MyBusyRecord, "fly", kind="omitted")
-    start_position = Component(EpicsSignal, "startPos", kind="config")
-    end_position = Component(EpicsSignal, "endPos", kind="config")
-    slew_speed = Component(EpicsSignal, "slewSpeed", kind="config")
-    scan_delta = Component(EpicsSignal, "scanDelta", kind="config")
-    delta_time = Component(EpicsSignalRO, "deltaTime", kind="config")
-    pulse_type = Component(EpicsSignal, "pulseType", kind="config")
-    detector_setup_time = Component(EpicsSignal, "detSetupTime", kind="config")
-    scan_control = Component(EpicsSignal, "scanControl", kind="config")
-
-    def taxi_fly_plan(self):
-        yield from bps.trigger(self.taxi, wait=True)
-        yield from bps.trigger(self.fly, wait=True)
-
-    def configure(
-            self,
-            pulse_type,
-            start_pos,
-            end_pos, 
-            scan_speed_dps, 
-            scan_delta, 
-            gap_time
-    ):
-        """Method for configuring PSO device at beginning of flyscan. 
-        Populates fields in MEDM window automatically."""
-
-        yield from bps.mv(
-            self.pulse_type, pulse_type,
-            self.start_position, start_pos,
-            self.end_position, end_pos,
-            self.slew_speed, scan_speed_dps,
-            self.scan_delta, scan_delta,
-            self.detector_setup_time, gap_time
-        )
-
+from .config_cache import ConfigCache
+from .pso_fly_device import PSOTaxiFlyDevice
 
 psofly1 = PSOTaxiFlyDevice("1ide:PSOFly1:", name="psofly1")
 
@@ -388,4 +322,51 @@ class Struck(Device):
     channel_advance = Component(EpicsSignal, "ChannelAdvance")
     erase_start = Component(EpicsSignal, "EraseStart")
 
-struck = Struck("1id:mcs:", name = "struck")
\ No newline at end of file
+struck = Struck("1id:mcs:", name = "struck")
+
+
+#per-frame arrays read back by psofly1.collect_pages() (names preserved from spec macro)
+psofly1.set_readback_arrays(
+    moncnt = sample_monitor_array.bb_value,
+    trcnt = sample_transmission_array.bb_value,
+    Emoncnt = energy_monitor_array.bb_value,
+    Etrcnt = intensity_transmission_array.bb_value,
+    cntticks = integrated_time_array.bb_value,
+    timestamp = timestamp_array.bb_value,
+)
+
+
+#write-if-different cache for the fly scan configuration of the devices above
+#cached values are dropped on disconnect; `fpga_cache.invalidate()` forces a full rewrite
+fpga_cache = ConfigCache(
+    name = "fpga_cache",
+    devices = [
+        fake_gate,
+        time_counter,
+        det_ready,
+        softglue,
+        softglue2,
+        softglue3,
+        softglue4,
+        det_status_monitor,
+        scaler_trigger,
+        sample_monitor_array,
+        sample_transmission_array,
+        energy_monitor_array,
+        intensity_transmission_array,
+        integrated_time_array,
+        timestamp_array,
+        frame_counter,
+        det_pulse_to_ad,
+    ],
+    always_write = [
+        det_ready.clear,    #"0!" is a pulse, not a state
+        #per-frame data arrays: reset every sweep, and a monitor would resend the whole array on every frame
+        sample_monitor_array.bb_value,
+        sample_transmission_array.bb_value,
+        energy_monitor_array.bb_value,
+        intensity_transmission_array.bb_value,
+        integrated_time_array.bb_value,
+        timestamp_array.bb_value,
+    ],
+)
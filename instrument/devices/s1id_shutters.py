@@ -22,15 +22,23 @@ logger.info(__file__)
 from ophyd import EpicsMotor, Device, Component
 from apstools.devices import EpicsOnOffShutter, ApsPssShutterWithStatus
 from generic_motors import * #generic_motors.py MUST be in devices folder
+from .lazy_device import LazyDevice
 
-shutter_a = ApsPssShutterWithStatus("1id:shutterA:", "PA:01ID:STA_A_FES_OPEN_PL", name = "shutter_a")
+#shutters are built on first use (see `lazy_device.py`)
+shutter_a = LazyDevice(
+    lambda: ApsPssShutterWithStatus("1id:shutterA:", "PA:01ID:STA_A_FES_OPEN_PL", name = "shutter_a"),
+    name = "shutter_a",
+)
 
 
 class FastShutterB(Device): ...
     #stuff goes here
     
 
-shutter_c = ApsPssShutterWithStatus("1id:shutterC:", "PA:01ID:STA_C_SCS_OPEN_PL", name = "shutter_c")
+shutter_c = LazyDevice(
+    lambda: ApsPssShutterWithStatus("1id:shutterC:", "PA:01ID:STA_C_SCS_OPEN_PL", name = "shutter_c"),
+    name = "shutter_c",
+)
 
 #Removed this shutter from hutch design 05/03/24 VC
 # class FastShutterC(Device):
@@ -57,6 +57,7 @@ sys.path.append(str(pathlib.Path.home() / "bluesky/instrument/devices"))
 from generic_motors import * #generic_motors.py MUST be in devices folder
 
 from ophyd import Component, Device, EpicsMotor
+from .lazy_device import LazyDevice
 
 
 """ 
@@ -145,7 +146,7 @@ class SamWheel(Device):
     x    = Component(MPEMotor, "m58")
     rotz = Component(MPEMotor, "m55")
     
-sam_wheel = SamWheel("1ide1:", name = "sam_wheel") #motor cables not connected
+sam_wheel = LazyDevice(lambda: SamWheel("1ide1:", name = "sam_wheel"), name = "sam_wheel") #motor cables not connected; built on first use
 
 """ 
 In situ devices -----------------------------------------------------------
@@ -169,7 +170,7 @@ class RFTube(Device):
     coil_z    = Component(MPEMotor, "m61")
     coil_roty = Component(MPEMotor, "m60")
     
-rf_tube = RFTube("1ide1:", name = "rf_tube")   #motor cables not connected
+rf_tube = LazyDevice(lambda: RFTube("1ide1:", name = "rf_tube"), name = "rf_tube")   #motor cables not connected; built on first use
 
 
 class AM(Device):
@@ -179,7 +180,7 @@ class AM(Device):
     chamber_x = Component(MPEMotor, "m68")
     chamber_y = Component(MPEMotor, "m76")
     
-am = AM("1ide1:", name = "am")     #motor cables not connected
+am = LazyDevice(lambda: AM("1ide1:", name = "am"), name = "am")     #motor cables not connected; built on first use
 
 """ 
 Load frames -------------------------------------------------------------------
@@ -195,7 +196,7 @@ class MTS(Device):
     x2          = Component(MPEMotor, "m9",   kind = "hinted")
     roty        = Component(MPEMotor, "m4",   kind = "hinted")
 
-mts = MTS("1ide1:", name = "mts")  #motor and signal cables not connected
+mts = LazyDevice(lambda: MTS("1ide1:", name = "mts"), name = "mts")  #motor and signal cables not connected; built on first use
 
 
 class RAMS3(Device):
@@ -210,7 +211,7 @@ class RAMS3(Device):
     cen         = Component(MPEMotor, "1idrams3:m4")
     offset      = Component(MPEMotor, "1idrams3:m5") 
     
-rams3 = RAMS3("", name = "rams3")  #motor cables not connected
+rams3 = LazyDevice(lambda: RAMS3("", name = "rams3"), name = "rams3")  #motor cables not connected; built on first use
 
 
 class OWIS(Device):
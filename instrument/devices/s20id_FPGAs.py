@@ -20,7 +20,7 @@ from ophyd import DeviceStatus
 from ophyd import Component
 from ophyd import EpicsSignal
 from ophyd import EpicsSignalRO
-from opyhd import EpicsMotor
+from ophyd import EpicsMotor
 from ophyd import Device
 from ophyd import Signal
 
@@ -0,0 +1,23 @@
+"""
+Scaler classes, kept apart from the scaler objects of `s1ide_scalers.py`
+(whose channels are read when they are created), so the classes can be
+used without contacting the IOC (e.g., `utils/plan_benchmark.py` builds
+fake scalers from them).
+"""
+
+__all__ = [
+    "EHutchScaler2",
+]
+
+#import for logging
+import logging
+logger = logging.getLogger(__name__)
+logger.info(__file__)
+
+from ophyd.scaler import ScalerCH
+from ophyd import Component, EpicsSignal
+
+#make a special class for scaler2 in E hutch 
+class EHutchScaler2(ScalerCH):
+    normalized_counts = Component(EpicsSignal, "_calc_ctrl.VAL", kind = "config")
+    enable_calcs = Component(EpicsSignal, "_calcEnable.VAL", kind = "config")
@@ -156,31 +156,32 @@ class SpectrumLogicMixin(object):
 
 if "20-ID" in beamline: 
     
-    SPLogic1 = make_det(
-        det_prefix = "",    #FIXME: add prefix
-        device_name = "SPLogic1",
-        READ_PATH = READ_PATH["SPLogic1"],
-        WRITE_PATH = WRITE_PATH["SPLogic1"],
-        make_cam_plugin = make_splogic_cam,
-        default_plugin_control = SPLogic1_plugin_control,
-        det_mixin = SpectrumLogicMixin, 
-        ioc_WIN = True, 
-        pva1_exists = True,
-        use_hdf1= True,
-        use_tiff1 = True
-    )    
-
-    SPLogic2 = make_det(
-        det_prefix = "",    #FIXME: add prefix
-        device_name = "SPLogic2",
-        READ_PATH = READ_PATH["SPLogic2"],
-        WRITE_PATH = WRITE_PATH["SPLogic2"],
-        make_cam_plugin = make_splogic_cam,
-        default_plugin_control = SPLogic2_plugin_control,
-        det_mixin = SpectrumLogicMixin, 
-        ioc_WIN = True, 
-        pva1_exists = True,
-        use_hdf1= True,
-        use_tiff1 = True
-    )   
+    SPLogic1, SPLogic2 = make_dets(
+        dict(
+            det_prefix = "",    #FIXME: add prefix
+            device_name = "SPLogic1",
+            READ_PATH = READ_PATH["SPLogic1"],
+            WRITE_PATH = WRITE_PATH["SPLogic1"],
+            make_cam_plugin = make_splogic_cam,
+            default_plugin_control = SPLogic1_plugin_control,
+            det_mixin = SpectrumLogicMixin,
+            ioc_WIN = True,
+            pva1_exists = True,
+            use_hdf1= True,
+            use_tiff1 = True
+        ),
+        dict(
+            det_prefix = "",    #FIXME: add prefix
+            device_name = "SPLogic2",
+            READ_PATH = READ_PATH["SPLogic2"],
+            WRITE_PATH = WRITE_PATH["SPLogic2"],
+            make_cam_plugin = make_splogic_cam,
+            default_plugin_control = SPLogic2_plugin_control,
+            det_mixin = SpectrumLogicMixin,
+            ioc_WIN = True,
+            pva1_exists = True,
+            use_hdf1= True,
+            use_tiff1 = True
+        ),
+    )
     
@@ -48,6 +48,7 @@ from ophyd import EpicsSignalRO
 import bluesky.plan_stubs as bps
 import pathlib
 from .. import iconfig
+from ..utils.hdf5_benchmark import hdf5_profile_args
 
 #pick which beamline we are operating at 
 beamline = iconfig["RUNENGINE_METADATA"]["beamline_id"]
@@ -221,7 +222,6 @@ class VarexMixin(object):
             self.hdf1.create_directory, -3,
             self.hdf1.auto_increment, 'Yes',
             self.hdf1.file_template, '%s%s_%06d.h5',
-            self.hdf1.compression, 'None',
             self.hdf1.num_data_bits, 8,
             self.hdf1.data_bits_offset, 0,
             self.hdf1.szip_num_pixels, 16,
@@ -229,10 +229,8 @@ class VarexMixin(object):
             self.hdf1.store_perform, 'Yes',
             self.hdf1.store_attr, 'Yes',
             self.hdf1.swmr_mode, 'Off',
-            self.hdf1.blosc_shuffle, 'Byte',
-            self.hdf1.blosc_compressor, 'BloscLZ',
-            self.hdf1.blosc_level, 5,
-            self.hdf1.xml_file_name, DEFAULT_XML_LAYOUT[self.name]
+            self.hdf1.xml_file_name, DEFAULT_XML_LAYOUT[self.name],
+            *hdf5_profile_args(self),   #compression and chunking, see `utils/hdf5_benchmark.py`
         )
     
 
@@ -380,37 +378,37 @@ class VarexMixin(object):
 
 
 if "20-ID" in beamline: 
-    #create VAREX object for 20-ID-D detector
-    varex20idff = make_det(
-        det_prefix = "20IDFF:",
-        device_name = "varex20idff",
-        #local_drive = "M:",
-        READ_PATH = READ_PATH["varex20idff"],
-        WRITE_PATH = WRITE_PATH["varex20idff"],
-        make_cam_plugin = make_varex_cam,
-        default_plugin_control = varex20idff_plugin_control,
-        det_mixin = VarexMixin, 
-        ioc_WIN = True, 
-        pva1_exists = True,
-        use_hdf1= True,
-        use_tiff1 = True
-    )    
-
-    #create VAREX object for 20-ID-E detector
-    s20varex2 = make_det(
-        det_prefix = "20idVarex2:",
-        device_name = "s20varex2",
-        #local_drive = "M:",
-        READ_PATH = READ_PATH["s20varex2"],
-        WRITE_PATH = WRITE_PATH["s20varex2"],
-        make_cam_plugin = make_varex_cam,
-        default_plugin_control = s20varex2_plugin_control,
-        det_mixin = VarexMixin, 
-        ioc_WIN = True, 
-        pva1_exists = True,
-        use_hdf1= True,
-        use_tiff1 = True
-    )    
+    #create VAREX objects for 20-ID-D and 20-ID-E detectors
+    varex20idff, s20varex2 = make_dets(
+        dict(
+            det_prefix = "20IDFF:",
+            device_name = "varex20idff",
+            #local_drive = "M:",
+            READ_PATH = READ_PATH["varex20idff"],
+            WRITE_PATH = WRITE_PATH["varex20idff"],
+            make_cam_plugin = make_varex_cam,
+            default_plugin_control = varex20idff_plugin_control,
+            det_mixin = VarexMixin,
+            ioc_WIN = True,
+            pva1_exists = True,
+            use_hdf1= True,
+            use_tiff1 = True
+        ),
+        dict(
+            det_prefix = "20idVarex2:",
+            device_name = "s20varex2",
+            #local_drive = "M:",
+            READ_PATH = READ_PATH["s20varex2"],
+            WRITE_PATH = WRITE_PATH["s20varex2"],
+            make_cam_plugin = make_varex_cam,
+            default_plugin_control = s20varex2_plugin_control,
+            det_mixin = VarexMixin,
+            ioc_WIN = True,
+            pva1_exists = True,
+            use_hdf1= True,
+            use_tiff1 = True
+        ),
+    )
 
 if "1-ID" in beamline: 
     #create VAREX object for 1-ID detector
@@ -0,0 +1,172 @@
+"""
+Concurrent, dependency-aware configuration engine for EPICS PVs.
+
+Plan stubs like `FPGA_configure()` used to issue many back-to-back
+`bps.mv()` groups, each waiting on the previous one. Here, each write is
+declared as a `ConfigEntry` (signal, value, phase, after) and
+`configure_pvs()` issues every write whose phase has no unmet ordering
+constraint at the same time. Phases are only serialized where `after` says
+so, so a whole configuration costs one round-trip per dependency level.
+
+With a `ConfigCache` (see `devices/config_cache.py`), writes that would
+not change a value are dropped before they are issued.
+
+EXAMPLE::
+
+    entries = [
+        ConfigEntry(softglue.fs1_mask, '0', phase="fs1_close"),
+        ConfigEntry(softglue.fs1_control, "DepExp", phase="fs1_control", after=("fs1_close",)),
+        ConfigEntry(softglue.fs1_mask, '1', phase="fs1_open", after=("fs1_control",)),
+        ConfigEntry(det_status_monitor.value, 9),   #no ordering constraint
+    ]
+    timings = yield from configure_pvs(entries)
+"""
+
+__all__ = [
+    "ConfigEntry",
+    "config_levels",
+    "configure_pvs",
+]
+
+import logging
+logger = logging.getLogger(__name__)
+logger.info(__file__)
+
+from bluesky import plan_stubs as bps
+from collections import namedtuple
+import itertools
+import time
+
+
+ConfigEntry = namedtuple("ConfigEntry", "signal value phase after", defaults=("default", ()))
+ConfigEntry.__doc__ = """One PV write for `configure_pvs()`.
+
+signal *ophyd signal* :
+    Signal to be written.
+
+value :
+    Value written to `signal`.
+
+phase *str* :
+    Name of the group this write belongs to. (default : "default")
+
+after *tuple of str* :
+    Phases that must be complete before this phase starts. (default : ())
+"""
+
+#unique group names, so nested/concurrent calls never share a wait group
+_group_counter = itertools.count()
+
+
+def config_levels(entries):
+    """
+    Sort `ConfigEntry` objects into dependency levels.
+
+    Level 0 holds every phase with no ordering constraint; level N holds
+    the phases whose constraints are all satisfied by levels < N. Entries
+    within a level can be written concurrently.
+
+    Returns a list of (phase_names, entries) tuples, one per level.
+
+    PARAMETERS
+
+    entries *list of ConfigEntry* :
+        Declared PV writes.
+    """
+
+    #collect ordering constraints per phase (union over all entries in a phase)
+    phases = {}
+    for entry in entries:
+        after = (entry.after,) if isinstance(entry.after, str) else tuple(entry.after)
+        phases.setdefault(entry.phase, set()).update(after)
+
+    for phase, after in phases.items():
+        unknown = after - set(phases)
+        if unknown:
+            raise ValueError(f"Phase {phase!r} must follow unknown phase(s) {sorted(unknown)}.")
+
+    #walk the phase graph one level at a time (Kahn's algorithm)
+    levels = []
+    done = set()
+    remaining = dict(phases)
+    while remaining:
+        ready = [phase for phase, after in remaining.items() if after <= done]
+        if not ready:
+            raise ValueError(f"Circular ordering between phases {sorted(remaining)}.")
+
+        level_entries = [entry for entry in entries if entry.phase in ready]
+
+        #the same signal cannot be written twice at the same time
+        seen = {}
+        for entry in level_entries:
+            if entry.signal in seen:
+                raise ValueError(
+                    f"{entry.signal.name} is written by phases {seen[entry.signal]!r} and {entry.phase!r}"
+                    " in the same level. Add an ordering constraint between them.")
+            seen[entry.signal] = entry.phase
+
+        levels.append((ready, level_entries))
+        done.update(ready)
+        for phase in ready:
+            remaining.pop(phase)
+
+    return levels
+
+
+def configure_pvs(
+    entries,
+    cache = None,
+    label = "config",
+):
+    """
+    Plan stub to write a declared set of PVs, one dependency level at a time.
+
+    Every write in a level is issued at once and the level is awaited as a
+    single group before the next level starts. Returns a dictionary with
+    the time (in seconds) spent on each level, keyed by the phase names in
+    that level, plus the total under "total".
+
+    PARAMETERS
+
+    entries *list of ConfigEntry* :
+        Declared PV writes. See `ConfigEntry`.
+
+    cache *ConfigCache or None* :
+        Optional write-if-different cache. Writes whose target value is
+        already known to be set are dropped. (default : None)
+
+    label *str* :
+        Name used when reporting timings. (default : "config")
+    """
+
+    levels = config_levels(entries)
+    timings = {}
+    t_start = time.time()
+
+    n_written = 0
+    for i, (phase_names, level_entries) in enumerate(levels):
+        if cache is not None:
+            level_entries = cache.filter_entries(level_entries)
+
+        t0 = time.time()
+        if level_entries:
+            group = f"{label}_{next(_group_counter)}"
+            for entry in level_entries:
+                yield from bps.abs_set(entry.signal, entry.value, group=group)
+            yield from bps.wait(group=group)
+            n_written += len(level_entries)
+
+            #writes are confirmed, so later levels compare against the new values
+            if cache is not None:
+                for entry in level_entries:
+                    cache.remember(entry.signal, entry.value)
+        t1 = time.time()
+
+        key = "+".join(sorted(phase_names))
+        timings[key] = t1 - t0
+        logger.debug(f"{label} level {i} ({key}): {len(level_entries)} writes in {t1-t0:.3f}s")
+
+    timings["total"] = time.time() - t_start
+    print(f"{label}: {n_written} of {len(entries)} writes in {len(levels)} levels, {timings['total']:.3f}s")
+
+    return timings
@@ -0,0 +1,185 @@
+"""
+Plan to calibrate the readout gap of an area detector.
+
+The detector is driven at a shrinking `acquire_period` (fixed
+`acquire_time`) until frames drop, then the boundary is narrowed by
+bisection. The smallest period that still delivered every frame on time,
+plus a safety margin, is stored in the gap registry
+(`utils/gap_registry.py`) under (detector, ADcore version, binning,
+trigger mode); the fly plans read it with `detector_gap()`.
+
+Internal trigger is handled here. For external trigger, pass `pulser`, a
+plan stub `pulser(period, nframes)` that fires `nframes` trigger pulses
+`period` seconds apart (e.g., from the FPGAs).
+
+USAGE::
+
+    RE(calibrate_gap(ge1, exposure_time = 0.1))
+    RE(calibrate_gap(pixirad, exposure_time = 0.05, trigger_mode = "External", pulser = my_pulses))
+"""
+
+all = [
+    "calibrate_gap",
+]
+
+import logging
+logger = logging.getLogger(__name__)
+logger.info(__file__)
+
+from bluesky import plan_stubs as bps
+import time
+
+from ..utils.gap_registry import detector_gap
+from ..utils.gap_registry import gap_registry
+
+
+def _acquire_burst(det, period, nframes, pulser = None, timeout = None):
+    """Plan stub that acquires `nframes` at `period` and returns True if
+    every frame arrived and the burst took no longer than expected."""
+
+    yield from bps.mv(det.cam.acquire_period, period)
+
+    counter_start = det.cam.array_counter.get()
+    t0 = time.time()
+    yield from bps.mv(det.cam.acquire, 1)
+    if pulser is not None:
+        yield from pulser(period, nframes)
+
+    expected = nframes * period
+    if timeout is None:
+        timeout = 2 * expected + 5
+    while det.cam.acquire.get() not in (0, "Done"):
+        if time.time() - t0 > timeout:
+            yield from bps.mv(det.cam.acquire, 0)
+            break
+        yield from bps.sleep(min(period, 0.05))
+    elapsed = time.time() - t0
+
+    received = det.cam.array_counter.get() - counter_start
+    on_time = elapsed <= expected * 1.05 + 0.5     #allow for CA latency at both ends
+    ok = received == nframes and on_time
+    logger.info(f"{det.name}: period {period:.4f}s, {received}/{nframes} frames in {elapsed:.3f}s -> {'ok' if ok else 'dropped'}")
+    return ok
+
+
+def calibrate_gap(
+    det,
+    exposure_time,
+    trigger_mode = "Internal",
+    nframes = 100,
+    start_period = None,
+    shrink = 0.8,
+    resolution = 0.001,
+    margin = 0.1,
+    pulser = None,
+    record = True,
+):
+    """
+    Plan to find the minimum safe acquire_period of `det` and record the
+    readout gap in the gap registry. Returns the registry entry.
+
+    PARAMETERS
+
+    det *area detector object* :
+        Detector made by `make_det()`.
+
+    exposure_time *float* :
+        acquire_time used during the calibration, in seconds.
+
+    trigger_mode *str* :
+        Trigger mode to calibrate, as named by the cam (e.g., "Internal",
+        "External"). (default : "Internal")
+
+    nframes *int* :
+        Frames per trial. (default : 100)
+
+    start_period *float or None* :
+        First acquire_period tried. If None, exposure_time plus twice the
+        currently known gap. (default : None)
+
+    shrink *float* :
+        Factor the gap shrinks by per trial until frames drop. (default : 0.8)
+
+    resolution *float* :
+        Bisection stops when good and failing periods are this close,
+        in seconds. (default : 0.001)
+
+    margin *float* :
+        Fractional safety margin added to the measured gap. (default : 0.1)
+
+    pulser *plan stub or None* :
+        `pulser(period, nframes)` firing external triggers; required for
+        trigger modes other than "Internal". (default : None)
+
+    record *bool* :
+        If True, store the result in the gap registry. (default : True)
+    """
+
+    if trigger_mode != "Internal" and pulser is None:
+        raise ValueError(f"trigger_mode {trigger_mode!r} needs a `pulser` plan stub to fire the triggers.")
+
+    if start_period is None:
+        start_period = exposure_time + 2 * detector_gap(det, trigger_mode = trigger_mode, default = 0.1)
+
+    #configure the cam for bursts without saving files; staging restores everything
+    det.cam.stage_sigs = {
+        "trigger_mode" : trigger_mode,
+        "image_mode" : "Multiple",
+        "num_images" : nframes,
+        "acquire_time" : exposure_time,
+        "acquire_period" : start_period,
+    }
+    for plugin in ("tiff1", "hdf1"):
+        if hasattr(det, plugin):
+            getattr(det, plugin).stage_sigs = {"auto_save" : "No"}
+    yield from bps.stage(det)
+
+    try:
+        #shrink the gap until frames drop
+        good = None
+        bad = None
+        period = start_period
+        while period > exposure_time:
+            ok = yield from _acquire_burst(det, period, nframes, pulser = pulser)
+            if ok:
+                good = period
+                period = exposure_time + (period - exposure_time) * shrink
+            else:
+                bad = period
+                break
+
+        if good is None:
+            raise RuntimeError(f"{det.name} dropped frames already at period {start_period:.4f}s. Try a larger start_period.")
+        if bad is None:
+            bad = exposure_time
+
+        #narrow down between the last good and the first failing period
+        while good - bad > resolution:
+            period = (good + bad) / 2
+            ok = yield from _acquire_burst(det, period, nframes, pulser = pulser)
+            if ok:
+                good = period
+            else:
+                bad = period
+
+    finally:
+        yield from bps.unstage(det)
+        det.cam.stage_sigs = {}
+        for plugin in ("tiff1", "hdf1"):
+            if hasattr(det, plugin):
+                getattr(det, plugin).stage_sigs = {}
+
+    gap = (good - exposure_time) * (1 + margin)
+    print(f"{det.name}: minimum period {good:.4f}s at {exposure_time}s exposure -> readout gap {gap:.4f}s (incl. {margin:.0%} margin).")
+
+    entry = dict(gap = gap, min_period = good, exposure_time = exposure_time)
+    if record:
+        entry = gap_registry.record(
+            det,
+            gap = gap,
+            min_period = good,
+            exposure_time = exposure_time,
+            trigger_mode = trigger_mode,
+            nframes = nframes,
+        )
+    return entry
@@ -2,20 +2,35 @@
 Plans and associated plan stubs for hardware triggering (fastsweep/ fly scans). 
 
 FIXME: in FPGA_configure plan stub, do we need to open/change input for FS2?
-FIXME: det gaps/extra time not working/confusing???
+FIXME: extra time not working/confusing???
 
 """
 
 all = [
+   "FPGA_config_entries",
    "FPGA_configure",
    "aero_configure",
+   "arrays_config_entries",
    "arrays_configure",
+   "IC_scalers_config_entries",
    "IC_scalers_configure",
+   "timestamp_array_config_entries",
    "timestamp_array_configure",
+   "frame_counter_config_entries",
    "frame_counter_configure",
+   "pso_pulses_enable",
+   "pso_pulses_disable",
+   "IC_scalers_enable",
+   "counters_enable",
+   "fastsweep_deconfigure",
    "taxi",
+   "taxi_start",
    "fly",
+   "fly_and_collect",
+   "sweep_frame_report",
    "fastsweep",
+   "fastsweep_series",
+   "fastsweep_grid",
 ]
 
 import logging
@@ -25,6 +40,20 @@ logger.info(__file__)
 import time
 from bluesky import plans as bp
 from bluesky import plan_stubs as bps
+from bluesky import preprocessors as bpp
+from .config_engine import ConfigEntry
+from .config_engine import configure_pvs
+from .parallel_staging import stage_all
+from .parallel_staging import unstage_all
+from ..utils.flyscan_analysis import bad_frames
+from ..utils.flyscan_analysis import frame_table
+from ..utils.fly_kinematics import sweep_kinematics
+from ..utils.gap_registry import detector_gap
+from ..utils.phase_timer import PhaseTimer
+from ..utils.fly_checkpoint import FrameCheckpointer
+from ..utils.fly_checkpoint import fly_checkpoints
+from ..utils.plan_simulator import in_dry_run
+from contextlib import nullcontext
 #from .auxiliary_ad import *
 
 # from ..devices.s1id_FPGAs import *
@@ -37,16 +66,21 @@ from bluesky import plan_stubs as bps
 #from collections import OrderedDict
 import numpy as np
 
+import itertools
 import os
 
 
 
-def FPGA_configure(
+def FPGA_config_entries(
     stepper = False,
 ):
     
-    """Plan stub for configuring FPGA PVs for a flyscan.
+    """Declare the FPGA PV writes for a flyscan as `ConfigEntry` objects.
     See `mpe_feb24_pixirad` for original SPEC macro.
+
+    Ordering that matters: fast shutters are closed before the FPGA inputs
+    and outputs are rerouted, and fs1 goes mask -> control -> mask.
+    Everything else is written concurrently. Used by `FPGA_configure()`.
     
     PARAMETERS
 
@@ -64,93 +98,116 @@ def FPGA_configure(
     output_link_value = "1ide:sg4:BUFFER-1_IN_Signal.PROC PP NMS"
 
     #configure fake_gate
-    yield from bps.mv(
-       fake_gate.description, "AERO rot stopGATE",
-       fake_gate.scan, "Passive",
-       fake_gate.initial_val, 0,
-       fake_gate.initial_val_disable, 0,
-       fake_gate.input_flyer, input_flyer_value, #TODO: populate automatically
-       fake_gate.output_execute_delay, 0.0,
-       fake_gate.output_execute_option, "Transition To Zero",
-       fake_gate.output_data_option, "Use CALC",
-       fake_gate.calculation_record, "(B&A)?1:0",
-       fake_gate.output_link, output_link_value
-    )
+    entries = [
+       ConfigEntry(fake_gate.description, "AERO rot stopGATE"),
+       ConfigEntry(fake_gate.scan, "Passive"),
+       ConfigEntry(fake_gate.initial_val, 0),
+       ConfigEntry(fake_gate.initial_val_disable, 0),
+       ConfigEntry(fake_gate.input_flyer, input_flyer_value), #TODO: populate automatically
+       ConfigEntry(fake_gate.output_execute_delay, 0.0),
+       ConfigEntry(fake_gate.output_execute_option, "Transition To Zero"),
+       ConfigEntry(fake_gate.output_data_option, "Use CALC"),
+       ConfigEntry(fake_gate.calculation_record, "(B&A)?1:0"),
+       ConfigEntry(fake_gate.output_link, output_link_value),
+    ]
 
     #TODO: Decide if we need this to switch PVs (or devices)
     if stepper: ...
 
     #configure acromag time_counter FPGA
-    yield from bps.mv(
-       time_counter.readout_desc, "Readout",
-       time_counter.readout_scan, "I/O Intr"
-    )
+    entries += [
+       ConfigEntry(time_counter.readout_desc, "Readout"),
+       ConfigEntry(time_counter.readout_scan, "I/O Intr"),
+    ]
+
+    #set detector status monitor 
+    entries += [ConfigEntry(det_status_monitor.value, 9)]
+
+    #close fast shutters before rerouting anything
+    entries += [
+       ConfigEntry(softglue.fs1_mask, '0', "fpga_fs_close"),
+       ConfigEntry(softglue.fs2_mask, '0', "fpga_fs_close"),
+    ]
+
+    #everything below is rerouted with the fast shutters closed
+    routing = ("fpga_routing", ("fpga_fs_close",))
 
     #configure DTH_DetRdy FPGA
-    yield from bps.mv(
-       det_ready.mode, "DTHDetRdy",
-       det_ready.clock, "0",  #FIXME
-       det_ready.set_signal, "DTHDetRdy",
-       det_ready.data, "0",   #FIXME
-       det_ready.clear, "0!"
-    )
+    entries += [
+       ConfigEntry(det_ready.mode, "DTHDetRdy", *routing),
+       ConfigEntry(det_ready.clock, "0", *routing),  #FIXME
+       ConfigEntry(det_ready.set_signal, "DTHDetRdy", *routing),
+       ConfigEntry(det_ready.data, "0", *routing),   #FIXME
+       ConfigEntry(det_ready.clear, "0!", *routing),
+    ]
 
     #Set frame readback signal
-    yield from bps.mv(softglue.frame_readback, "DetExp")
+    entries += [ConfigEntry(softglue.frame_readback, "DetExp", *routing)]
 
     #set FPGA output signals
     #TODO: Iterate over other ports and clear them (set to 0)
-    yield from bps.mv(
-       softglue.port_17_out, "FS1_auto",
-       softglue.port_19_out, "FS1_auto",
+    entries += [
+       ConfigEntry(softglue.port_17_out, "FS1_auto", *routing),
+       ConfigEntry(softglue.port_19_out, "FS1_auto", *routing),
        #standard outputs for DetExp
-       softglue3.port_17_out, "DetExpE",
-       softglue3.port_18_out, "Det2ExpE",
-       softglue3.port_19_out, "Det3ExpE",
-       #softglue3.port_20_out, "Det4ExpE",   #FIXME: only receive error for this input value
+       ConfigEntry(softglue3.port_17_out, "DetExpE", *routing),
+       ConfigEntry(softglue3.port_18_out, "Det2ExpE", *routing),
+       ConfigEntry(softglue3.port_19_out, "Det3ExpE", *routing),
+       #ConfigEntry(softglue3.port_20_out, "Det4ExpE", *routing),   #FIXME: only receive error for this input value
        #standard outputs for DetTrig
-       softglue2.port_11_out, "detpls",
-       softglue2.port_14_out, "detpls"
-    )
-
-    #close fast shutters
-    yield from bps.mv(
-       softglue.fs1_mask, '0',
-       softglue.fs2_mask, '0'
-    )
+       ConfigEntry(softglue2.port_11_out, "detpls", *routing),
+       ConfigEntry(softglue2.port_14_out, "detpls", *routing),
+    ]
 
     #reset FPGA input signals
     #TODO: Iterate over other ports and clear them (set to 0)
-    yield from bps.mv(
+    entries += [
        #set FPGA input signals to select detE
-       softglue3.port_5_in, "DetExpE",
-       softglue3.port_25_in, "Det2ExpE",
-       softglue3.port_17_in, "Det3ExpE", 
-       #softglue3.port_8_in, "Det4ExpE",  #FIXME: only receive error for this input value
+       ConfigEntry(softglue3.port_5_in, "DetExpE", *routing),
+       ConfigEntry(softglue3.port_25_in, "Det2ExpE", *routing),
+       ConfigEntry(softglue3.port_17_in, "Det3ExpE", *routing), 
+       #ConfigEntry(softglue3.port_8_in, "Det4ExpE", *routing),  #FIXME: only receive error for this input value
        #standard inputs for DetExp
-       softglue.port_1_in, "Sweep", 
-       softglue.port_2_in, "DetPls", 
-       softglue.port_3_in, "DetExp", 
-       softglue.port_8_in, "DTHDetRdy", 
+       ConfigEntry(softglue.port_1_in, "Sweep", *routing), 
+       ConfigEntry(softglue.port_2_in, "DetPls", *routing), 
+       ConfigEntry(softglue.port_3_in, "DetExp", *routing), 
+       ConfigEntry(softglue.port_8_in, "DTHDetRdy", *routing), 
        #fake zeroes
-       #softglue2.port_25_in, '0',  #FIXME: not able to put or mv PV, only accepts str
-       #softglue2.port_26_in, '0',  #FIXME: not able to put or mv PV, only accepts str
+       #ConfigEntry(softglue2.port_25_in, '0', *routing),  #FIXME: not able to put or mv PV, only accepts str
+       #ConfigEntry(softglue2.port_26_in, '0', *routing),  #FIXME: not able to put or mv PV, only accepts str
        #standard DetTrig inputs
-       #softglue2.port_1_in, '1', #FIXME: not able to put or mv PV, only accepts str
-       softglue2.port_2_in, 'detpls')
+       #ConfigEntry(softglue2.port_1_in, '1', *routing), #FIXME: not able to put or mv PV, only accepts str
+       ConfigEntry(softglue2.port_2_in, 'detpls', *routing),
+    ]
 
-    #keep fs1 closed, then change to detExp control
-    yield from bps.mv(
-       softglue.fs1_mask, '0',
-       softglue.fs1_control, "DepExp")
+    #keep fs1 closed, then change to detExp control, then open fs1
+    entries += [
+       ConfigEntry(softglue.fs1_control, "DepExp", "fpga_fs1_control", ("fpga_routing",)),
+       ConfigEntry(softglue.fs1_mask, '1', "fpga_fs1_open", ("fpga_fs1_control",)),
+    ]
+
+    return entries
+
+
+def FPGA_configure(
+    stepper = False,
+):
+    
+    """Plan stub for configuring FPGA PVs for a flyscan.
+    See `FPGA_config_entries()` for the PVs and their ordering.
     
-    #keep fs1 open
-    yield from bps.mv(softglue.fs1_mask, '1')
+    PARAMETERS
 
-    #set detector status monitor 
-    yield from bps.mv(det_status_monitor.value, 9)
+    stepper *Boolean* :
+      Boolean that determines whether a flyscan is performed by a stepper motor. 
+      (default : False)
+       
+    """
+
+    timings = yield from configure_pvs(FPGA_config_entries(stepper = stepper), label = "FPGA_configure")
 
     print("det_status_monitor ok")
+    return timings
 
 
 def aero_configure(
@@ -160,7 +217,7 @@ def aero_configure(
       scan_speed_dps,
       gap_time,   #det_gap + extra_time
       flyer,   #flyer controller
-      taxi_timeout = 40 #TODO: calculate this; define here since specific to motor
+      taxi_timeout = 40 #see `sweep_kinematics()`; define here since specific to motor
 ):
 
    """Plan stub to configure sms_aero.roty and associated PSO controller.
@@ -222,25 +279,19 @@ def aero_configure(
       taxi_timeout = taxi_timeout
    )
 
-   #clear GATE state- execute PROC
-   yield from bps.trigger(softglue4.clear_gate)
-
-   #enable FPGA pulses and enable fakeGATE stop
-   yield from bps.mv(
-      softglue4.pso_pulses, '1', #FIXME: only accepts string input
-      fake_gate.initial_val_disable, 1    #.B field
-   )
+   #clear GATE state, enable FPGA pulses and enable fakeGATE stop
+   yield from pso_pulses_enable()
 
 
 
-def arrays_configure(
+def arrays_config_entries(
       array,
       userCalc_name, 
       IC_suffix
 ):
    
-   """Plan stub for setting up the userArrayCalc fields. 
-   Called in IC_scalers_configure plan stub.
+   """Declare the userArrayCalc field writes as `ConfigEntry` objects.
+   Called in IC_scalers_config_entries.
    
    PARAMETERS 
 
@@ -265,124 +316,129 @@ def arrays_configure(
    bb_value = np.zeros(array_length)
 
    #set values
-   yield from bps.mv(
-      array.description, userCalc_name, 
-      array.number_used, array_length,
-      array.scan, "Passive",
-      array.in_link_a, in_link_a_value, 
-      array.in_link_b, in_link_b_value,
-      array.in_link_c, "",    #disabled
-      array.c_value, 0.0, 
-      array.in_link_aa, in_link_aa_value, 
-      array.in_link_bb, "",   #storage array
-      array.bb_value, bb_value,   #reset-- must be an array
-      array.calc_record, "C?(BB>>1)+AA:BB",  #formula used
-      array.out_execute_delay, 0.0, 
-      array.event_to_issue, 0,
-      array.out_execute_option, "Every Time",
-      array.out_data_option, "Use CALC",
-      array.out_link, out_link_value, 
-      array.wait, "NoWait"
-   )
+   return [
+      ConfigEntry(array.description, userCalc_name), 
+      ConfigEntry(array.number_used, array_length),
+      ConfigEntry(array.scan, "Passive"),
+      ConfigEntry(array.in_link_a, in_link_a_value), 
+      ConfigEntry(array.in_link_b, in_link_b_value),
+      ConfigEntry(array.in_link_c, ""),    #disabled
+      ConfigEntry(array.c_value, 0.0), 
+      ConfigEntry(array.in_link_aa, in_link_aa_value), 
+      ConfigEntry(array.in_link_bb, ""),   #storage array
+      ConfigEntry(array.bb_value, bb_value),   #reset-- must be an array
+      ConfigEntry(array.calc_record, "C?(BB>>1)+AA:BB"),  #formula used
+      ConfigEntry(array.out_execute_delay, 0.0), 
+      ConfigEntry(array.event_to_issue, 0),
+      ConfigEntry(array.out_execute_option, "Every Time"),
+      ConfigEntry(array.out_data_option, "Use CALC"),
+      ConfigEntry(array.out_link, out_link_value), 
+      ConfigEntry(array.wait, "NoWait"),
+   ]
+
+
+def arrays_configure(
+      array,
+      userCalc_name, 
+      IC_suffix
+):
+   
+   """Plan stub for setting up the userArrayCalc fields. 
+   See `arrays_config_entries()` for PARAMETERS."""
 
+   return (yield from configure_pvs(
+      arrays_config_entries(array, userCalc_name, IC_suffix),
+      label = f"{array.name} config"
+   ))
 
 
-def IC_scalers_configure():
+
+def IC_scalers_config_entries():
    
-   """Plan stub to configure IC scalers.
-   Called in fastsweep plan."""
+   """Declare the IC scaler PV writes as `ConfigEntry` objects. 
+   None of these writes depend on each other."""
 
    #configure scaler2
-   yield from bps.mv(
-      scaler2.count_mode, "OneShot",   #.CONT
-      scaler2.normalized_counts, "Cts/sec",  #_calc_ctrl.VAL
-      scaler2.enable_calcs, "ENABLE", #_calcEnable.VAL
-      scaler2.delay, 0.0,   #.DLY
-      scaler2.update_rate, 2.0,   #.RATE; Hz
-      scaler2.count, "Done"   #.CNT
-   )
-
-   #collect scaler2 gates in an array to iterate through them 
-   scaler2_gates = [
-      scaler2.channels.chan01.gate,
-      scaler2.channels.chan02.gate,
-      scaler2.channels.chan03.gate,
-      scaler2.channels.chan04.gate,
-      scaler2.channels.chan05.gate,
-      scaler2.channels.chan06.gate,
-      scaler2.channels.chan07.gate,
-      scaler2.channels.chan08.gate,
-      scaler2.channels.chan09.gate,
-      scaler2.channels.chan10.gate,
-      scaler2.channels.chan11.gate,
-      scaler2.channels.chan12.gate,
-      scaler2.channels.chan13.gate,
-      scaler2.channels.chan14.gate,
-      scaler2.channels.chan15.gate,
-      scaler2.channels.chan16.gate,
+   entries = [
+      ConfigEntry(scaler2.count_mode, "OneShot"),   #.CONT
+      ConfigEntry(scaler2.normalized_counts, "Cts/sec"),  #_calc_ctrl.VAL
+      ConfigEntry(scaler2.enable_calcs, "ENABLE"), #_calcEnable.VAL
+      ConfigEntry(scaler2.delay, 0.0),   #.DLY
+      ConfigEntry(scaler2.update_rate, 2.0),   #.RATE; Hz
+      ConfigEntry(scaler2.count, "Done"),   #.CNT
    ]
 
-   #configure scaler 2 gates
-   for gate in scaler2_gates:
-      yield from bps.mv(gate, "N")
+   #configure scaler 2 gates (chan01 ... chan16)
+   for i in range(1, 17):
+      gate = getattr(scaler2.channels, f"chan{i:02d}").gate
+      entries.append(ConfigEntry(gate, "N"))
 
    #define string inputs for scaler trigger
    out_link_value = scaler2.prefix + ".CNT PP NMS"
 
    #configure scaler trigger
-   yield from bps.mv(
-      scaler_trigger.description, "DetPulseToScaler",
-      scaler_trigger.scan, "Passive", 
-      scaler_trigger.a_value, 0,
-      scaler_trigger.b_value, 0,
-      scaler_trigger.in_link_a, "", 
-      scaler_trigger.out_execute_option, "On Change",
-      scaler_trigger.out_data_option, "Use OCAL",
-      scaler_trigger.calc_record, "(A&B)",
-      scaler_trigger.out_calc, "(A&B)?1:0",
-      scaler_trigger.out_link, out_link_value
-   )
+   entries += [
+      ConfigEntry(scaler_trigger.description, "DetPulseToScaler"),
+      ConfigEntry(scaler_trigger.scan, "Passive"), 
+      ConfigEntry(scaler_trigger.a_value, 0),
+      ConfigEntry(scaler_trigger.b_value, 0),
+      ConfigEntry(scaler_trigger.in_link_a, ""), 
+      ConfigEntry(scaler_trigger.out_execute_option, "On Change"),
+      ConfigEntry(scaler_trigger.out_data_option, "Use OCAL"),
+      ConfigEntry(scaler_trigger.calc_record, "(A&B)"),
+      ConfigEntry(scaler_trigger.out_calc, "(A&B)?1:0"),
+      ConfigEntry(scaler_trigger.out_link, out_link_value),
+   ]
 
-   #configure the userArrayCalc fields using a smaller plan stub 
-   yield from arrays_configure(
+   #configure the userArrayCalc fields
+   entries += arrays_config_entries(
       array = sample_monitor_array,
       userCalc_name = "Fastsweep MonCnt",
       IC_suffix = "_cts2.B"   #standard IC in E, after the DS slit, before the sample IC5-E
    )
 
-   yield from arrays_configure(
+   entries += arrays_config_entries(
       array = sample_transmission_array,
       userCalc_name = "Fastsweep TransmCnt",
       IC_suffix = "_cts2.C"   #pin diode after the sample IC4-E
    )
 
-   yield from arrays_configure(
+   entries += arrays_config_entries(
       array = energy_monitor_array, 
       userCalc_name = "Fastswep E-MonCnt",
       IC_suffix = "_cts2.A"   #after US Kohzu slits in E, IC3-E
    )
 
-   yield from arrays_configure(
+   entries += arrays_config_entries(
       array = intensity_transmission_array, 
       userCalc_name = "Fastswp E-TransmCnt",
       IC_suffix = "_cts1.D"   #IC2-E split IC, bottom part
    )
 
-   yield from arrays_configure(
+   entries += arrays_config_entries(
       array = integrated_time_array,
       userCalc_name = "Fastswp Integr.Ticks",
       IC_suffix = "_calc5.VAL"
    )
 
+   return entries
 
 
-def timestamp_array_configure(
+def IC_scalers_configure():
+   
+   """Plan stub to configure IC scalers.
+   See `IC_scalers_config_entries()` for the PVs."""
+
+   return (yield from configure_pvs(IC_scalers_config_entries(), label = "IC_scalers_configure"))
+
+
+
+def timestamp_array_config_entries(
       nframes,
       det
 ):
    
-   """Plan stub to confiure the timestamp array for flyscan. 
-   Called in fastsweep plan. 
+   """Declare the timestamp array PV writes as `ConfigEntry` objects. 
    
    PARAMETERS
    
@@ -399,36 +455,52 @@ def timestamp_array_configure(
    out_link_value = timestamp_array.prefix + ".BB NPP NMS"
    bb_value = np.zeros(array_length)
 
-   yield from bps.mv(
-      timestamp_array.description, "TimeStamps",
-      timestamp_array.number_used, array_length,
-      timestamp_array.scan, "Passive",
-      timestamp_array.in_link_a, "",
-      timestamp_array.in_link_b, "", 
-      timestamp_array.in_link_c, "",
-      timestamp_array.a_value, nframes,
-      timestamp_array.b_value, 0,
-      timestamp_array.c_value, 0,
-      timestamp_array.in_link_aa, in_link_aa_value,   #different for GE_NEW
-      timestamp_array.in_link_bb, "",  #different for GE_NEW
-      timestamp_array.in_link_dd, "", #different for GE_NEW
-      timestamp_array.bb_value, bb_value,
-      timestamp_array.calc_record, "C?(BB>>1)+AA:BB",
-      timestamp_array.out_execute_delay, 0.0,
-      timestamp_array.event_to_issue, 0,
-      timestamp_array.out_execute_option, "Every Time", 
-      timestamp_array.out_data_option, "Use CALC", 
-      timestamp_array.out_link, out_link_value, 
-      timestamp_array.wait, "NoWait"
-   )
+   return [
+      ConfigEntry(timestamp_array.description, "TimeStamps"),
+      ConfigEntry(timestamp_array.number_used, array_length),
+      ConfigEntry(timestamp_array.scan, "Passive"),
+      ConfigEntry(timestamp_array.in_link_a, ""),
+      ConfigEntry(timestamp_array.in_link_b, ""), 
+      ConfigEntry(timestamp_array.in_link_c, ""),
+      ConfigEntry(timestamp_array.a_value, nframes),
+      ConfigEntry(timestamp_array.b_value, 0),
+      ConfigEntry(timestamp_array.c_value, 0),
+      ConfigEntry(timestamp_array.in_link_aa, in_link_aa_value),   #different for GE_NEW
+      ConfigEntry(timestamp_array.in_link_bb, ""),  #different for GE_NEW
+      ConfigEntry(timestamp_array.in_link_dd, ""), #different for GE_NEW
+      ConfigEntry(timestamp_array.bb_value, bb_value),
+      ConfigEntry(timestamp_array.calc_record, "C?(BB>>1)+AA:BB"),
+      ConfigEntry(timestamp_array.out_execute_delay, 0.0),
+      ConfigEntry(timestamp_array.event_to_issue, 0),
+      ConfigEntry(timestamp_array.out_execute_option, "Every Time"), 
+      ConfigEntry(timestamp_array.out_data_option, "Use CALC"), 
+      ConfigEntry(timestamp_array.out_link, out_link_value), 
+      ConfigEntry(timestamp_array.wait, "NoWait"),
+   ]
+
+
+def timestamp_array_configure(
+      nframes,
+      det
+):
+   
+   """Plan stub to confiure the timestamp array for flyscan. 
+   See `timestamp_array_config_entries()` for PARAMETERS."""
 
+   return (yield from configure_pvs(
+      timestamp_array_config_entries(nframes = nframes, det = det),
+      label = "timestamp_array_configure"
+   ))
 
 
-def frame_counter_configure(
+
+def frame_counter_config_entries(
       nframes
 ):
-   """Plan stub to configure the frame counter transform record.
-   Called in fastsweep plan.
+   """Declare the frame counter transform record writes as `ConfigEntry` objects.
+
+   Order is very important for the b, c and d groups, so each group is
+   its own phase and follows the previous one.
    
    PARAMETERS
 
@@ -440,52 +512,165 @@ def frame_counter_configure(
    out_link_b_value = frame_counter.prefix + ".B NPP NMS"
    out_link_d_value = det_pulse_to_ad.prefix + ".C NPP NMS"  #might change with det + fly_motor
 
-   yield from bps.mv(
-      frame_counter.description, "FrameCounter",
-      frame_counter.scan, "Passive",
+   #a group
+   a = ("frame_counter_a", ())
+   entries = [
+      ConfigEntry(frame_counter.description, "FrameCounter", *a),
+      ConfigEntry(frame_counter.scan, "Passive", *a),
       #clear input links
-      frame_counter.in_link_a, "",
-      frame_counter.in_link_b, "",
-      frame_counter.in_link_c, "",
-      frame_counter.in_link_d, "",
-      frame_counter.in_link_e, "",
-      frame_counter.comment_a, "a nframes",
-      frame_counter.a_value, nframes,  #logs the starting number
-      frame_counter.expression_a, ""   #clear
-   )
+      ConfigEntry(frame_counter.in_link_a, "", *a),
+      ConfigEntry(frame_counter.in_link_b, "", *a),
+      ConfigEntry(frame_counter.in_link_c, "", *a),
+      ConfigEntry(frame_counter.in_link_d, "", *a),
+      ConfigEntry(frame_counter.in_link_e, "", *a),
+      ConfigEntry(frame_counter.comment_a, "a nframes", *a),
+      ConfigEntry(frame_counter.a_value, nframes, *a),  #logs the starting number
+      ConfigEntry(frame_counter.expression_a, "", *a),   #clear
+   ]
 
-   #because order is very important, make separate bps.mv() calls for 
-   #subsequent fields. 
    #b group
+   b = ("frame_counter_b", ("frame_counter_a",))
+   entries += [
+      ConfigEntry(frame_counter.comment_b, "b counter", *b),  #counter
+      ConfigEntry(frame_counter.expression_b, "C?(B-1):B", *b),  #counting down
+      ConfigEntry(frame_counter.b_value, 0, *b),   #just for initializing
+   ]
+   #c group
+   c = ("frame_counter_c", ("frame_counter_b",))
+   entries += [
+      ConfigEntry(frame_counter.comment_c, "c enable", *c),   #group enables the counter
+      ConfigEntry(frame_counter.expression_c, "C?(B-1):B", *c),  #disabled for now
+      ConfigEntry(frame_counter.b_value, 0, *c),   #clear
+   ]
+   #d group
+   d = ("frame_counter_d", ("frame_counter_c",))
+   entries += [
+      ConfigEntry(frame_counter.comment_d, "d disbl DetP_AD", *d),  #group enables the DetPulseToAD signals
+      ConfigEntry(frame_counter.d_value, 0, *d),  #disabled for now
+      ConfigEntry(frame_counter.expression_d, "(B<=0)?0:1", *d),  #if det triggering should be stopped
+   ]
+   #handling outputs and other options
+   out = ("frame_counter_out", ("frame_counter_d",))
+   entries += [
+      ConfigEntry(frame_counter.calc_option, "Conditional", *out),
+      ConfigEntry(frame_counter.out_link_b, out_link_b_value, *out), 
+      ConfigEntry(frame_counter.out_link_d, out_link_d_value, *out),
+   ]
+   #set frame number
+   entries += [ConfigEntry(frame_counter.b_value, nframes+1, "frame_counter_arm", ("frame_counter_out",))]
+
+   return entries
+
+
+def frame_counter_configure(
+      nframes
+):
+   """Plan stub to configure the frame counter transform record.
+   See `frame_counter_config_entries()` for PARAMETERS."""
+
+   return (yield from configure_pvs(
+      frame_counter_config_entries(nframes = nframes),
+      label = "frame_counter_configure"
+   ))
+
+
+
+
+def pso_pulses_enable():
+   """Plan stub to clear the GATE state and enable FPGA pulses and the 
+   fakeGATE stop. Done after taxiing, right before flying."""
+
+   #clear GATE state- execute PROC
+   yield from bps.trigger(softglue4.clear_gate)
+
+   #enable FPGA pulses and enable fakeGATE stop
    yield from bps.mv(
-      frame_counter.comment_b, "b counter",  #counter
-      frame_counter.expression_b, "C?(B-1):B",  #counting down
-      frame_counter.b_value, 0   #just for initializing
+      softglue4.pso_pulses, '1', #FIXME: only accepts string input
+      fake_gate.initial_val_disable, 1    #.B field
    )
-   #c group
+
+
+
+def pso_pulses_disable():
+   """Plan stub to disable FPGA pulses and the fakeGATE stop after flying.
+   Specific to aero and rams."""
+
+   yield from bps.mv(softglue4.pso_pulses, '0') 
+   yield from bps.trigger(softglue4.clear_gate) #trigger PROC
+   yield from bps.mv(fake_gate.initial_val_disable, 0)
+
+
+
+def IC_scalers_enable():
+   """Plan stub to enable detector pulses to the IC scaler (E-hutch)
+   and the IC userArrayCalcs. Called after configuration."""
+
+   in_22Do_vlaue = scaler_trigger.prefix + ".A PP NMS"
+   yield from bps.mv(softglue4.in_22Do, in_22Do_vlaue)  
+   yield from bps.mv(softglue4.in_22IntEdge, "Both") 
+   yield from bps.mv(scaler_trigger.b_value, 1) #enable
+
+   #enable IC_scalers
    yield from bps.mv(
-      frame_counter.comment_c, "c enable",   #group enables the counter
-      frame_counter.expression_c, "C?(B-1):B",  #disabled for now
-      frame_counter.b_value, 0   #clear
+      sample_monitor_array.c_value, 1,
+      sample_transmission_array.c_value, 1, 
+      energy_monitor_array.c_value, 1, 
+      intensity_transmission_array.c_value, 1,
+      integrated_time_array.c_value,1
    )
-   #d group
+
+
+
+def counters_enable():
+   """Plan stub to clear det_ready and enable the frame counter and 
+   timestamp array (det pulses to AD stay disabled)."""
+
    yield from bps.mv(
-      frame_counter.comment_d, "d disbl DetP_AD",  #group enables the DetPulseToAD signals
-      frame_counter.d_value, 0,  #disabled for now
-      frame_counter.expression_d, "(B<=0)?0:1"  #if det triggering should be stopped
+      det_ready.clear, "0!",
+      det_pulse_to_ad.b_value, 0,   #disable
+      frame_counter.c_value, 1,  #enable
+      timestamp_array.c_value, 1 #enable
    )
-   #handling outputs and other options
+
+
+
+def fastsweep_deconfigure():
+   """Plan stub to disable det pulses, counters, PSO pulses and IC_scalers
+   at the end of a fastsweep (or a series of sweeps)."""
+
+   #clear det_ready and disable det pulses and counters
    yield from bps.mv(
-      frame_counter.calc_option, "Conditional",
-      frame_counter.out_link_b, out_link_b_value, 
-      frame_counter.out_link_d, out_link_d_value
+      det_pulse_to_ad.b_value, 0,   #disable
+      frame_counter.c_value, 0,  #disable
+      timestamp_array.c_value, 0 #disable
    )
-   #set frame number
-   yield from bps.mv(frame_counter.b_value, nframes+1)
+   print("Scalers and pulses disabled.")
 
 
+   #disable pulses -- specific to aero and rams
+   yield from pso_pulses_disable()
+
+   #disable IC_scalers
+   yield from bps.mv(
+      sample_monitor_array.c_value, 0,
+      sample_transmission_array.c_value, 0, 
+      energy_monitor_array.c_value, 0, 
+      intensity_transmission_array.c_value, 0,
+      integrated_time_array.c_value, 0
+   )
 
+   #disable detector pulses to IC scaler(E-hutch)
+   yield from bps.mv(softglue4.in_22IntEdge, "None")
+   yield from bps.mv(softglue4.in_21IntEdge, "None")  #FIXME: This is not configured to begin with
+   #FIXME: do we need in_17IntEdge too?? Or just for stepper?
+   yield from bps.mv(scaler_trigger.b_value, 0)
 
+   #disable det_pulse and frame_counter
+   yield from bps.mv(
+      det_pulse_to_ad.b_value, 0,
+      frame_counter.c_value, 0,
+      det_ready.clear, "0!"
+   )
 
 
 
@@ -528,6 +713,42 @@ def taxi(flyer, p0, p1, taxi_timeout):
 
 
 
+def taxi_start(flyer, p0, p1, taxi_timeout, group):
+
+   """Plan stub like `taxi()`, but returns as soon as the taxi has been 
+   triggered, so other work can happen while the fly motor moves. 
+   Wait for it with `bps.wait(group = group)` before flying.
+
+   Called in fastsweep_series plan.
+
+   PARAMETERS
+
+   flyer *bluesky device object* : 
+      The flyer object that controls the fly motor (e.g., psofly1). 
+
+   p0 *float* : 
+      Starting position of flyscan in EGUs (e.g., in degrees for rotation scan).
+
+   p1 *float* : 
+      Ending position of flyscan in EGUs. 
+
+   taxi_timeout *int* : 
+      Time in seconds the taxi is allowed to proceed until timeout occurs. 
+
+   group *str* : 
+      Name of the bluesky group the taxi status is added to.
+
+   """
+
+   yield from bps.mv(
+      flyer.start_position, p0,
+      flyer.end_position, p1,
+      flyer.taxi.timeout, taxi_timeout
+   )
+   yield from bps.trigger(flyer.taxi, group = group)
+
+
+
 def fly(flyer, fly_timeout = 3600):
 
     """Plan stub to trigger a fly motor to fly. Typically performed after taxiing.
@@ -550,12 +771,137 @@ def fly(flyer, fly_timeout = 3600):
     print(f"Fly completed in {t1-t0:.3f}s")
 
 
+def fly_and_collect(flyer, fly_timeout = 3600, timer = None, after_fly = None, live = None):
+
+   """Plan stub to fly with `flyer` as a bluesky flyer and collect the 
+   per-frame arrays (see `PSOTaxiFlyDevice.set_readback_arrays()`) as a 
+   single event page. Must be called inside a run (see `fastsweep`).
+   Taxiing must already be done.
+
+   PARAMETERS   
+   
+   flyer *bluesky device object* : 
+      The flyer object that controls the fly motor (e.g., psofly1). 
+
+   fly_timeout *int* :
+      Time in seconds the flight is allowed to proceed until timeout occurs. 
+      (default : 3600)
+
+   timer *PhaseTimer or None* :
+      If given, the flight and the collection are timed as its "fly" and 
+      "readback" phases (see `utils/phase_timer.py`). (default : None)
+
+   after_fly *callable or None* :
+      Plan stub (no arguments) run as soon as the flight is complete, 
+      before the arrays are collected (e.g., to start the next outer 
+      axis move, see `fastsweep_series`). (default : None)
+
+   live *LiveICCollector or None* :
+      If given (e.g., `live_ic`), the per-frame IC counts are published in 
+      its own stream ("live_ic") at most `live.rate` times per second 
+      while flying (see `devices/live_ic.py`). (default : None)
+
+   """
+   t0 = time.time()
+   with timer.phase("fly") if timer else nullcontext():
+      yield from bps.mv(flyer.fly.timeout, fly_timeout)
+      if live is not None:
+         yield from bps.kickoff(live, wait = True)
+      yield from bps.kickoff(flyer, wait = True)
+      if live is None:
+         yield from bps.complete(flyer, wait = True)
+      else:
+         #publish the IC rows received so far while the flight goes on
+         fly_status = yield from bps.complete(flyer, group = "fly_and_collect")
+         while not fly_status.done:
+            yield from bps.sleep(1/live.rate)
+            yield from bps.kickoff(live, wait = True)    #no-op while monitoring; re-arms collect
+            yield from bps.collect(live)
+         yield from bps.wait(group = "fly_and_collect")
+         yield from bps.kickoff(live, wait = True)
+         yield from bps.complete(live, wait = True)
+         yield from bps.collect(live)   #last rows
+         if live.dropped_rows:
+            print(f"WARNING! {live.dropped_rows} live IC rows were dropped (see the full arrays).")
+   t1 = time.time()
+   print(f"Fly completed in {t1-t0:.3f}s")
+
+   if after_fly is not None:
+      yield from after_fly()
+
+   with timer.phase("readback") if timer else nullcontext():
+      yield from bps.collect(flyer)
+
+
+
+
 
 
 
 
 
 
+def sweep_frame_report(
+      det,
+      nframes,
+      frame_time,
+      start_pos = 0.0,
+      end_pos = 0.0
+):
+   """Align the IC arrays and `det` timestamps of the last sweep into a 
+   per-frame table (see `utils/flyscan_analysis.py`) and report missing 
+   and duplicated frames. Returns (table, report). In a dry run nothing 
+   is read and (None, report of a good sweep) is returned.
+
+   PARAMETERS
+
+   det *bluesky area detector object* :
+      Detector whose timestamps are in `timestamp_array`.
+
+   nframes *int* :
+      Number of frames requested.
+
+   frame_time *float* :
+      Expected time between frames in seconds.
+
+   start_pos *float* :
+      Starting position of the sweep, for the omega column. (default : 0.0)
+
+   end_pos *float* :
+      Ending position of the sweep, for the omega column. (default : 0.0)
+   """
+
+   if in_dry_run():
+      none = np.array([], dtype = int)
+      return None, dict(missing = none, duplicated = none, ok = True)
+
+   t0 = time.time()
+   #names preserved from spec macro
+   table = frame_table(
+      nframes = nframes,
+      frame_time = frame_time,
+      timestamps = timestamp_array.bb_value.get(),
+      n_received = det.cam.num_images_counter.get(),
+      start_pos = start_pos,
+      scan_delta = (end_pos - start_pos)/nframes,
+      moncnt = sample_monitor_array.bb_value.get(),
+      trcnt = sample_transmission_array.bb_value.get(),
+      Emoncnt = energy_monitor_array.bb_value.get(),
+      Etrcnt = intensity_transmission_array.bb_value.get(),
+      cntticks = integrated_time_array.bb_value.get(),
+   )
+   report = bad_frames(table)
+   t1 = time.time()
+
+   if report["ok"]:
+      print(f"All {nframes} frames accounted for in {det.name} timestamps ({t1-t0:.3f}s).")
+   else:
+      print(f"WARNING! {det.name}: {len(report['missing'])} missing and "
+            f"{len(report['duplicated'])} duplicated frames ({t1-t0:.3f}s).")
+      print(f"Frames to re-acquire: {report['missing'].tolist()}")
+
+   return table, report
+
 
 
 def fastsweep(  
@@ -570,6 +916,8 @@ def fastsweep(
       dets,
       use_hydra,
       PSOflyer = True,
+      resume = False,
+      live = None,
       **kwargs
 ):
    """See `fastsweep` from `osc_fastsweep_FPGA_hydra.mac`
@@ -612,9 +960,21 @@ def fastsweep(
    PSOflyer *Boolean* :
       Boolean that decides whether a PSO controller is used to control `fly_motor`.
 
+   resume *Boolean* :
+      If True, continue an interrupted fastsweep with the same arguments: 
+      only the remaining angular range is flown and the file numbering 
+      continues (see `utils/fly_checkpoint.py`). (default : False)
+
+   live *LiveICCollector or None* :
+      If given (e.g., `live_ic`), the IC counts are published while flying 
+      (see `fly_and_collect`). (default : None)
+
 
    """
 
+   #per-phase timings (see `utils/phase_timer.py`)
+   timer = PhaseTimer("fastsweep")
+
    #make sure things are unstaged to start 
    if fly_motor._staged.value != 'no':
       yield from bps.unstage(fly_motor)
@@ -625,44 +985,46 @@ def fastsweep(
 
    #empty anything unwanted in stage_sigs
    fly_motor.stage_sigs = {} 
+
+   #progress of this sweep is checkpointed while flying (see `utils/fly_checkpoint.py`)
+   checkpoint_key = fly_checkpoints.key(scan_folder, file_name)
+   checkpoint_scan = dict(start_pos = start_pos, end_pos = end_pos, nframes = nframes, exposure_time = exposure_time)
+   frame_offset = 0
+   resumed_from = []
+   first_file_number = None
+   if resume:
+      record = fly_checkpoints.get(checkpoint_key)
+      if record is None or record["status"] == "complete":
+         raise ValueError(f"No interrupted fastsweep to resume for {checkpoint_key}.")
+      if record["scan"] != checkpoint_scan:
+         raise ValueError(f"Arguments differ from the interrupted fastsweep: {record['scan']}.")
+      frame_offset = record["frames_done"]
+      if frame_offset >= nframes:
+         raise ValueError(f"All {nframes} frames of {checkpoint_key} were already collected.")
+      resumed_from = record["uids"]
+      first_file_number = record["first_file_number"]
+
+      #fly only the remaining range, continuing the file numbering
+      start_pos = start_pos + frame_offset * (end_pos - start_pos) / nframes
+      nframes = nframes - frame_offset
+      for det in dets:
+         yield from bps.mv(det.tiff1.file_number, first_file_number[det.name] + frame_offset)
+      print(f"Resuming {checkpoint_key} after {frame_offset} frames: {start_pos:.3f} to {end_pos}, {nframes} frames.")
       
   
-   gaps = {
-      "pixirad" : 0.05,
-      "ge1" : 0.15,
-      "ge2" : 0.15,
-      "ge3" : 0.15,
-      "ge4" : 0.15
-   }
+   #calibrated readout gaps (see `calibrate_gap` and `utils/gap_registry.py`)
+   gaps = {det.name : detector_gap(det) for det in dets}
 
    #define gaps and other delay variables
    extra_time = 0.03
-   #TODO: Define shutter variables in shutter object, not here
-   shutterclose_delay = 0
-   shutteropen_delay = 0
-   total_exposure_time = exposure_time + extra_time + gaps[det.name]  #time per exposure  #FIXME: for each det???
+   det_gap = gaps[det.name]
+   total_exposure_time = exposure_time + extra_time + det_gap  #time per exposure  #FIXME: for each det???
 
 
    #fetch information about the scan from AD
    first_frame_number = det.tiff1.file_number.get()   #First frame number recorded by AD
    print(f"First frame number is {first_frame_number}")
 
-   #fetch information about the fly motor (the motor PV, NOT FPGA flyer PV)
-   max_speed = fly_motor.velocity.metadata["upper_ctrl_limit"] #.VMAX; deg/sec
-   min_speed = fly_motor.velocity.metadata["lower_ctrl_limit"] #.VBAS; deg/sec
-   max_pos = fly_motor.high_limit_travel.get()  #.HLM; deg
-   min_pos = fly_motor.low_limit_travel.get()   #.LLM; deg
-   time_to_accel = fly_motor.acceleration.get()  #.ACCL; sec
-   resolution = fly_motor.motor_step_size.get() #.MRES; deg/step
-
-   #check: Is time_to_accel configured?
-   if time_to_accel == 0:
-      raise ValueError("ACCL is not set for fly_motor.")
-   
-     #check: Is max_speed configured? 
-   if max_speed == 0:
-      raise ValueError("VMAX is not set for fly_motor.")
-
    """Per the EPICS databse, the intent of VBAS is to prevent the motor
    from moving at speeds slow enough to excite its resonance, which can
    cause the motor to miss steps. The motor is expected to accelerate from
@@ -672,117 +1034,80 @@ def fastsweep(
    expected to decrease similarly to VBAS."""
 
    print("Calculating details about the scan...")
-   #calculate details about the scan
-   range = abs(end_pos - start_pos)   #Total sweep range; in deg
-   num_steps = range/resolution   #Number of steps taken in total
-   scan_time = total_exposure_time*nframes  #Total time for scan, not including ramp up or down
-   scan_speed_sps = num_steps/scan_time #steps/sec
-   scan_speed_dps = range/scan_time #degrees/sec
-      
-   #check: Are positions in bounds?
-   if start_pos > max_pos or start_pos < min_pos:
-      raise ValueError("Starting position is out of range.")
-   
-   if end_pos >max_pos or start_pos < min_pos: 
-      raise ValueError("Ending position is out of range.")
-   
-   #check: Is speed within bounds? 
-   if scan_speed_dps > max_speed or scan_speed_dps < min_speed:
-      raise ValueError("Requested scan speed is out of bounds.")
+   #speed, ramps, taxi/fly times and timeouts (see `utils/fly_kinematics.py`);
+   #raises ValueError if positions or speed are out of bounds
+   kin = sweep_kinematics(
+      motor = fly_motor,
+      start_pos = start_pos,
+      end_pos = end_pos,
+      nframes = nframes,
+      frame_time = total_exposure_time
+   )
+   scan_speed_dps = kin["scan_speed"][0] #degrees/sec
+   scan_time = kin["scan_time"][0]  #Total time for scan, not including ramp up or down
+   taxi_timeout = kin["taxi_timeout"][0]
+   fly_timeout = kin["fly_timeout"][0]
    print("Completed checks on velocity and position limits.")
 
-   #calculate ramping parameters
-   #e.g., number of motor steps performed in time it takes to open shutter (`steps_to_open`)
-   steps_to_open = int(shutteropen_delay * scan_speed_sps)  
-   steps_to_close = int(shutterclose_delay * scan_speed_sps)
-   steps_to_accelerate = (scan_speed_sps - min_speed)/2 *time_to_accel  #aka asteps
-   degs_to_accelerate = steps_to_accelerate * resolution    #aka arange
-
-   #FIXME: Not sure if these are correct
-   rampup_steps = steps_to_open + steps_to_accelerate
-   rampup_time = (time_to_accel + shutteropen_delay)
-   #assume acceleration/deceleration are symmetric
-   rampdown_steps = steps_to_close + steps_to_accelerate
-   rampdown_time = (time_to_accel + shutterclose_delay)
-
+   #TODO: shutter open/close delays are not included in the ramps yet
    print("Some scan information:")
    print(f"Scan time not incl. rampup or rampdown = {scan_time:.3f} sec.") 
-   print(f"Desired scan speed = {scan_speed_sps:.3f} steps/sec or {scan_speed_dps:.3f} deg/sec.")
-   print(f"Steps to open shutter = {steps_to_open:.0f}. Steps to close shutter = {steps_to_close:.0f}.")
-   print(f"Steps to accel = {steps_to_accelerate:.0f}.")
-   print(f"Degrees needed to accel = {degs_to_accelerate:.3f}.")
+   print(f"Desired scan speed = {scan_speed_dps:.3f} deg/sec.")
+   print(f"Degrees needed to accel = {kin['ramp_distance'][0]:.3f}.")
+   print(f"Predicted taxi time = {kin['taxi_time'][0]:.3f} sec (timeout {taxi_timeout:.1f} sec).")
+   print(f"Predicted fly time = {kin['fly_time'][0]:.3f} sec (timeout {fly_timeout:.1f} sec).")
 
    #TODO: Add code for slave stage parameters?
 
-
-
-
-   #FIXME: Calculating timeouts needs work!!!
-   # #calculate taxi_timeout and fly_timeout (with a little extra room)
-   # fly_fudge = 5  #Fudge factor
-   # fly_timeout = (rampup_time + scan_time + rampdown_time) * fly_fudge
-   # print(f"The fly_timeout is {fly_timeout}. The predicted fly_time is {fly_timeout/fly_fudge}.")
-   
-   # """taxi_time is a rough calculation since it does not take into
-   # account the backoff distance, accleration time, etc. taxi_timeout
-   # has a larger fudge factor that just makes sure the timeout is longer than 
-   # the time needed to actually taxi, based on this approximation.""" 
-   # current_pos = fly_motor.position
-   # taxi_dist = abs(current_pos - start_pos)  
-   # #note: fly_motor is staged later, so taxi velocity will not be scan_speed
-   # taxi_time = taxi_dist / fly_motor.velocity.get()
-   # taxi_fudge = 10
-   # taxi_timeout = taxi_time * taxi_fudge   #Fudge factor of 10
-   # print(f"The taxi_timeout is {taxi_timeout}.")
-
    print("Beginning hardware configuration for fastsweep...")
 
 
-   #make sure plugins are enabled and primed for data collection 
-   #NOTE: this function is contained in `DET.py` file, not here
-   for det in dets:
-      yield from det.enable_plugins()
-
-   #set tiff1 plugin to defaults
-   #FIXME: needs updated entries/do this elsewhere
-   #yield from configure_tiff1(det = det)
-
-   #configure  detector for fastsweep (permanent changes)
-   #NOTE: this function is contained in `DET.py` file, not here
-   for det in dets:
-      yield from det.fastsweep_config(nframes = nframes)
-   print(f"{det.name} config: success.")
-
-   #configure FPGAs needed for fastsweep
-   yield from FPGA_configure(**kwargs)
-   print("FPGA config: success.")
+   with timer.phase("configure"):
+      #make sure plugins are enabled and primed for data collection 
+      #NOTE: this function is contained in `DET.py` file, not here
+      for det in dets:
+         yield from det.enable_plugins()
+
+      #set tiff1 plugin to defaults
+      #FIXME: needs updated entries/do this elsewhere
+      #yield from configure_tiff1(det = det)
+
+      #configure  detector for fastsweep (permanent changes)
+      #NOTE: this function is contained in `DET.py` file, not here
+      for det in dets:
+         yield from det.fastsweep_config(nframes = nframes)
+      print(f"{det.name} config: success.")
+
+      #configure FPGAs, IC scalers, timestamp_array and frame_counter together;
+      #independent writes go out at once, one round-trip per dependency level
+      config_entries = (
+         FPGA_config_entries(**kwargs)
+         + IC_scalers_config_entries()
+         + timestamp_array_config_entries(nframes = nframes, det = det)
+         + frame_counter_config_entries(nframes = nframes)
+      )
+      #unchanged PVs from the previous sweep are skipped (see `fpga_cache`)
+      config_timings = yield from configure_pvs(config_entries, cache = fpga_cache, label = "fastsweep config")
+      print("FPGA, IC_scaler, timestamp_array and frame_counter config: success.")
+      for phase, seconds in config_timings.items():
+         print(f"   {phase}: {seconds:.3f}s")
 
    #select flyer (FPGA PV, NOT the motor PV)
    if PSOflyer:
       flyer = psofly1
 
-   #configure aero fly stage and taxi to backoff position
-   yield from aero_configure(
-      start_pos = start_pos, 
-      end_pos = end_pos,
-      nframes = nframes, 
-      scan_speed_dps = scan_speed_dps, 
-      gap_time = det_gap+extra_time, 
-      flyer = flyer, 
-   )
+   with timer.phase("taxi"):
+      #configure aero fly stage and taxi to backoff position
+      yield from aero_configure(
+         start_pos = start_pos, 
+         end_pos = end_pos,
+         nframes = nframes, 
+         scan_speed_dps = scan_speed_dps, 
+         gap_time = det_gap+extra_time, 
+         flyer = flyer, 
+         taxi_timeout = taxi_timeout,
+      )
    print("Flyer config: success.")
- 
-   #configure IC scalers   #FIXME: not sure if this happens before or after aero
-   yield from IC_scalers_configure()
-   print("IC_scaler config: success.")
-
-   #configure timestamp_array
-   yield from timestamp_array_configure(nframes = nframes, det = det)
-   print("Timestamp_array config: success.")
-
-   #configure frame_counter
-   yield from frame_counter_configure(nframes = nframes)
-   print("Frame_counter config: success.")
    print("Configuration concluded.")
 
    """Per the EPICS database, TP specifies for long, in seconds, the 
@@ -805,43 +1130,27 @@ def fastsweep(
 
  
 
-   #enable detector pulses to IC scaler(E-hutch)
-   in_22Do_vlaue = scaler_trigger.prefix + ".A PP NMS"
-   yield from bps.mv(softglue4.in_22Do, in_22Do_vlaue)  
-   yield from bps.mv(softglue4.in_22IntEdge, "Both") 
-   yield from bps.mv(scaler_trigger.b_value, 1) #enable
-
-   #enable IC_scalers
-   yield from bps.mv(
-      sample_monitor_array.c_value, 1,
-      sample_transmission_array.c_value, 1, 
-      energy_monitor_array.c_value, 1, 
-      intensity_transmission_array.c_value, 1,
-      integrated_time_array.c_value,1
-   )
+   with timer.phase("configure"):
+      #enable detector pulses to IC scaler(E-hutch) and IC_scalers
+      yield from IC_scalers_enable()
 
  
 
-   #if using hydra, do hydra-specific config here (not for GE panels)
-   if use_hydra:
-      yield from hydra.fastsweep_config()
+      #if using hydra, do hydra-specific config here (not for GE panels)
+      if use_hydra:
+         yield from hydra.fastsweep_config()
 
-      #if using hydra configuration in combination with SAXS method, extra setup needed
-      if pixirad in dets:  
-         yield from pixirad.config_with_waxs(nframes = nframes)   #MUST happen after det.fastsweep_config()
-         yield from softglue4_menu.saxs_waxs_config()
-         yield from softglue.saxs_waxs_config()
+         #if using hydra configuration in combination with SAXS method, extra setup needed
+         if pixirad in dets:  
+            yield from pixirad.config_with_waxs(nframes = nframes)   #MUST happen after det.fastsweep_config()
+            yield from softglue4_menu.saxs_waxs_config()
+            yield from softglue.saxs_waxs_config()
 
   
 
-   #clear det_ready and enable/disable det pulses and counters
-   yield from bps.mv(
-      det_ready.clear, "0!",
-      det_pulse_to_ad.b_value, 0,   #disable
-      frame_counter.c_value, 1,  #enable
-      timestamp_array.c_value, 1 #enable
-   )
-   print("Scalers and pulses enabled.")
+      #clear det_ready and enable/disable det pulses and counters
+      yield from counters_enable()
+      print("Scalers and pulses enabled.")
 
    
    #organize last bits of stage_sigs for AD cam
@@ -874,25 +1183,55 @@ def fastsweep(
    fly_motor.stage_sigs["backlash_dist"] = 0.0 #turn off backlash 
    #FIXME: does backlash need to be off for taxiing?? 
 
-   #stage fly_motor and detector (similar to arming)
-   yield from bps.stage(fly_motor)
-   for det in dets:
-      yield from bps.stage(det)
-      print(f"{det.name} staged successfully.")
-   print(f"All dets and {fly_motor.name} staged. Prepared to fly.")
-
-   #arm the strucks last FIXME: do we need this always, or just when using SAXS + WAXS? FIXME: is this in the right spot?
-   yield from bps.mv(
-      struck.channel_advance, "External",
-      struck.erase_start, "Erase"
+   #the run covers staging through deconfiguring, so the phase timings
+   #can be written into it before it closes
+   _md = dict(
+      plan_name = "fastsweep",
+      start_pos = start_pos,
+      end_pos = end_pos,
+      nframes = nframes,
+      exposure_time = exposure_time,
+      scan_folder = scan_folder,
+      file_name = file_name,
+      fly_motor = fly_motor.name,
+      detectors = [det.name for det in dets],
+      first_frame_number = first_frame_number,
+      checkpoint = checkpoint_key,
+      frame_offset = frame_offset,
+      resumed_from = resumed_from,   #uids of the earlier partial runs
+   )
+   uid = yield from bps.open_run(md = _md)
+   if first_file_number is None:
+      first_file_number = {det.name : det.tiff1.file_number.get() for det in dets}
+   fly_checkpoints.begin(
+      checkpoint_key, 
+      scan = checkpoint_scan, 
+      first_file_number = first_file_number, 
+      uid = uid, 
+      frame_offset = frame_offset
    )
 
-   #fly here (press busy button to fly)
+   #stage fly_motor and detectors concurrently (similar to arming)
+   with timer.phase("stage"):
+      stager = yield from stage_all([fly_motor] + dets)
+      print(f"All dets and {fly_motor.name} staged. Prepared to fly.")
+
+      #arm the strucks last FIXME: do we need this always, or just when using SAXS + WAXS? FIXME: is this in the right spot?
+      yield from bps.mv(
+         struck.channel_advance, "External",
+         struck.erase_start, "Erase"
+      )
+
+   #fly here (press busy button to fly); frames and IC arrays are 
+   #collected into databroker as one event page
    print("Flying...")
-   yield from fly(
-      flyer = flyer,
-      #fly_timeout = fly_timeout
-   )
+   with FrameCheckpointer(checkpoint_key, frame_counter.b_value, nframes, dets, frame_offset = frame_offset):
+      yield from fly_and_collect(
+         flyer = flyer,
+         fly_timeout = fly_timeout,
+         timer = timer,
+         live = live,
+      )
 
 
    #fetch information about the scan from AD
@@ -908,75 +1247,541 @@ def fastsweep(
       else: 
          print(f"Acquired expected number of frames for {det.name}.")
 
+   #per-frame table; flags dropped/duplicated frames from timestamp gaps
+   with timer.phase("readback"):
+      sweep_table, frame_check = sweep_frame_report(
+         det = det,
+         nframes = nframes,
+         frame_time = total_exposure_time,
+         start_pos = start_pos,
+         end_pos = end_pos
+      )
+   fly_checkpoints.update(checkpoint_key, status = "complete" if frame_check["ok"] else "bad_frames")
+
    print("Deconfiguring and disabling.")
 
 
    #TODO: rising and falling gate (sofglue.gate)?? Not sure if needed
 
-   #if using, stop hydra
-   if use_hydra: 
-      yield from hydra_stop_capture()
+   with timer.phase("deconfigure"):
+      #if using, stop hydra
+      if use_hydra: 
+         yield from hydra_stop_capture()
 
-   #unstage fly_motor and detector (disarm)
-   for det in dets:
-      yield from bps.unstage(det)
-   yield from bps.unstage(fly_motor)
+      #unstage fly_motor and detectors (disarm)
+      yield from unstage_all(stager)
 
-   #clear det_ready and disable det pulses and counters
-   yield from bps.mv(
-      det_pulse_to_ad.b_value, 0,   #disable
-      frame_counter.c_value, 0,  #disable
-      timestamp_array.c_value, 0 #disable
+      #disable pulses, counters and IC_scalers
+      yield from fastsweep_deconfigure()
+
+   #FIXME:
+   # #disarm scalers
+   # for scaler in scalers: 
+   #    yield from bps.mv(scaler.count, 0)
+
+   print("Deconfiguring complete. IC counts were collected by the flyer.")
+
+   #per-phase timings into the run ("phase_timing" stream) and the metrics file
+   yield from timer.emit()
+   yield from bps.close_run()
+   timer.report()
+   timer.write_metrics(nframes = nframes, exposure_time = exposure_time, fly_motor = fly_motor.name)
+
+   print("End of flyscan.")
+
+   return sweep_table, frame_check
+
+
+
+
+def _taxi_next(flyer, previous, upcoming, group):
+   """Plan stub that writes the PSO fields that differ between the 
+   `previous` and `upcoming` sweeps and starts the taxi to `upcoming`."""
+
+   changed = []
+   if upcoming["scan_speed_dps"] != previous["scan_speed_dps"]:
+      changed += [flyer.slew_speed, upcoming["scan_speed_dps"]]
+   if upcoming["scan_delta"] != previous["scan_delta"]:
+      changed += [flyer.scan_delta, upcoming["scan_delta"]]
+   if changed:
+      yield from bps.mv(*changed)
+   yield from taxi_start(
+      flyer = flyer, 
+      p0 = upcoming["start_pos"], 
+      p1 = upcoming["end_pos"], 
+      taxi_timeout = upcoming["taxi_timeout"],
+      group = group
    )
-   print("Scalers and pulses enabled.")
 
 
-   #disable pulses -- specific to aero and rams
-   yield from bps.mv(softglue4.pso_pulses, '0') 
-   yield from bps.trigger(softglue4.clear_gate) #trigger PROC
-   yield from bps.mv(fake_gate.initial_val_disable, 0)
 
-   #disable IC_scalers
-   yield from bps.mv(
-      sample_monitor_array.c_value, 0,
-      sample_transmission_array.c_value, 0, 
-      energy_monitor_array.c_value, 0, 
-      intensity_transmission_array.c_value, 0,
-      integrated_time_array.c_value, 0
+def _move_next(upcoming, commanded, group):
+   """Plan stub that starts the outer axis moves (`upcoming["moves"]`) 
+   whose target differs from the last `commanded` position, without 
+   waiting. `commanded` (motor -> position) is updated."""
+
+   for motor, position in upcoming.get("moves", {}).items():
+      if commanded.get(motor) != position:
+         yield from bps.abs_set(motor, position, group = group)
+         commanded[motor] = position
+
+
+
+def _wait_until_written(dets, timeout = 60, poll = 0.05):
+   """Plan stub that polls until every det has stopped acquiring and 
+   its tiff1 plugin has stopped capturing (i.e., the files are closed). 
+   Returns at once in a dry run, where `bps.sleep` takes no time."""
+
+   if in_dry_run():
+      return
+   t0 = time.time()
+   for det in dets:
+      while (det.cam.acquire.get() not in (0, "Done") 
+             or det.tiff1.capture.get() not in (0, "Done")):
+         if time.time() - t0 > timeout:
+            raise TimeoutError(f"{det.name} did not finish writing within {timeout}s.")
+         yield from bps.sleep(poll)
+
+
+
+def fastsweep_series(
+      sweeps,
+      nframes,
+      exposure_time,
+      scan_folder,
+      file_name,
+      fly_motor, #sms_aero.roty,
+      dets,
+      use_hydra = False,
+      PSOflyer = True,
+      taxi_timeout = None,
+      fly_timeout = None,
+      max_retries = 1,
+      stop_on_bad_frames = False,
+      live = None,
+      **kwargs
+):
+   """Plan to perform several sweeps (e.g., several omega ranges or z-layers) 
+   with a single configuration. 
+   
+   `fastsweep` configures, stages and deconfigures everything for every 
+   sweep. Here the FPGAs, IC scalers, detectors and the fly motor are 
+   configured and staged once. Between sweeps, only the per-sweep fields are 
+   re-armed (PSO start/end, frame_counter, file names), and the taxi to the 
+   next sweep starts while the previous sweep's files are still being 
+   written.
+
+   Sweeps may also move outer (stepper) axes, e.g., sample z for the 
+   next layer (see `fastsweep_grid`). These moves start as soon as the 
+   previous flight is complete and run while its files are closing and 
+   its IC arrays are read out.
+
+   After each sweep, the per-frame table is checked for missing or 
+   duplicated frames (see `sweep_frame_report`). A bad sweep is flown again 
+   (up to `max_retries` times) right after itself.
+
+   Returns a list with one dictionary per sweep (positions, file name, 
+   frame numbers, bad frames and the idle time before the sweep).
+
+   PARAMETERS
+
+   sweeps *list* :
+      One entry per sweep, either a (start_pos, end_pos) tuple or a 
+      dictionary with keys "start_pos", "end_pos" and optionally 
+      "file_name" and "moves" (a dictionary of outer motor -> position 
+      to be reached before the sweep).
+
+   nframes *int* :
+      Number of frames to be collected during each sweep. 
+
+   exposure_time *float* : 
+      Duration of each expsosure in seconds. 
+
+   scan_folder *str* :
+      Last folder in path where files are written. Does not need to end with "/".
+
+   file_name *str* :
+      Base name given to each output file. Sweeps without their own 
+      "file_name" are written as `<file_name>_<sweep number>`.
+
+   fly_motor *bluesky motor object* : 
+      Motor that will be used to perform flyscan. 
+      Must be entered in bluesky syntax (e.g., sms_aero.roty)
+
+   dets *list of bluesky area detector objects* :
+      Area detectors that will capture images during the sweeps.
+
+   use_hydra *bool* : 
+      True/False value whether to use hydra or not. (default : False)
+
+   PSOflyer *Boolean* :
+      Boolean that decides whether a PSO controller is used to control `fly_motor`.
+      (default : True)
+
+   taxi_timeout *int or None* : 
+      Time in seconds each taxi is allowed to proceed. If None, calculated 
+      per sweep by `sweep_kinematics()`. (default : None)
+
+   fly_timeout *int or None* :
+      Time in seconds each flight is allowed to proceed. If None, calculated 
+      per sweep by `sweep_kinematics()`. (default : None)
+
+   max_retries *int* :
+      How many times a sweep with missing or duplicated frames is flown 
+      again. Retries are written as `<file_name>_retry`. (default : 1)
+
+   stop_on_bad_frames *Boolean* :
+      If True, stop the series when a sweep still has bad frames after 
+      its retries. (default : False)
+
+   live *LiveICCollector or None* :
+      If given (e.g., `live_ic`), the IC counts of each sweep are 
+      published while flying (see `fly_and_collect`). (default : None)
+
+   """
+
+   #organize the sweeps 
+   sweep_list = []
+   for i, sweep in enumerate(sweeps):
+      if not isinstance(sweep, dict):
+         sweep = dict(zip(("start_pos", "end_pos"), sweep))
+      sweep.setdefault("file_name", f"{file_name}_{i:03d}")
+      sweep_list.append(sweep)
+   if not sweep_list:
+      raise ValueError("No sweeps requested.")
+
+   #make sure things are unstaged to start 
+   if fly_motor._staged.value != 'no':
+      yield from bps.unstage(fly_motor)
+   for det in dets:
+      if det._staged.value != 'no':
+         yield from bps.unstage(det)  
+         det.stage_sigs = {} 
+
+   #empty anything unwanted in stage_sigs
+   fly_motor.stage_sigs = {} 
+
+   #calibrated readout gaps (see `calibrate_gap` and `utils/gap_registry.py`)
+   gaps = {det.name : detector_gap(det) for det in dets}
+
+   #the slowest det sets the pace
+   extra_time = 0.03
+   det_gap = max(gaps.values())
+   total_exposure_time = exposure_time + extra_time + det_gap
+
+   #check every sweep in one call before touching any hardware
+   kin = sweep_kinematics(
+      motor = fly_motor,
+      start_pos = [sweep["start_pos"] for sweep in sweep_list],
+      end_pos = [sweep["end_pos"] for sweep in sweep_list],
+      nframes = nframes,
+      frame_time = total_exposure_time
    )
+   for i, sweep in enumerate(sweep_list):
+      sweep["scan_speed_dps"] = kin["scan_speed"][i]
+      sweep["scan_delta"] = kin["scan_delta"][i]
+      sweep["taxi_timeout"] = taxi_timeout if taxi_timeout is not None else kin["taxi_timeout"][i]
+      sweep["fly_timeout"] = fly_timeout if fly_timeout is not None else kin["fly_timeout"][i]
+   print(f"Checked {len(sweep_list)} sweeps against velocity and position limits.")
+   print(f"Predicted time: {kin['taxi_time'].sum():.1f}s taxiing, {kin['fly_time'].sum():.1f}s flying.")
 
-   #disable detector pulses to IC scaler(E-hutch)
-   yield from bps.mv(softglue4.in_22IntEdge, "None")
-   yield from bps.mv(softglue4.in_21IntEdge, "None")  #FIXME: This is not configured to begin with
-   #FIXME: do we need in_17IntEdge too?? Or just for stepper?
-   yield from bps.mv(scaler_trigger.b_value, 0)
+   print("Beginning hardware configuration for fastsweep_series...")
 
-   #disable det_pulse and frame_counter
-   yield from bps.mv(
-      det_pulse_to_ad.b_value, 0,
-      frame_counter.c_value, 0,
-      det_ready.clear, "0!"
+   #configure detectors once
+   for det in dets:
+      yield from det.enable_plugins()
+      yield from det.fastsweep_config(nframes = nframes)
+      print(f"{det.name} config: success.")
+
+   #configure FPGAs, IC scalers, timestamp_array and frame_counter once
+   config_entries = (
+      FPGA_config_entries(**kwargs)
+      + IC_scalers_config_entries()
+      + timestamp_array_config_entries(nframes = nframes, det = det)
+      + frame_counter_config_entries(nframes = nframes)
    )
+   yield from configure_pvs(config_entries, cache = fpga_cache, label = "fastsweep_series config")
 
- 
-   #FIXME:
-   # #disarm scalers
-   # for scaler in scalers: 
-   #    yield from bps.mv(scaler.count, 0)
+   #select flyer (FPGA PV, NOT the motor PV)
+   if PSOflyer:
+      flyer = psofly1
 
-   print("Deconfiguring complete. Getting IC counts")
+   #disable FPGA pulses and configure the flyer for the first sweep
+   yield from bps.mv(softglue4.pso_pulses, '0') #FIXME: only accepts string input
+   yield from bps.trigger(softglue4.clear_gate)
+   first = sweep_list[0]
+   yield from flyer.configure(
+      pulse_type = "Gate",
+      start_pos = first["start_pos"], 
+      end_pos = first["end_pos"], 
+      scan_speed_dps = first["scan_speed_dps"], 
+      scan_delta = first["scan_delta"], 
+      gap_time = det_gap + extra_time
+   )
 
-   #get the arrays (names preserved from spec macro)
-   moncnt   = sample_monitor_array.bb_value
-   trcnt    = sample_transmission_array.bb_value
-   Emoncnt  = energy_monitor_array.bb_value
-   Etrcnt   = intensity_transmission_array.bb_value
-   cntticks = integrated_time_array.bb_value
+   #start taxiing (and moving outer axes) to the first sweep while the rest is configured
+   taxi_group = "fastsweep_series_taxi"
+   move_group = "fastsweep_series_moves"
+   commanded = {}
+   yield from bps.mv(flyer.taxi.timeout, first["taxi_timeout"])
+   yield from bps.trigger(flyer.taxi, group = taxi_group)
+   yield from _move_next(first, commanded, move_group)
 
-   #FIXME: not sure what to do with these after this? (`printdoublearrayshort`)
+   #enable detector pulses to IC scaler(E-hutch) and IC_scalers
+   yield from IC_scalers_enable()
 
-   print("End of flyscan.")
+   #if using hydra, do hydra-specific config here (not for GE panels)
+   if use_hydra:
+      yield from hydra.fastsweep_config()
+      if pixirad in dets:  
+         yield from pixirad.config_with_waxs(nframes = nframes)   #MUST happen after det.fastsweep_config()
+         yield from softglue4_menu.saxs_waxs_config()
+         yield from softglue.saxs_waxs_config()
 
+   yield from counters_enable()
+   print("Scalers and pulses enabled.")
 
+   #stage everything that stays the same for all sweeps;
+   #capture and acquire are armed per sweep instead of by staging
+   for det in dets:
+      det.tiff1.stage_sigs["file_path"] = os.path.join(det.WRITE_PATH,scan_folder,'')
+      det.tiff1.stage_sigs["auto_save"] = "Yes"
+      det.tiff1.stage_sigs["auto_increment"] = "Yes"
 
+      if det.name.startswith("retiga"): 
+         det.cam.stage_sigs["acquire_time"] = exposure_time
+         det.cam.stage_sigs["acquire_period"] = 0  #retiga acquire period must be 0
+      else:
+         det.cam.stage_sigs["acquire_time"] = exposure_time
+         det.cam.stage_sigs["acquire_period"] = exposure_time + gaps[det.name]
+
+   fly_motor.stage_sigs["velocity"] = first["scan_speed_dps"]
+   fly_motor.stage_sigs["backlash_dist"] = 0.0 #turn off backlash 
+
+   stager = yield from stage_all([fly_motor] + dets)
+   print(f"All dets and {fly_motor.name} staged. Prepared to fly {len(sweep_list)} sweeps.")
+
+   results = []
+   t_last_fly = None
+   i = 0
+   while i < len(sweep_list):
+      sweep = sweep_list[i]
+
+      #re-arm only the per-sweep fields
+      yield from bps.mv(
+         frame_counter.b_value, nframes + 1,
+         *[arg for det in dets for arg in (det.tiff1.file_name, sweep["file_name"])]
+      )
+      first_frame_number = [det.tiff1.file_number.get() for det in dets]
+
+      #wait for the taxi and outer moves started at the end of the previous sweep
+      yield from bps.wait(group = taxi_group)
+      yield from bps.wait(group = move_group)
+      if i > 0 and sweep["scan_speed_dps"] != sweep_list[i-1]["scan_speed_dps"]:
+         yield from bps.mv(fly_motor.velocity, sweep["scan_speed_dps"])
+      yield from pso_pulses_enable()
+
+      #arm detectors and strucks
+      for det in dets:
+         yield from bps.mv(det.tiff1.capture, 1)
+         yield from bps.mv(det.cam.acquire, 1)
+      yield from bps.mv(
+         struck.channel_advance, "External",
+         struck.erase_start, "Erase"
+      )
+
+      t_idle = time.time() - t_last_fly if t_last_fly is not None else 0
+      print(f"Flying sweep {i+1}/{len(sweep_list)}: {sweep['start_pos']} to {sweep['end_pos']} ({sweep['file_name']})...")
+      _md = dict(
+         plan_name = "fastsweep_series",
+         sweep_number = i,
+         num_sweeps = len(sweep_list),
+         start_pos = sweep["start_pos"],
+         end_pos = sweep["end_pos"],
+         nframes = nframes,
+         exposure_time = exposure_time,
+         scan_folder = scan_folder,
+         file_name = sweep["file_name"],
+         fly_motor = fly_motor.name,
+         detectors = [det.name for det in dets],
+         first_frame_number = first_frame_number,
+         retry = sweep.get("retries", 0),
+         outer_positions = {motor.name : position for motor, position in sweep.get("moves", {}).items()},
+      )
+
+      #outer axes go to the next sweep as soon as this flight is complete
+      after_fly = None
+      if i + 1 < len(sweep_list):
+         after_fly = lambda: _move_next(sweep_list[i + 1], commanded, move_group)
+      yield from bpp.run_wrapper(
+         fly_and_collect(flyer = flyer, fly_timeout = sweep["fly_timeout"], after_fly = after_fly, live = live), 
+         md = _md
+      )
+      t_last_fly = time.time()
+
+      yield from pso_pulses_disable()
+
+      #taxi to the next sweep while this sweep's files are closing
+      taxi_target = sweep
+      if i + 1 < len(sweep_list):
+         taxi_target = sweep_list[i + 1]
+         yield from _taxi_next(flyer, sweep, taxi_target, taxi_group)
+
+      yield from _wait_until_written(dets)
+
+      #gate the next sweep on the per-frame table
+      _, frame_check = sweep_frame_report(
+         det = dets[-1],    #det used by timestamp_array
+         nframes = nframes,
+         frame_time = total_exposure_time,
+         start_pos = sweep["start_pos"],
+         end_pos = sweep["end_pos"]
+      )
+
+      results.append(dict(
+         start_pos = sweep["start_pos"],
+         end_pos = sweep["end_pos"],
+         file_name = sweep["file_name"],
+         outer_positions = _md["outer_positions"],
+         first_frame_number = first_frame_number,
+         last_frame_number = [det.tiff1.file_number.get() for det in dets],
+         idle_time = t_idle,
+         missing_frames = frame_check["missing"].tolist(),
+         duplicated_frames = frame_check["duplicated"].tolist(),
+      ))
+
+      if not frame_check["ok"]:
+         if sweep.get("retries", 0) < max_retries:
+            retry = dict(
+               sweep, 
+               retries = sweep.get("retries", 0) + 1, 
+               file_name = f"{sweep['file_name']}_retry",
+               taxi_timeout = max(other["taxi_timeout"] for other in sweep_list),  #taxi starts from the next sweep
+            )
+            sweep_list.insert(i + 1, retry)
+            print(f"Flying sweep {i+1} again as {retry['file_name']}.")
+
+            #the taxi and outer axes already went to the next sweep, go back
+            yield from bps.wait(group = taxi_group)
+            yield from bps.wait(group = move_group)
+            yield from _taxi_next(flyer, taxi_target, retry, taxi_group)
+            yield from _move_next(retry, commanded, move_group)
+         elif stop_on_bad_frames:
+            print("Bad frames remain after retries, stopping the series.")
+            yield from bps.wait(group = taxi_group)
+            yield from bps.wait(group = move_group)
+            break
+
+      i += 1
+
+   print("Deconfiguring and disabling.")
+
+   #if using, stop hydra
+   if use_hydra: 
+      yield from hydra_stop_capture()
+
+   #unstage fly_motor and detectors (disarm)
+   yield from unstage_all(stager)
 
+   #disable pulses, counters and IC_scalers
+   yield from fastsweep_deconfigure()
+
+   idle = [result["idle_time"] for result in results[1:]]
+   if idle:
+      print(f"Idle time between sweeps: mean {np.mean(idle):.3f}s, max {np.max(idle):.3f}s.")
+   print("End of fastsweep_series.")
+
+   return results
+
+
+
+
+def fastsweep_grid(
+      outer,
+      start_pos,
+      end_pos,
+      nframes,
+      exposure_time,
+      scan_folder,
+      file_name,
+      fly_motor, #sms_aero.roty,
+      dets,
+      bidirectional = True,
+      **kwargs
+):
+   """Plan to fly the same rotation sweep at every point of a grid of outer
+   (stepper) axes, e.g., several z-layers of an HEDM or tomo measurement.
+
+   Runs as one `fastsweep_series` with a single configuration. The outer 
+   move to the next grid point starts as soon as a flight is complete and 
+   overlaps with detector file close and IC array readout. With 
+   `bidirectional`, every other sweep runs from `end_pos` back to 
+   `start_pos`, so no return taxi is needed between grid points.
+
+   Returns the per-sweep list of `fastsweep_series`.
+
+   PARAMETERS
+
+   outer *list* :
+      (motor, positions) pairs, slowest axis first, 
+      e.g., [(sample_z, [0, 0.1, 0.2])]. The sweeps cover every 
+      combination of positions.
+
+   start_pos *float* :
+      Starting position of the rotation sweep in EGUs.
+
+   end_pos *float* : 
+      Ending position of the rotation sweep in EGUs. 
+
+   nframes *int* :
+      Number of frames per sweep. 
+
+   exposure_time *float* : 
+      Duration of each expsosure in seconds. 
+
+   scan_folder *str* :
+      Last folder in path where files are written. Does not need to end with "/".
+
+   file_name *str* :
+      Base name given to each output file; each grid point is written as 
+      `<file_name>_<grid point number>`.
+
+   fly_motor *bluesky motor object* : 
+      Motor that will be used to perform flyscan. 
+      Must be entered in bluesky syntax (e.g., sms_aero.roty)
+
+   dets *list of bluesky area detector objects* :
+      Area detectors that will capture images during the sweeps.
+
+   bidirectional *Boolean* :
+      If True, alternate the sweep direction between grid points. 
+      (default : True)
+
+   kwargs :
+      Passed on to `fastsweep_series` (e.g., use_hydra, max_retries).
+
+   """
+
+   motors = [motor for motor, _ in outer]
+   sweeps = []
+   for k, point in enumerate(itertools.product(*[positions for _, positions in outer])):
+      reverse = bidirectional and k % 2 == 1
+      sweeps.append(dict(
+         start_pos = end_pos if reverse else start_pos,
+         end_pos = start_pos if reverse else end_pos,
+         file_name = f"{file_name}_{k:03d}",
+         moves = dict(zip(motors, point)),
+      ))
+   print(f"fastsweep_grid: {len(sweeps)} sweeps over {[motor.name for motor in motors]}.")
+
+   results = yield from fastsweep_series(
+      sweeps = sweeps,
+      nframes = nframes,
+      exposure_time = exposure_time,
+      scan_folder = scan_folder,
+      file_name = file_name,
+      fly_motor = fly_motor,
+      dets = dets,
+      **kwargs
+   )
+   return results
@@ -0,0 +1,175 @@
+"""
+Stage and unstage several devices at the same time.
+
+`bps.stage(det)` applies the stage_sigs of one device (and its plugins)
+serially, so staging hydra's four GE panels plus pixirad costs five
+serial passes. `stage_all()` stages every device in its own thread and
+waits for all of them. Within a device, stage_sigs are still
+applied in order (e.g., cam acquire after the file plugin's capture).
+
+If any device fails to stage, the others are still waited for, those
+that did stage are unstaged again (those past the timeout as soon as they
+finish) and the failure is raised, as with `bps.stage()`. The RunEngine
+tracks the group like any staged device, so it is also unstaged if the
+plan is aborted.
+
+USAGE::
+
+    stager = yield from stage_all([fly_motor] + dets)
+    ...
+    yield from unstage_all(stager)
+"""
+
+__all__ = [
+    "ParallelStager",
+    "stage_all",
+    "unstage_all",
+]
+
+import logging
+logger = logging.getLogger(__name__)
+logger.info(__file__)
+
+from bluesky import plan_stubs as bps
+import threading
+import time
+
+
+class ParallelStager(object):
+    """
+    Stageable group of devices; `stage()` and `unstage()` run on all
+    devices concurrently.
+
+    PARAMETERS
+
+    devices *list of ophyd devices* :
+        Devices to stage (e.g., [fly_motor] + dets).
+
+    timeout *float or None* :
+        Seconds to wait for all devices to stage. (default : None)
+    """
+
+    parent = None   #so the RunEngine treats the group as a root device
+
+    def __init__(self, devices, timeout = None):
+        self.devices = list(devices)
+        self.timeout = timeout
+        self.name = "+".join(device.name for device in self.devices)
+        self._threads = {}      #device name -> thread of the last `_run_all()`
+
+    def _run_all(self, method):
+        """Call `method` (e.g., "stage") of every device in its own thread.
+        Returns (devices that succeeded, {device name: exception}).
+
+        Every thread is joined (up to `timeout`) before the results are
+        sorted, so one failure does not hide devices still working."""
+
+        results = {}
+        self._threads = {}
+        for device in self.devices:
+
+            def target(device = device):
+                try:
+                    getattr(device, method)()
+                except Exception as excuse:
+                    results[device.name] = excuse
+                else:
+                    results[device.name] = None
+
+            thread = threading.Thread(target = target, daemon = True, name = f"{method}_{device.name}")
+            thread.start()
+            self._threads[device.name] = thread
+
+        deadline = time.time() + self.timeout if self.timeout is not None else None
+        for thread in self._threads.values():
+            thread.join(timeout = max(deadline - time.time(), 0) if deadline is not None else None)
+
+        done = []
+        errors = {}
+        for device in self.devices:
+            if device.name not in results:
+                errors[device.name] = TimeoutError(f"{method} did not finish within {self.timeout}s")
+            elif results[device.name] is not None:
+                errors[device.name] = results[device.name]
+            else:
+                done.append(device)
+        return done, errors
+
+    def _unstage_when_done(self, device):
+        """Unstage `device` once its (timed out) stage thread finishes."""
+        thread = self._threads[device.name]
+
+        def target():
+            thread.join()
+            if device._staged.value == "no":
+                return      #its stage() failed after all
+            try:
+                device.unstage()
+                logger.warning(f"{device.name} finished staging after the timeout and was unstaged.")
+            except Exception as excuse:
+                logger.error(f"Could not unstage {device.name}: {excuse}")
+
+        threading.Thread(target = target, daemon = True, name = f"unstage_{device.name}").start()
+
+    def stage(self):
+        """Stage all devices; on failure, unstage those that staged and raise."""
+        t0 = time.time()
+        staged, errors = self._run_all("stage")
+        if errors:
+            logger.warning(f"Staging failed for {list(errors)}; unstaging {[device.name for device in staged]}.")
+            for device in staged:
+                try:
+                    device.unstage()
+                except Exception as excuse:
+                    logger.error(f"Could not unstage {device.name}: {excuse}")
+            for device in self.devices:
+                if isinstance(errors.get(device.name), TimeoutError):
+                    self._unstage_when_done(device)
+            #report a real failure before a device that was only slow
+            name, excuse = next(
+                (item for item in errors.items() if not isinstance(item[1], TimeoutError)),
+                next(iter(errors.items())),
+            )
+            raise RuntimeError(f"Could not stage {name}: {excuse}") from excuse
+        logger.info(f"Staged {self.name} in {time.time()-t0:.3f}s.")
+        return list(self.devices)
+
+    def unstage(self):
+        """Unstage all devices; raise after all were tried if any failed."""
+        t0 = time.time()
+        unstaged, errors = self._run_all("unstage")
+        if errors:
+            name, excuse = next(iter(errors.items()))
+            raise RuntimeError(f"Could not unstage {name}: {excuse}") from excuse
+        logger.info(f"Unstaged {self.name} in {time.time()-t0:.3f}s.")
+        return unstaged
+
+
+def stage_all(devices, timeout = None):
+    """
+    Plan stub to stage `devices` concurrently. Returns the
+    `ParallelStager`; pass it to `unstage_all()`.
+
+    PARAMETERS
+
+    devices *list of ophyd devices* :
+        Devices to stage (e.g., [fly_motor] + dets).
+
+    timeout *float or None* :
+        Seconds to wait for all devices to stage. (default : None)
+    """
+    stager = ParallelStager(devices, timeout = timeout)
+    yield from bps.stage(stager)
+    return stager
+
+
+def unstage_all(stager):
+    """
+    Plan stub to unstage the devices staged by `stage_all()`.
+
+    PARAMETERS
+
+    stager *ParallelStager* :
+        Returned by `stage_all()`.
+    """
+    yield from bps.unstage(stager)
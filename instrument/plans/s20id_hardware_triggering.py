@@ -24,7 +24,14 @@ from bluesky import plan_stubs as bps
 from ..devices.s20id_pso import *
 from ..devices.varex import varex20idff
 from ..devices.s20id_FPGAs import *
+from ..devices.s20id_FPGAs import c_shutter
+from ..utils.fly_kinematics import sweep_kinematics
+from ..utils.gap_registry import detector_gap
+from ..utils.phase_timer import PhaseTimer
+from ..utils.dark_cache import dark_cache
+from ..utils.plan_simulator import in_dry_run
 
+import os
 import time
 import numpy as np
 
@@ -102,91 +109,92 @@ def enfly(
     flyer,
     use_save = True, 
     det = varex20idff,
+    use_dark_cache = True,
     **kwargs
 ):
     
-    """See `enfly` and `enfly_w_dark` in ensemble_fly.mac for spec macro."""
+    """See `enfly` and `enfly_w_dark` in ensemble_fly.mac for spec macro.
+    
+    If `use_dark_cache` is True, darks taken earlier with the same detector
+    settings are reused (see `utils/dark_cache.py`) and the dark series is
+    skipped; the cached file is recorded in the run metadata (`dark_file`)."""
+    
+    #per-phase timings (see `utils/phase_timer.py`)
+    timer = PhaseTimer("enfly")
         
     #make sure things are unstaged to start 
     if fly_motor._staged.value != 'no':
         yield from bps.unstage(fly_motor)
-    for det in dets:
-      if det._staged.value != 'no':
-         yield from bps.unstage(det)  
-         det.stage_sigs = {} 
+    if det._staged.value != 'no':
+        yield from bps.unstage(det)  
+        det.stage_sigs = {} 
 
     #empty anything unwanted in stage_sigs
     fly_motor.stage_sigs = {} 
     
-    #define det readout times
-    gaps = {
-      "varex20idff" : 0.067
-    }
+    #define det readout times (see `calibrate_gap` and `utils/gap_registry.py`)
+    det_gap = detector_gap(det)
        
     #define gaps and other delay variables
     extra_time = 0.03
     shutterclose_delay = 0
     shutteropen_delay = 0
-    total_exposure_time = exposure_time + extra_time + gaps[det.name]  #time per exposure  #FIXME: for each det???
+    total_exposure_time = exposure_time + extra_time + det_gap  #time per exposure
         
-    #fetch information about the fly motor (the motor PV, NOT FPGA flyer PV)
-    max_speed = fly_motor.velocity.metadata["upper_ctrl_limit"] #.VMAX; deg/sec
-    min_speed = fly_motor.velocity.metadata["lower_ctrl_limit"] #.VBAS; deg/sec
-    max_pos = fly_motor.high_limit_travel.get()  #.HLM; deg
-    min_pos = fly_motor.low_limit_travel.get()   #.LLM; deg
-    time_to_accel = fly_motor.acceleration.get()  #.ACCL; sec
-    resolution = fly_motor.motor_step_size.get() #.MRES; deg/step
-
-    #calculate some information about the scan
-    range = abs(end_pos - start_pos)   #Total sweep range; in deg
-    num_steps = range/resolution   #Number of steps taken in total
-    scan_time = total_exposure_time*nframes  #Total time for scan, not including ramp up or down
-    scan_speed_sps = num_steps/scan_time #steps/sec
-    scan_speed_dps = range/scan_time #degrees/sec
-    scan_delta = range/nframes#deg/frame  
-    
+    #speed, ramps, taxi/fly times and timeouts (see `utils/fly_kinematics.py`)
+    kin_args = dict(
+        motor = fly_motor,
+        start_pos = start_pos,
+        end_pos = end_pos,
+        nframes = nframes,
+        frame_time = total_exposure_time,
+    )
     
     #run some checks and return warnings
-    if start_pos > max_pos or start_pos < min_pos: 
-        Warning(f"""Start position is out of bounds. \n
-                Min allowed {min_pos}, max allowed {max_pos}. \n
-                Received {start_pos}.""")
-
-    if end_pos > max_pos or end_pos < min_pos:
-        Warning(f"""End position is out of bounds. \n
-                Min allowed {min_pos}, max allowed {max_pos}. \n
-                Received {end_pos}.""")  
-        
-    if scan_speed_dps > max_speed or scan_speed_dps < min_speed:
-        Warning(f"""Requested scan speed is out of bounds. \n
-                Min allowed {min_speed} deg/s, max allowed {max_speed} deg/s. \n 
-                Calculated {scan_speed_dps} deg/s. \n 
-                Adjust nframes, scan range, or exposure time.""")  
+    try:
+        kin = sweep_kinematics(**kin_args)
+    except ValueError as excuse:
+        print(f"WARNING! {excuse}")
+        kin = sweep_kinematics(check = False, **kin_args)
+
+    scan_speed_dps = kin["scan_speed"][0] #degrees/sec
+    scan_delta = kin["scan_delta"][0] #deg/frame  
+    print(f"Predicted taxi time = {kin['taxi_time'][0]:.3f} sec, fly time = {kin['fly_time'][0]:.3f} sec.")
         
-    #prepare detector in continuous mode (default fastsweep config)
-    #TODO: potentially add kwargs for num_img, trigger_mode, image_mode
-    yield from det.fastsweep_config()
-    
-    #set flyer params
-    yield from bps.mv(
-        flyer.scan_control, "Standard",
-        flyer.pulse_type, "Gate",
-        flyer.start_pos, start_pos, 
-        flyer.end_pos, end_pos, 
-        flyer.scan_delta, scan_delta,   #deg/step
-        flyer.slew_speed, scan_speed_dps,   #deg/s
-        flyer.detector_setup_time, total_exposure_time  #gap.det + extra_time
-    )
+    with timer.phase("configure"):
+        #prepare detector in continuous mode (default fastsweep config)
+        #TODO: potentially add kwargs for num_img, trigger_mode, image_mode
+        yield from det.fastsweep_config()
     
-    #disable PSO signal 
-    yield from bps.mv(softglue.pso_signal_enable, 0)    #disable
+        #set flyer params
+        yield from bps.mv(
+            flyer.scan_control, "Standard",
+            flyer.pulse_type, "Gate",
+            flyer.start_position, start_pos, 
+            flyer.end_position, end_pos, 
+            flyer.scan_delta, scan_delta,   #deg/step
+            flyer.slew_speed, scan_speed_dps,   #deg/s
+            flyer.detector_setup_time, total_exposure_time  #gap.det + extra_time
+        )
     
-    #taxi with default timeout 
-    yield from taxi(
-        flyer = flyer,
-        p0 = start_pos, 
-        p1 = end_pos, 
-    )
+        #disable PSO signal 
+        yield from bps.mv(softglue.pso_signal_enable, 0)    #disable
+    
+    #reuse cached darks taken with the same detector settings (see `utils/dark_cache.py`)
+    dark_record = None
+    if ndarks > 0 and use_dark_cache:
+        dark_record = dark_cache.lookup(det, exposure_time)
+        if dark_record is not None:
+            print(f"Using cached darks {dark_record['file']} ({dark_record['ndarks']} frames, {dark_record['date']}); skipping {ndarks} darks.")
+    
+    with timer.phase("taxi"):
+        #taxi with calculated timeout 
+        yield from taxi(
+            flyer = flyer,
+            p0 = start_pos, 
+            p1 = end_pos, 
+            taxi_timeout = kin["taxi_timeout"][0],
+        )
         
     if not use_save:
         print('Not saving images. Setting to stream mode.')
@@ -194,60 +202,92 @@ def enfly(
             det.hdf1.file_write_mode, 'Stream',
             det.hdf1.capture, 'Done',
             det.hdf1.auto_save, 'No',
-            det.hdf1.num_capture, nframes+ndarks)
+            det.hdf1.num_capture, nframes + (ndarks if dark_record is None else 0))
         
         #start capture
         yield from bps.mv(det.hdf1.capture, 1)
         
-    #collect darks before the scan
-    if ndarks > 0:
-        print(f"Collect {ndarks} dark images before the scan.")
+    with timer.phase("darks"):
+        #collect darks before the scan
+        if ndarks > 0 and dark_record is None:
+            print(f"Collect {ndarks} dark images before the scan.")
         
-        #close shutter
-        yield from bps.mv(c_shutter, 14)
+            #close shutter
+            yield from bps.mv(c_shutter, 14)
         
-        #set stage_sigs for collecting a dark frame
-        det.cam.stage_sigs = {
-            'frame_type' : "dark",
-            'num_images' : ndarks,
-            'trigger_mode' : "Internal",
-            'acquire_time' : exposure_time,
-            'acquire_period' : total_exposure_time,
-            'skip_frames' : 1,
-            'num_frames_skip' : 1
-        }
+            #set stage_sigs for collecting a dark frame
+            det.cam.stage_sigs = {
+                'frame_type' : "dark",
+                'num_images' : ndarks,
+                'trigger_mode' : "Internal",
+                'acquire_time' : exposure_time,
+                'acquire_period' : total_exposure_time,
+                'skip_frames' : 1,
+                'num_frames_skip' : 1
+            }
         
-        det.proc1.stage_sigs = {
-            'enable_background' : 'Disable'
-        }
+            det.proc1.stage_sigs = {
+                'enable_background' : 'Disable'
+            }
         
-        det.hdf1.stage_sigs = {
-            'file_path' : os.path.join(det.WRITE_PATH,scan_folder,''),
-            'file_name' : file_name,
-            'auto_save' : 'Yes',
-            'auto_increment' : 'Yes',
-            'capture' : 'Capture'
-        }
-        if not use_save: 
-            det.hdf1.stage_sigs['auto_save'] = "No"
+            det.hdf1.stage_sigs = {
+                'file_path' : os.path.join(det.hdf1.write_path_template,scan_folder,''),
+                'file_name' : file_name,
+                'auto_save' : 'Yes',
+                'auto_increment' : 'Yes',
+                'capture' : 'Capture'
+            }
+            if not use_save: 
+                det.hdf1.stage_sigs['auto_save'] = "No"
         
-        #implement stage_sigs
-        det.stage() #FIXME: should yield from, but bps.stage() not waiting?
+            #implement stage_sigs (not in a dry run, see `utils/plan_simulator.py`)
+            dry_run = in_dry_run()
+            if not dry_run:
+                det.stage() #FIXME: should yield from, but bps.stage() not waiting?
       
-        #FIXME: start capture again here?
+            #FIXME: start capture again here?
       
-        #take darks
-        yield from bps.trigger(det, wait = True)
+            #take darks
+            yield from bps.trigger(det, wait = True)
         
-        #unstage back to flyscan setup
-        det.unstage()   #FIXME
+            #unstage back to flyscan setup
+            if not dry_run:
+                det.unstage()   #FIXME
+            
+            #keep the averaged darks for the next sweeps with the same settings
+            if use_dark_cache and use_save and not dry_run:
+                try:
+                    dark_record = dark_cache.store_from_plugin(det, exposure_time)
+                except Exception as excuse:
+                    logger.warning(f"Could not cache the darks of {det.name}: {excuse}")
         
-        #re-open shutter
-        yield from bps.mv(c_shutter, 13)
+            #re-open shutter
+            yield from bps.mv(c_shutter, 13)
         
     #once darks are complete, re-enable PSO signal
     yield from bps.mv(softglue.pso_signal_enable, 1)    #enable
     
-    #fly
-    yield from fly(flyer = flyer)
+    #fly with calculated timeout, inside a run that keeps the phase timings
+    yield from bps.open_run(md = dict(
+        plan_name = "enfly",
+        start_pos = start_pos,
+        end_pos = end_pos,
+        nframes = nframes,
+        ndarks = ndarks,
+        exposure_time = exposure_time,
+        scan_folder = scan_folder,
+        file_name = file_name,
+        fly_motor = fly_motor.name,
+        detectors = [det.name],
+        dark_file = dark_record["file"] if dark_record else None,
+        dark_cache_key = dark_record["key"] if dark_record else None,
+    ))
+    with timer.phase("fly"):
+        yield from fly(flyer = flyer, fly_timeout = kin["fly_timeout"][0])
+    
+    #per-phase timings into the run ("phase_timing" stream) and the metrics file
+    yield from timer.emit()
+    yield from bps.close_run()
+    timer.report()
+    timer.write_metrics(nframes = nframes, ndarks = ndarks, exposure_time = exposure_time, fly_motor = fly_motor.name)
     
\ No newline at end of file
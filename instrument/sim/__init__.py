@@ -0,0 +1,7 @@
+"""
+Local simulators of the beamline hardware (no network beyond localhost).
+
+`fly_ioc` is a caproto soft IOC for the fly scan PVs; launch it with
+`python -m instrument.sim` (see `fly_ioc.py`). caproto is only imported
+when the simulator runs.
+"""
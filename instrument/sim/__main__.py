@@ -0,0 +1,5 @@
+"""Run the fly scan simulator IOC: `python -m instrument.sim --list-pvs`."""
+
+from .fly_ioc import main
+
+main()
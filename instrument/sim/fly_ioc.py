@@ -0,0 +1,627 @@
+"""
+caproto soft IOC emulating the 1-ID fly scan hardware on localhost.
+
+Serves the PVs used by `psofly1` (PSOTaxiFlyDevice, busy taxi/fly with
+motion times from the fly motor's VELO/ACCL), the softGlue FPGAs,
+`fake_gate`, `frame_counter` (FrameCounterTran), the userArrayCalc IC
+and timestamp arrays (GenericArrayCalc), `det_pulse_to_ad`, `struck`,
+`scaler2`, the fly motor (`sms_aero.roty`, 1ide:m9) and a fake area
+detector (cam1: and TIFF1: with a frame counter; image1:, Proc1:,
+Trans1:, Over1: and ROI1: only enable and report their port), all under
+the beamline PV names, so the instrument devices connect without changes.
+
+The signal routing is hard-wired, not evaluated from the link and CALC
+fields (those are only stored):
+
+* each PSO pulse during `fly` counts `frame_counter.B` down (armed to
+  nframes + 1) while it is above zero and softglue4 `pso_pulses` is "1";
+* each counted pulse shifts one value into every userArrayCalc `.BB`
+  (newest first, as "C?(BB>>1)+AA:BB") and, if the fake detector is
+  acquiring in External trigger mode, makes one frame.
+
+In Internal trigger mode the fake detector acquires by itself at
+AcquirePeriod. Frames are counted (ArrayCounter, NumImagesCounter,
+FileNumber); no image data and no files are written.
+
+Launch it from the instrument package, then point CA at localhost in the
+session that uses it::
+
+    python -m instrument.sim --list-pvs
+
+    export EPICS_CA_AUTO_ADDR_LIST=NO
+    export EPICS_CA_ADDR_LIST=127.0.0.1
+
+It listens on 127.0.0.1 only, since its PVs carry the production names;
+serving them on other interfaces must be asked for explicitly with
+`--interfaces` (EPICS_CAS_INTF_ADDR_LIST is ignored).
+
+The detector prefix is a macro (default "1idSIM:"), e.g.
+`python -m instrument.sim --det_prefix s1_pixirad2:`.
+"""
+
+__all__ = [
+    "FlyScanIOC",
+    "main",
+]
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+logger.info(__file__)
+
+
+from caproto import ChannelType
+from caproto.server import PVGroup
+from caproto.server import SubGroup
+from caproto.server import pvproperty
+from caproto.server import run
+from caproto.server import template_arg_parser
+import asyncio
+import math
+import random
+import time
+
+
+#the PVs have production names: never serve them beyond this host unless asked to
+LOCAL_INTERFACES = ("127.0.0.1",)
+
+#record menus
+SCAN_MENU = ["Passive", "Event", "I/O Intr", "10 second", "5 second", "2 second",
+             "1 second", ".5 second", ".2 second", ".1 second"]
+OOPT_MENU = ["Every Time", "On Change", "When Zero", "When Non-zero",
+             "Transition To Zero", "Transition To Non-zero"]
+DOPT_MENU = ["Use CALC", "Use OCAL"]
+COPT_MENU = ["Conditional", "Always"]
+WAIT_MENU = ["NoWait", "Wait"]
+BUSY_MENU = ["Done", "Busy"]
+ENABLE_MENU = ["Disable", "Enable"]
+NO_YES_MENU = ["No", "Yes"]
+IMAGE_MODE_MENU = ["Single", "Multiple", "Continuous"]
+TRIGGER_MODE_MENU = ["Internal", "External"]
+FRAME_TYPE_MENU = ["Normal", "Background", "FlatField", "dark"]
+FILE_WRITE_MODE_MENU = ["Single", "Capture", "Stream"]
+CAPTURE_MENU = ["Done", "Capture"]
+
+#longest userArrayCalc (.NUSE) served
+ARRAY_LENGTH = 16384
+
+
+def _string(name, value = "", **kwargs):
+    return pvproperty(name = name, value = value, dtype = ChannelType.STRING, **kwargs)
+
+
+def _enum(name, menu, value = None, **kwargs):
+    return pvproperty(name = name, value = value or menu[0], enum_strings = menu, dtype = ChannelType.ENUM, **kwargs)
+
+
+def _float(name, value = 0.0, **kwargs):
+    return pvproperty(name = name, value = float(value), dtype = float, **kwargs)
+
+
+def _int(name, value = 0, **kwargs):
+    return pvproperty(name = name, value = int(value), dtype = int, **kwargs)
+
+
+def _make_group(class_name, fields, doc = None):
+    """
+    Build a PVGroup class from {attribute: pvproperty}; used for groups of
+    plain, stored-only PVs.
+    """
+    attrs = dict(fields)
+    attrs["__doc__"] = doc
+    return type(class_name, (PVGroup,), attrs)
+
+
+def _mirror(rbv_attr):
+    """Putter copying the written value to the group's `rbv_attr` PV
+    (areaDetector "<name>_RBV" style)."""
+
+    async def mirror(group, instance, value):
+        await getattr(group, rbv_attr).write(value)
+        return value
+
+    return mirror
+
+
+#---- EPICS records, stored only ----
+
+CalcoutGroup = _make_group("CalcoutGroup", dict(
+    description = _string(".DESC"),
+    scan = _enum(".SCAN", SCAN_MENU),
+    a_value = _float(".A"),
+    b_value = _float(".B"),
+    in_link_a = _string(".INPA"),
+    output_execute_delay = _float(".ODLY"),
+    output_execute_option = _enum(".OOPT", OOPT_MENU),
+    output_data_option = _enum(".DOPT", DOPT_MENU),
+    calc = _string(".CALC"),
+    out_calc = _string(".OCAL"),
+    out_link = _string(".OUT"),
+), doc = "userCalcOut record (fake_gate, scaler_trigger, det_status_monitor).")
+
+
+TransformGroup = _make_group("TransformGroup", dict(
+    description = _string(".DESC"),
+    scan = _enum(".SCAN", SCAN_MENU),
+    calc_option = _enum(".COPT", COPT_MENU),
+    out_link_b = _string(".OUTB"),
+    out_link_d = _string(".OUTD"),
+    **{f"in_link_{x}" : _string(f".INP{x.upper()}") for x in "abcde"},
+    **{f"comment_{x}" : _string(f".CMT{x.upper()}") for x in "abcd"},
+    **{f"expression_{x}" : _string(f".CLC{x.upper()}") for x in "abcd"},
+    **{f"{x}_value" : _float(f".{x.upper()}") for x in "abcd"},
+), doc = "userTran record (frame_counter, hem_info).")
+
+
+StringCalcGroup = _make_group("StringCalcGroup", dict(
+    description = _string(".DESC"),
+    scan = _enum(".SCAN", SCAN_MENU),
+    a_value = _float(".A"),
+    b_value = _float(".B"),
+    c_value = _float(".C"),
+    in_link_a = _string(".INPA"),
+    aa_value = _string(".AA"),
+    bb_value = _string(".BB"),
+    calc = _string(".CALC"),
+    out_calc = _string(".OCAL"),
+    out_execute_option = _enum(".OOPT", OOPT_MENU),
+    out_data_option = _enum(".DOPT", DOPT_MENU),
+    out_link = _string(".OUT"),
+    wait = _enum(".WAIT", WAIT_MENU),
+), doc = "userStringCalc record (det_pulse_to_ad).")
+
+
+class ArrayCalcGroup(PVGroup):
+    """userArrayCalc record; `push()` shifts a value in at index 0."""
+
+    val = _float("")
+    description = _string(".DESC")
+    number_used = _int(".NUSE", 1)
+    scan = _enum(".SCAN", SCAN_MENU)
+    in_link_a = _string(".INPA")
+    in_link_b = _string(".INPB")
+    in_link_c = _string(".INPC")
+    a_value = _float(".A")
+    b_value = _float(".B")
+    c_value = _float(".C")
+    in_link_aa = _string(".INAA")
+    in_link_bb = _string(".INBB")
+    in_link_dd = _string(".INDD")
+    bb_value = pvproperty(name = ".BB", value = [0.0] * ARRAY_LENGTH, dtype = float, max_length = ARRAY_LENGTH)
+    calc = _string(".CALC")
+    out_execute_delay = _float(".ODLY")
+    event_to_issue = _int(".OEVT")
+    out_execute_option = _enum(".OOPT", OOPT_MENU)
+    out_data_option = _enum(".DOPT", DOPT_MENU)
+    out_link = _string(".OUT")
+    wait = _enum(".WAIT", WAIT_MENU)
+
+    async def push(self, value):
+        nuse = max(1, min(int(self.number_used.value), ARRAY_LENGTH))
+        old = list(self.bb_value.value)[:nuse - 1]
+        await self.bb_value.write([float(value)] + old)
+        await self.val.write(float(value))
+
+
+class ScalerGroup(PVGroup):
+    """Scaler record fields written by `IC_scalers_config_entries()` and the channel names."""
+
+    count_mode = _enum(".CONT", ["OneShot", "AutoCount"])
+    normalized_counts = _enum("_calc_ctrl.VAL", ["Cts/sec", "Counts"])
+    enable_calcs = _enum("_calcEnable.VAL", ["DISABLE", "ENABLE"])
+    delay = _float(".DLY")
+    update_rate = _float(".RATE", 10.0)
+    count = _enum(".CNT", ["Done", "Count"])
+    locals().update({f"gate_{i:02d}" : _enum(f".G{i}", ["N", "Y"]) for i in range(1, 17)})
+    #channel names, read by ScalerCH when it is created
+    locals().update({f"name_{i:02d}" : _string(f".NM{i}") for i in range(1, 33)})
+
+
+#softGlue, DFF, struck and other single PVs (full names, stored only)
+FPGASignalsGroup = _make_group("FPGASignalsGroup", dict(
+    #softglue and det_ready
+    **{name.replace("-", "_").lower() : _string(f"1id:softGlue:{name}") for name in (
+        "UpCntr-4_CLOCK_Signal", "AND-1_IN1_Signal", "AND-1_IN2_Signal", "AND-2_IN2_Signal",
+        "FI1_Signal", "FI2_Signal", "FI3_Signal", "FI8_Signal", "FO17_Signal", "FO19_Signal",
+        "FI1_BI", "clear_DTHDetRedy_FPGA",
+        "DFF-2_CLOCK_Signal", "DFF-2_SET_Signal", "DFF-2_D_Signal", "DFF-2_CLEAR_Signal",
+    )},
+    #softglue2 and softglue3
+    **{f"sg2_{name.lower()}" : _string(f"1ide:sg2:{name}") for name in (
+        "FI25_Signal", "FI26_Signal", "FI1_Signal", "FI2_Signal", "FO11_Signal", "FO14_Signal",
+    )},
+    **{f"sg3_{name.lower()}" : _string(f"1id:softGlue3:{name}") for name in (
+        "FI5_Signal", "FI25_Signal", "FI17_Signal", "FI8_Signal",
+        "FO17_Signal", "FO18_Signal", "FO19_Signal", "FO20_Signal",
+    )},
+    #softglue4 (two IOCs) and its menu
+    pso_pulses = _string("1ide:sg4:AND-1_IN2_Signal", "0"),
+    clear_gate = _int("1ide:sg4:BUFFER-1_IN_Signal.PROC"),
+    in_22do = _string("1ide:sg4:In_22Do.OUT"),
+    in_21intedge = _string("1ide:sg4:In_21IntEdge"),
+    in_22intedge = _string("1ide:sg4:In_22IntEdge"),
+    in_17intedge = _string("1id:softGlue4:In_17IntEdge"),
+    in_18intedge = _string("1id:softGlue4:In_18IntEdge"),
+    advance_delay = _float("1id:softGlue4:DnCntr-4_PRESET}}"),  #"}" as in SoftGlue4, escaped for the macros
+    load_signal = _int("1id:softGlue4:DnCntr-4_LOAD_Signal.PROC"),
+    signal_selector = _int("1id:softGlue4:DivByN-1_N"),
+    reset_signal_selector = _int("1id:softGlue4:DivByN-1_RESET_Signal.PROC"),
+    enable_signal_selector = _string("1id:softGlue4:DivByN-1_ENABLE_Signal"),
+    clock_signal_selector = _string("1id:softGlue4:DivByN-1_CLOCK_Signal"),
+    clear_signal = _int("1id:softGlue4:DFF-1_CLEAR_Signal.PROC"),
+    menu_curr_name = _string("1ide:SG4Menu:currName"),
+    menu_status = _string("1ide:SG4Menu:status"),
+    menu_name1 = _string("1ide:SG4Menu:name1"),
+    menu_load_config1 = _int("1ide:SG4Menu:leadConfig1.PROC"),
+    #time_counter
+    det_pulse = _int("1id:9440:1:bi_0"),
+    readout_desc = _string("1id:9440:1:bi_1.DESC"),
+    readout_scan = _enum("1id:9440:1:bi_1.SCAN", SCAN_MENU),
+    #struck
+    channel_advance = _enum("1id:mcs:ChannelAdvance", ["Internal", "External"]),
+    erase_start = _enum("1id:mcs:EraseStart", ["Done", "Erase"]),
+), doc = "Single softGlue/struck PVs, by full PV name.")
+
+
+#---- motion ----
+
+class MotorGroup(PVGroup):
+    """EPICS motor record (`MPEMotor` fields); moves with a trapezoidal profile."""
+
+    user_setpoint = _float(".VAL", lower_ctrl_limit = -1e6, upper_ctrl_limit = 1e6, precision = 4)
+    user_readback = _float(".RBV", read_only = True, precision = 4)
+    done_move = _int(".DMOV", 1, read_only = True)
+    is_moving = _int(".MOVN", 0, read_only = True)
+    motor_stop = _int(".STOP")
+    velocity = _float(".VELO", 36.0, lower_ctrl_limit = 0.01, upper_ctrl_limit = 720.0)
+    acceleration = _float(".ACCL", 0.2)
+    step_size = _float(".MRES", 0.0001)
+    high_limit = _float(".HLM", 1e6)
+    low_limit = _float(".LLM", -1e6)
+    backlash = _float(".BDST")
+    offset = _float(".OFF")
+    offset_dir = _enum(".DIR", ["Pos", "Neg"])
+    freeze = _enum(".FOFF", ["Variable", "Frozen"])
+    set_use = _enum(".SET", ["Use", "Set"])
+    egu = _string(".EGU", "deg")
+    high_limit_switch = _int(".HLS", read_only = True)
+    low_limit_switch = _int(".LLS", read_only = True)
+    direction_of_travel = _int(".TDIR", read_only = True)
+    home_forward = _int(".HOMF")
+    home_reverse = _int(".HOMR")
+    description = _string(".DESC", "sim fly motor")
+    precision = _int(".PREC", 4)
+    speed_rps = _float(".S", 0.1)
+    backup_speed_rps = _float(".SBAK", 0.1)
+    max_speed_rps = _float(".SMAX", 2.0)
+    base_speed_rps = _float(".SBAS")
+    backup_acceleration = _float(".BACC", 0.2)
+    move_fraction = _float(".FRAC", 1.0)
+    home_speed_eps = _float(".HVEL", 1.0)
+    motor_res_spr = _float(".SREV", 200.0)
+    motor_res_epr = _float(".UREV", 360.0)
+    disable = _int("_able.VAL")
+    disable_readback = _int("_able.RBV", read_only = True)
+
+    #the motor record keeps VBAS/VMAX as VELO's control limits
+    @property
+    def vbas(self):
+        return self.velocity.lower_ctrl_limit
+
+    @property
+    def vmax(self):
+        return self.velocity.upper_ctrl_limit
+
+    def move_time(self, distance, speed):
+        """Seconds to move `distance` at `speed` (same model as `utils/fly_kinematics.py`)."""
+        distance = abs(distance)
+        accl = self.acceleration.value
+        ramp = (speed + self.vbas) / 2 * accl
+        if distance >= 2 * ramp:
+            return 2 * accl + (distance - 2 * ramp) / speed
+        accel = (speed - self.vbas) / accl
+        return 2 * (math.sqrt(self.vbas**2 + accel * distance) - self.vbas) / accel
+
+    async def move_to(self, target, speed = None, poll = 0.05):
+        """Move to `target`, updating RBV every `poll` seconds."""
+        speed = speed or self.velocity.value
+        start = self.user_readback.value
+        duration = self.move_time(target - start, speed)
+        await self.done_move.write(0)
+        await self.is_moving.write(1)
+        await self.direction_of_travel.write(int(target >= start))
+        t0 = time.monotonic()
+        while True:
+            fraction = min((time.monotonic() - t0) / duration, 1.0) if duration > 0 else 1.0
+            await self.user_readback.write(start + (target - start) * fraction)
+            if fraction >= 1.0 or self.motor_stop.value:
+                break
+            await asyncio.sleep(poll)
+        await self.motor_stop.write(0)
+        await self.is_moving.write(0)
+        await self.done_move.write(1)
+
+    @user_setpoint.putter
+    async def user_setpoint(self, instance, value):
+        asyncio.get_event_loop().create_task(self.move_to(value))
+        return value
+
+
+class PSOFlyGroup(PVGroup):
+    """PSOTaxiFlyDevice PVs; `taxi` and `fly` move the fly motor and fly
+    emits detector pulses through the parent IOC."""
+
+    #busy records
+    taxi = _enum("taxi", BUSY_MENU)
+    taxi_output_link = _string("taxi.OUT")
+    taxi_forward_link = _string("taxi.FLNK")
+    fly = _enum("fly", BUSY_MENU)
+    fly_output_link = _string("fly.OUT")
+    fly_forward_link = _string("fly.FLNK")
+    start_position = _float("startPos")
+    end_position = _float("endPos")
+    slew_speed = _float("slewSpeed", 1.0)
+    scan_delta = _float("scanDelta", 0.1)
+    delta_time = _float("deltaTime", read_only = True)
+    pulse_type = _string("pulseType", "Gate")
+    detector_setup_time = _float("detSetupTime")
+    scan_control = _string("scanControl", "Standard")
+
+    def _geometry(self):
+        start = self.start_position.value
+        end = self.end_position.value
+        direction = 1 if end >= start else -1
+        speed = self.slew_speed.value
+        motor = self.parent.roty
+        ramp = (speed + motor.vbas) / 2 * motor.acceleration.value
+        return start, end, direction, speed, ramp
+
+    async def _taxi(self):
+        start, end, direction, speed, ramp = self._geometry()
+        await self.parent.roty.move_to(start - direction * ramp, speed = self.parent.roty.vmax)
+        await self.taxi.write("Done")
+
+    async def _fly(self):
+        start, end, direction, speed, ramp = self._geometry()
+        motor = self.parent.roty
+        delta = abs(self.scan_delta.value) or 1.0
+        nframes = int(round(abs(end - start) / delta))
+        period = delta / speed if speed else 0.0
+        await self.delta_time.write(period)
+
+        #ramp up, one pulse per frame at constant speed, ramp down
+        await motor.move_to(start, speed = speed)
+        t0 = time.monotonic()
+        for frame in range(nframes):
+            await asyncio.sleep(max(t0 + (frame + 1) * period - time.monotonic(), 0))
+            await motor.user_readback.write(start + direction * (frame + 1) * delta)
+            await self.parent.detector_pulse(period)
+        await motor.move_to(end + direction * ramp, speed = speed)
+        await self.fly.write("Done")
+
+    @taxi.putter
+    async def taxi(self, instance, value):
+        if value in (1, "Busy"):
+            asyncio.get_event_loop().create_task(self._taxi())
+        return value
+
+    @fly.putter
+    async def fly(self, instance, value):
+        if value in (1, "Busy"):
+            asyncio.get_event_loop().create_task(self._fly())
+        return value
+
+
+#---- fake area detector ----
+
+class SimCamGroup(PVGroup):
+    """cam1: of the fake detector."""
+
+    port_name = _string("PortName_RBV", "SIM1", read_only = True)
+    acquire = _int("Acquire")
+    acquire_rbv = _int("Acquire_RBV", read_only = True)
+    acquire_time = _float("AcquireTime", 0.1, put = _mirror("acquire_time_rbv"))
+    acquire_time_rbv = _float("AcquireTime_RBV", 0.1, read_only = True)
+    acquire_period = _float("AcquirePeriod", 0.2, put = _mirror("acquire_period_rbv"))
+    acquire_period_rbv = _float("AcquirePeriod_RBV", 0.2, read_only = True)
+    num_images = _int("NumImages", 1, put = _mirror("num_images_rbv"))
+    num_images_rbv = _int("NumImages_RBV", 1, read_only = True)
+    num_exposures = _int("NumExposures", 1, put = _mirror("num_exposures_rbv"))
+    num_exposures_rbv = _int("NumExposures_RBV", 1, read_only = True)
+    image_mode = _enum("ImageMode", IMAGE_MODE_MENU, "Multiple", put = _mirror("image_mode_rbv"))
+    image_mode_rbv = _enum("ImageMode_RBV", IMAGE_MODE_MENU, "Multiple", read_only = True)
+    trigger_mode = _enum("TriggerMode", TRIGGER_MODE_MENU, put = _mirror("trigger_mode_rbv"))
+    trigger_mode_rbv = _enum("TriggerMode_RBV", TRIGGER_MODE_MENU, read_only = True)
+    array_counter = _int("ArrayCounter", put = _mirror("array_counter_rbv"))
+    array_counter_rbv = _int("ArrayCounter_RBV", read_only = True)
+    array_callbacks = _enum("ArrayCallbacks", ENABLE_MENU, "Enable", put = _mirror("array_callbacks_rbv"))
+    array_callbacks_rbv = _enum("ArrayCallbacks_RBV", ENABLE_MENU, "Enable", read_only = True)
+    bin_x = _int("BinX", 1, put = _mirror("bin_x_rbv"))
+    bin_x_rbv = _int("BinX_RBV", 1, read_only = True)
+    bin_y = _int("BinY", 1, put = _mirror("bin_y_rbv"))
+    bin_y_rbv = _int("BinY_RBV", 1, read_only = True)
+    frame_type = _enum("FrameType", FRAME_TYPE_MENU, put = _mirror("frame_type_rbv"))
+    frame_type_rbv = _enum("FrameType_RBV", FRAME_TYPE_MENU, read_only = True)
+    num_images_counter = _int("NumImagesCounter_RBV", read_only = True)
+    detector_state = _enum("DetectorState_RBV", ["Idle", "Acquire", "Readout"], read_only = True)
+    adcore_version = _string("ADCoreVersion_RBV", "3.10.0")
+    driver_version = _string("DriverVersion_RBV", "sim")
+    manufacturer = _string("Manufacturer_RBV", "caproto")
+    model = _string("Model_RBV", "fly scan sim")
+
+    @property
+    def acquiring(self):
+        return self.acquire.value in (1, "Acquire")
+
+    async def frame(self):
+        """Make one frame; stop after NumImages (except Continuous)."""
+        if not self.acquiring:
+            return
+        await self.array_counter.write(self.array_counter.value + 1)
+        await self.num_images_counter.write(self.num_images_counter.value + 1)
+        await self.parent.tiff1.save()
+        done = self.num_images_counter.value >= self.num_images.value
+        if done and self.image_mode.value != "Continuous":
+            await self.acquire.write(0)
+            await self.parent.tiff1.capture.write("Done")
+
+    async def _internal(self):
+        period = max(self.acquire_period.value, self.acquire_time.value, 0.001)
+        t0 = time.monotonic()
+        n = 0
+        while self.acquiring:
+            n += 1
+            await asyncio.sleep(max(t0 + n * period - time.monotonic(), 0))
+            await self.frame()
+
+    @acquire.putter
+    async def acquire(self, instance, value):
+        start = value in (1, "Acquire") and not self.acquiring
+        await self.acquire_rbv.write(value)
+        await self.detector_state.write("Acquire" if value else "Idle")
+        if start:
+            await self.num_images_counter.write(0)
+            if self.trigger_mode.value == "Internal":
+                asyncio.get_event_loop().create_task(self._internal())
+        return value
+
+
+class SimTIFFGroup(PVGroup):
+    """TIFF1: of the fake detector (counts files, writes nothing)."""
+
+    plugin_type = _string("PluginType_RBV", "NDFileTIFF", read_only = True)
+    port_name = _string("PortName_RBV", "FileTIFF1", read_only = True)
+    file_path_exists = _enum("FilePathExists_RBV", NO_YES_MENU, "Yes", read_only = True)
+    enable = _enum("EnableCallbacks", ENABLE_MENU, "Enable", put = _mirror("enable_rbv"))
+    enable_rbv = _enum("EnableCallbacks_RBV", ENABLE_MENU, "Enable", read_only = True)
+    blocking_callbacks = _enum("BlockingCallbacks", NO_YES_MENU, put = _mirror("blocking_callbacks_rbv"))
+    blocking_callbacks_rbv = _enum("BlockingCallbacks_RBV", NO_YES_MENU, read_only = True)
+    nd_array_port = _string("NDArrayPort", "SIM1", put = _mirror("nd_array_port_rbv"))
+    nd_array_port_rbv = _string("NDArrayPort_RBV", "SIM1", read_only = True)
+    file_path = _string("FilePath", "/tmp/", put = _mirror("file_path_rbv"))
+    file_path_rbv = _string("FilePath_RBV", "/tmp/", read_only = True)
+    file_name = _string("FileName", "sim", put = _mirror("file_name_rbv"))
+    file_name_rbv = _string("FileName_RBV", "sim", read_only = True)
+    file_number = _int("FileNumber", put = _mirror("file_number_rbv"))
+    file_number_rbv = _int("FileNumber_RBV", read_only = True)
+    file_template = _string("FileTemplate", "%s%s_%6.6d.tif", put = _mirror("file_template_rbv"))
+    file_template_rbv = _string("FileTemplate_RBV", "%s%s_%6.6d.tif", read_only = True)
+    file_write_mode = _enum("FileWriteMode", FILE_WRITE_MODE_MENU, put = _mirror("file_write_mode_rbv"))
+    file_write_mode_rbv = _enum("FileWriteMode_RBV", FILE_WRITE_MODE_MENU, read_only = True)
+    auto_save = _enum("AutoSave", NO_YES_MENU, put = _mirror("auto_save_rbv"))
+    auto_save_rbv = _enum("AutoSave_RBV", NO_YES_MENU, read_only = True)
+    auto_increment = _enum("AutoIncrement", NO_YES_MENU, "Yes", put = _mirror("auto_increment_rbv"))
+    auto_increment_rbv = _enum("AutoIncrement_RBV", NO_YES_MENU, "Yes", read_only = True)
+    capture = _enum("Capture", CAPTURE_MENU, put = _mirror("capture_rbv"))
+    capture_rbv = _enum("Capture_RBV", CAPTURE_MENU, read_only = True)
+    num_capture = _int("NumCapture", 1, put = _mirror("num_capture_rbv"))
+    num_capture_rbv = _int("NumCapture_RBV", 1, read_only = True)
+    create_directory = _int("CreateDirectory", put = _mirror("create_directory_rbv"))
+    create_directory_rbv = _int("CreateDirectory_RBV", read_only = True)
+    num_captured = _int("NumCaptured_RBV", read_only = True)
+    full_file_name = _string("FullFileName_RBV", read_only = True)
+
+    async def save(self):
+        if self.auto_save.value != "Yes" and self.capture.value != "Capture":
+            return
+        number = self.file_number.value
+        await self.full_file_name.write(f"{self.file_name.value}_{number:06d}.tif"[-40:])
+        await self.num_captured.write(self.num_captured.value + 1)
+        if self.auto_increment.value == "Yes":
+            await self.file_number.write(number + 1)
+
+
+def _plugin_group(class_name, plugin_type, port_name):
+    """Group of a plugin of the fake detector that only gets enabled/disabled."""
+    return _make_group(class_name, dict(
+        plugin_type = _string("PluginType_RBV", plugin_type, read_only = True),
+        port_name = _string("PortName_RBV", port_name, read_only = True),
+        enable = _enum("EnableCallbacks", ENABLE_MENU, put = _mirror("enable_rbv")),
+        enable_rbv = _enum("EnableCallbacks_RBV", ENABLE_MENU, read_only = True),
+        blocking_callbacks = _enum("BlockingCallbacks", NO_YES_MENU, put = _mirror("blocking_callbacks_rbv")),
+        blocking_callbacks_rbv = _enum("BlockingCallbacks_RBV", NO_YES_MENU, read_only = True),
+        nd_array_port = _string("NDArrayPort", "SIM1", put = _mirror("nd_array_port_rbv")),
+        nd_array_port_rbv = _string("NDArrayPort_RBV", "SIM1", read_only = True),
+    ), doc = f"{plugin_type} plugin of the fake detector (enable and port only).")
+
+
+class SimDetectorGroup(PVGroup):
+    """Fake area detector with a frame counter."""
+
+    cam = SubGroup(SimCamGroup, prefix = "cam1:")
+    tiff1 = SubGroup(SimTIFFGroup, prefix = "TIFF1:")
+    #plugins every `make_det_class()` detector has
+    image1 = SubGroup(_plugin_group("SimImageGroup", "NDPluginStdArrays", "IMAGE1"), prefix = "image1:")
+    proc1 = SubGroup(_plugin_group("SimProcessGroup", "NDPluginProcess", "PROC1"), prefix = "Proc1:")
+    trans1 = SubGroup(_plugin_group("SimTransformGroup", "NDPluginTransform", "TRANS1"), prefix = "Trans1:")
+    over1 = SubGroup(_plugin_group("SimOverlayGroup", "NDPluginOverlay", "OVER1"), prefix = "Over1:")
+    roi1 = SubGroup(_plugin_group("SimROIGroup", "NDPluginROI", "ROI1"), prefix = "ROI1:")
+
+    async def external_trigger(self):
+        if self.cam.trigger_mode.value == "External":
+            await self.cam.frame()
+
+
+#---- the whole fly scan ----
+
+class FlyScanIOC(PVGroup):
+    """Fly scan hardware of 1-ID, wired for `fastsweep`."""
+
+    psofly1 = SubGroup(PSOFlyGroup, prefix = "1ide:PSOFly1:")
+    roty = SubGroup(MotorGroup, prefix = "1ide:m9")
+    fake_gate = SubGroup(CalcoutGroup, prefix = "1ide:userCalcOut4")
+    scaler_trigger = SubGroup(CalcoutGroup, prefix = "1ide:userCalcOut2")
+    det_status_monitor = SubGroup(CalcoutGroup, prefix = "1ide1:userCalc5")
+    frame_counter = SubGroup(TransformGroup, prefix = "1id:userTran10")
+    hem_info = SubGroup(TransformGroup, prefix = "1id:userTran3")
+    det_pulse_to_ad = SubGroup(StringCalcGroup, prefix = "1id:userStringCalc4")
+    sample_monitor_array = SubGroup(ArrayCalcGroup, prefix = "1ide:userArrayCalc1")
+    sample_transmission_array = SubGroup(ArrayCalcGroup, prefix = "1ide:userArrayCalc2")
+    energy_monitor_array = SubGroup(ArrayCalcGroup, prefix = "1ide:userArrayCalc3")
+    intensity_transmission_array = SubGroup(ArrayCalcGroup, prefix = "1ide:userArrayCalc4")
+    timestamp_array = SubGroup(ArrayCalcGroup, prefix = "1ide:userArrayCalc5")
+    integrated_time_array = SubGroup(ArrayCalcGroup, prefix = "1ide:userArrayCalc6")
+    scaler2 = SubGroup(ScalerGroup, prefix = "1ide:S2:scaler2")
+    fpga = SubGroup(FPGASignalsGroup, prefix = "")
+    det = SubGroup(SimDetectorGroup, prefix = "{det_prefix}")
+
+    async def detector_pulse(self, period):
+        """One PSO pulse: count the frame down, fill the arrays, trigger the det."""
+        if self.fpga.pso_pulses.value != "1":
+            return
+        counter = self.frame_counter.b_value
+        if counter.value <= 0:
+            return  #all frames done, det pulses are gated off
+        await counter.write(counter.value - 1)
+
+        rate = 1e5 * period     #IC counts per frame
+        for array in (
+            self.sample_monitor_array,
+            self.sample_transmission_array,
+            self.energy_monitor_array,
+            self.intensity_transmission_array,
+        ):
+            await array.push(random.gauss(rate, math.sqrt(rate) + 1))
+        await self.integrated_time_array.push(round(8e6 * period))     #8 MHz ticks
+        await self.timestamp_array.push(time.time())
+        await self.det.external_trigger()
+
+
+def main(argv = None):
+    """Run the fly scan IOC (`python -m instrument.sim`), on localhost unless `--interfaces` is given."""
+    parser, split_args = template_arg_parser(
+        default_prefix = "",
+        desc = "Fly scan hardware simulator for the 1-ID instrument package. "
+            f"Serves the production PV names, so it listens on {' '.join(LOCAL_INTERFACES)} "
+            "only unless --interfaces is given.",
+        argv = argv,
+        macros = {"det_prefix" : "1idSIM:"},
+    )
+    parser.set_defaults(interfaces = list(LOCAL_INTERFACES))
+    for action in parser._actions:
+        if action.dest == "interfaces":
+            action.help = f"Interfaces to listen on. Default is {' '.join(LOCAL_INTERFACES)}; other interfaces serve the production PV names on the network."
+    ioc_options, run_options = split_args(parser.parse_args(argv))
+    ioc = FlyScanIOC(**ioc_options)
+    run(ioc.pvdb, **run_options)
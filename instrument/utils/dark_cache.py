@@ -0,0 +1,338 @@
+"""
+Cache of averaged dark frames on local disk.
+
+A dark series only has to be collected again when something that changes
+the dark changes: the detector, its exposure time, gain, binning or data
+type, or (slowly) its temperature. The cache key is the detector name plus
+those acquisition parameters (`dark_parameters()`). Each entry holds the
+average of one dark series as a `.npy` file, loaded memory-mapped, and an
+index record (date, number of darks, detector temperature, source file).
+
+Entries older than `max_age` seconds, or taken at a detector temperature
+more than `max_temperature_drift` away from the current one, are evicted
+on lookup. On a hit, `enfly` skips the dark series and writes the cached
+file into the run metadata (`dark_file`).
+
+The cache is kept in `~/.config/Bluesky_dark_cache/` by default; set
+`DARK_CACHE_DIR` in `iconfig.yml` to change it.
+
+USAGE::
+
+    record = dark_cache.lookup(varex20idff, exposure_time = 0.1)  #None on miss
+    dark = dark_cache.load(record)      #memory-mapped numpy array
+    dark_cache.show()
+    dark_cache.evict()                  #drop stale entries now
+    dark_cache.forget(varex20idff)
+"""
+
+__all__ = [
+    "DARK_PARAMETER_ATTRS",
+    "DarkCache",
+    "dark_cache",
+    "dark_parameters",
+]
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+logger.info(__file__)
+
+
+from .. import iconfig
+import datetime
+import hashlib
+import json
+import numpy as np
+import pathlib
+import pyRestTable
+import threading
+import time
+
+
+#cam signals that change the dark, besides the exposure time (used if the cam has them)
+DARK_PARAMETER_ATTRS = ("gain", "bin_x", "bin_y", "data_type")
+
+#cam signal with the detector temperature (used if the cam has it)
+TEMPERATURE_ATTR = "temperature_actual"
+
+
+def _get_cache_dir():
+    path = iconfig.get("DARK_CACHE_DIR")
+    if path is None:
+        path = pathlib.Path.home() / ".config" / "Bluesky_dark_cache"
+    return pathlib.Path(path)
+
+
+def _get(cam, attr):
+    """Value of `cam.attr`, as a string for enums, or None if absent."""
+    signal = getattr(cam, attr, None)
+    if signal is None:
+        return None
+    try:
+        return signal.get(as_string = True) if getattr(signal, "enum_strs", None) else signal.get()
+    except Exception as excuse:
+        logger.debug(f"Could not read {signal.name}: {excuse}")
+        return None
+
+
+def dark_parameters(det, exposure_time):
+    """
+    Acquisition parameters of `det` that a dark frame depends on.
+
+    PARAMETERS
+
+    det *area detector object* :
+        Detector the darks are (or were) collected with.
+
+    exposure_time *float* :
+        Exposure time per frame in seconds.
+    """
+    params = dict(exposure_time = round(float(exposure_time), 6))
+    for attr in DARK_PARAMETER_ATTRS:
+        value = _get(det.cam, attr)
+        if value is not None:
+            params[attr] = value
+    return params
+
+
+def _temperature(det):
+    value = _get(det.cam, TEMPERATURE_ATTR)
+    return float(value) if value is not None else None
+
+
+class DarkCache(object):
+    """
+    Averaged dark frames per (detector, acquisition parameters), kept as
+    `.npy` files with a JSON index in `directory`.
+
+    PARAMETERS
+
+    directory *str or pathlib.Path* :
+        Where the frames and `index.json` are kept (created on first write).
+
+    max_age *float* :
+        Seconds after which an entry is stale. (default : 3600)
+
+    max_temperature_drift *float* :
+        Largest detector temperature change (in the units of the cam's
+        temperature PV) an entry stays valid for. (default : 1.0)
+    """
+
+    def __init__(self, directory, max_age = 3600, max_temperature_drift = 1.0):
+        self.directory = pathlib.Path(directory)
+        self.max_age = max_age
+        self.max_temperature_drift = max_temperature_drift
+        self._lock = threading.Lock()
+        self._records = None
+
+    @property
+    def index_path(self):
+        return self.directory / "index.json"
+
+    def _load(self):
+        if self._records is None:
+            try:
+                self._records = json.loads(self.index_path.read_text())
+            except FileNotFoundError:
+                self._records = {}
+            except ValueError:
+                logger.warning(f"Could not parse {self.index_path}, starting with an empty dark cache.")
+                self._records = {}
+        return self._records
+
+    def _save(self):
+        self.directory.mkdir(parents = True, exist_ok = True)
+        tmp = self.index_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self._records, indent = 2, sort_keys = True, default = str))
+        tmp.replace(self.index_path)  #atomic, so a crash never leaves half a file
+
+    @staticmethod
+    def key(det_name, params):
+        """Cache key of a detector and its `dark_parameters()`."""
+        digest = hashlib.sha1(json.dumps(params, sort_keys = True, default = str).encode()).hexdigest()
+        return f"{det_name}_{digest[:12]}"
+
+    def _stale(self, record, temperature = None):
+        """Reason why `record` is no longer valid, or None."""
+        age = time.time() - record["time"]
+        if age > self.max_age:
+            return f"{age/60:.0f} min old"
+        if temperature is not None and record.get("temperature") is not None:
+            drift = abs(temperature - record["temperature"])
+            if drift > self.max_temperature_drift:
+                return f"temperature drifted by {drift:.2f}"
+        return None
+
+    def _remove(self, key):
+        """Drop `key` from the index and delete its frame (lock held)."""
+        record = self._load().pop(key, None)
+        if record is not None:
+            try:
+                pathlib.Path(record["file"]).unlink()
+            except FileNotFoundError:
+                pass
+
+    def lookup(self, det, exposure_time):
+        """
+        Cached dark record (dict, with "key" and "file") for the current
+        settings of `det`, or None. Stale entries are evicted.
+
+        PARAMETERS
+
+        det *area detector object* :
+            Detector to collect darks with.
+
+        exposure_time *float* :
+            Exposure time per frame in seconds.
+        """
+        key = self.key(det.name, dark_parameters(det, exposure_time))
+        with self._lock:
+            record = self._load().get(key)
+            if record is None:
+                return None
+            reason = self._stale(record, _temperature(det))
+            if reason is None and not pathlib.Path(record["file"]).exists():
+                reason = "file is missing"
+            if reason is not None:
+                logger.info(f"Evicting cached darks {key}: {reason}.")
+                self._remove(key)
+                self._save()
+                return None
+            return dict(record, key = key)
+
+    def store(self, det, exposure_time, frames, source = None):
+        """
+        Average `frames` and cache the result for the current settings of
+        `det`. Returns the new record.
+
+        PARAMETERS
+
+        det *area detector object* :
+            Detector the darks were collected with.
+
+        exposure_time *float* :
+            Exposure time per frame in seconds.
+
+        frames *array-like* :
+            One frame (2D) or a dark series (3D, frames first).
+
+        source *str or None* :
+            Where the darks came from, e.g. the HDF5 file. (default : None)
+        """
+        frames = np.asarray(frames)
+        ndarks = frames.shape[0] if frames.ndim == 3 else 1
+        dark = frames.mean(axis = 0, dtype = np.float64) if frames.ndim == 3 else frames
+        params = dark_parameters(det, exposure_time)
+        key = self.key(det.name, params)
+
+        self.directory.mkdir(parents = True, exist_ok = True)
+        path = self.directory / f"{key}.npy"
+        tmp = self.directory / f"{key}.tmp.npy"
+        np.save(tmp, dark.astype(np.float32))
+        tmp.replace(path)
+
+        record = dict(
+            det = det.name,
+            params = params,
+            file = str(path),
+            ndarks = ndarks,
+            shape = list(dark.shape),
+            temperature = _temperature(det),
+            source = source,
+            time = time.time(),
+            date = datetime.datetime.now().isoformat(timespec = "seconds"),
+        )
+        with self._lock:
+            self._load()[key] = record
+            self._save()
+        logger.info(f"Cached {ndarks} darks of {det.name} as {path}.")
+        return dict(record, key = key)
+
+    def store_from_file(self, det, exposure_time, path, dataset = "/exchange/dark"):
+        """
+        Cache the darks written by `det` to the HDF5 file `path` (as seen
+        from this computer). Needs `h5py`.
+
+        PARAMETERS
+
+        det *area detector object* :
+            Detector the darks were collected with.
+
+        exposure_time *float* :
+            Exposure time per frame in seconds.
+
+        path *str* :
+            HDF5 file holding the dark series.
+
+        dataset *str* :
+            Dataset of the dark series. (default : "/exchange/dark")
+        """
+        import h5py     #only needed to fill the cache
+
+        with h5py.File(path, "r") as f:
+            frames = f[dataset][()]
+        return self.store(det, exposure_time, frames, source = str(path))
+
+    def store_from_plugin(self, det, exposure_time, plugin = None, dataset = "/exchange/dark"):
+        """
+        Cache the darks of the last file written by `plugin` (default:
+        `det.hdf1`). The IOC's file name is mapped from the plugin's
+        `write_path_template` to its `read_path_template`.
+        """
+        plugin = plugin if plugin is not None else det.hdf1
+        full_file_name = plugin.full_file_name.get()
+        write_root = str(plugin.write_path_template)
+        if full_file_name.startswith(write_root):
+            relative = full_file_name[len(write_root):].replace("\\", "/").lstrip("/")
+            path = pathlib.Path(plugin.read_path_template) / relative
+        else:
+            path = pathlib.Path(full_file_name)
+        return self.store_from_file(det, exposure_time, path, dataset = dataset)
+
+    def load(self, record):
+        """Averaged dark frame of `record`, memory-mapped (read-only)."""
+        return np.load(record["file"], mmap_mode = "r")
+
+    def evict(self, max_age = None):
+        """
+        Remove entries older than `max_age` seconds (default: the cache's
+        `max_age`). Returns the removed keys.
+        """
+        max_age = self.max_age if max_age is None else max_age
+        with self._lock:
+            records = self._load()
+            stale = [key for key, record in records.items() if time.time() - record["time"] > max_age]
+            for key in stale:
+                self._remove(key)
+            if stale:
+                self._save()
+        return stale
+
+    def forget(self, det = None):
+        """Remove the entries of `det`, or all entries."""
+        with self._lock:
+            records = self._load()
+            for key in [key for key, record in records.items() if det is None or record["det"] == det.name]:
+                self._remove(key)
+            self._save()
+
+    def show(self):
+        """Print the cached darks as a table."""
+        table = pyRestTable.Table()
+        table.labels = ["detector", "parameters", "ndarks", "temperature", "age (min)", "file"]
+        with self._lock:
+            records = dict(self._load())
+        for key, record in sorted(records.items()):
+            table.addRow([
+                record["det"],
+                ", ".join(f"{k}={v}" for k, v in sorted(record["params"].items())),
+                record["ndarks"],
+                record["temperature"],
+                f"{(time.time() - record['time'])/60:.0f}",
+                pathlib.Path(record["file"]).name,
+            ])
+        print(table)
+
+
+dark_cache = DarkCache(_get_cache_dir())
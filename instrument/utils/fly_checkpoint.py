@@ -0,0 +1,299 @@
+"""
+Checkpoints of fly scans, so an interrupted sweep can be resumed.
+
+While a sweep flies, `FrameCheckpointer` follows the `frame_counter`
+readback (frames triggered) and each detector's `tiff1.file_number`
+(frames written) and regularly writes the number of frames safely
+collected to a local JSON file. If the sweep is interrupted (beam dump,
+IOC hiccup, RE abort), `fastsweep(..., resume = True)` reads the
+checkpoint back and flies only the remaining angular range, continuing
+the file numbering. Every partial run carries the checkpoint key, and
+later runs list the uids of the earlier ones (`resumed_from`).
+
+The checkpoint file is `~/.config/Bluesky_fly_checkpoints.json` by
+default; set `FLY_CHECKPOINT_FILE` in `iconfig.yml` to change it.
+
+USAGE::
+
+    fly_checkpoints.show()
+    fly_checkpoints.forget()
+"""
+
+__all__ = [
+    "FlyCheckpoints",
+    "fly_checkpoints",
+    "FrameCheckpointer",
+]
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+logger.info(__file__)
+
+
+from .. import iconfig
+from contextlib import contextmanager
+import datetime
+import json
+import pathlib
+import pyRestTable
+import threading
+import time
+
+
+def _get_checkpoint_path():
+    path = iconfig.get("FLY_CHECKPOINT_FILE")
+    if path is None:
+        path = pathlib.Path.home() / ".config" / "Bluesky_fly_checkpoints.json"
+    return pathlib.Path(path)
+
+
+class FlyCheckpoints(object):
+    """
+    Progress of fly scans, one record per (scan_folder, file_name), kept in
+    a JSON file.
+
+    PARAMETERS
+
+    path *str or pathlib.Path* :
+        JSON file holding the checkpoints (created on first write).
+    """
+
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._scratch = threading.local()
+        self._state = dict(path = pathlib.Path(path), records = None)
+
+    def _current(self):
+        #state of this thread: its scratch copy, if any, else the real file
+        return getattr(self._scratch, "state", None) or self._state
+
+    @property
+    def path(self):
+        return self._current()["path"]
+
+    @path.setter
+    def path(self, path):
+        self._current()["path"] = pathlib.Path(path)
+
+    @property
+    def _records(self):
+        return self._current()["records"]
+
+    @_records.setter
+    def _records(self, records):
+        self._current()["records"] = records
+
+    def _load(self):
+        if self._records is None:
+            try:
+                self._records = json.loads(self.path.read_text())
+            except FileNotFoundError:
+                self._records = {}
+            except ValueError:
+                logger.warning(f"Could not parse {self.path}, starting without fly checkpoints.")
+                self._records = {}
+        return self._records
+
+    def _save(self):
+        self.path.parent.mkdir(parents = True, exist_ok = True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self._records, indent = 2, sort_keys = True, default = str))
+        tmp.replace(self.path)  #atomic, so a crash never leaves half a file
+
+    @contextmanager
+    def scratch(self, path):
+        """
+        Context manager keeping the checkpoints of this thread in `path`
+        instead (e.g., for dry runs, see `utils/plan_simulator.py`); the
+        real file is untouched, and still used by other threads.
+        """
+        previous = getattr(self._scratch, "state", None)
+        self._scratch.state = dict(path = pathlib.Path(path), records = None)
+        try:
+            yield self
+        finally:
+            self._scratch.state = previous
+
+    @staticmethod
+    def key(scan_folder, file_name):
+        """Checkpoint key of a scan: "scan_folder/file_name"."""
+        return f"{scan_folder.rstrip('/')}/{file_name}"
+
+    def get(self, key):
+        """Checkpoint record (dict) of `key`, or None."""
+        with self._lock:
+            record = self._load().get(key)
+            return dict(record) if record is not None else None
+
+    def begin(self, key, scan, first_file_number, uid, frame_offset = 0):
+        """
+        Start (or continue, if `frame_offset` > 0) the checkpoint of a
+        sweep. Returns the record.
+
+        PARAMETERS
+
+        key *str* :
+            From `key()`.
+
+        scan *dict* :
+            Arguments describing the whole sweep (start_pos, end_pos,
+            nframes, ...), used to check a later resume.
+
+        first_file_number *dict* :
+            Detector name -> first tiff file number of the whole sweep.
+
+        uid *str* :
+            uid of the run being started.
+
+        frame_offset *int* :
+            Frames already collected by earlier runs. (default : 0)
+        """
+        with self._lock:
+            records = self._load()
+            record = records.get(key) if frame_offset else None
+            if record is None:
+                record = dict(scan = scan, first_file_number = first_file_number, uids = [])
+            record.update(
+                frames_done = frame_offset,
+                status = "running",
+                date = datetime.datetime.now().isoformat(timespec = "seconds"),
+            )
+            record["uids"] = record["uids"] + [uid]
+            records[key] = record
+            self._save()
+        return dict(record)
+
+    def update(self, key, frames_done = None, status = None):
+        """Write progress (`frames_done`) and/or `status` of `key`."""
+        with self._lock:
+            record = self._load().get(key)
+            if record is None:
+                return
+            if frames_done is not None:
+                record["frames_done"] = int(frames_done)
+            if status is not None:
+                record["status"] = status
+            record["date"] = datetime.datetime.now().isoformat(timespec = "seconds")
+            self._save()
+
+    def forget(self, key = None):
+        """Remove the checkpoint of `key`, or all checkpoints."""
+        with self._lock:
+            records = self._load()
+            if key is None:
+                records.clear()
+            else:
+                records.pop(key, None)
+            self._save()
+
+    def show(self):
+        """Print the checkpoints as a table."""
+        table = pyRestTable.Table()
+        table.labels = ["scan", "status", "frames done", "nframes", "runs", "date"]
+        with self._lock:
+            records = dict(self._load())
+        for key, record in sorted(records.items()):
+            table.addRow([
+                key, record["status"], record["frames_done"],
+                record["scan"].get("nframes"), len(record["uids"]), record["date"],
+            ])
+        print(table)
+
+
+fly_checkpoints = FlyCheckpoints(_get_checkpoint_path())
+
+
+class FrameCheckpointer(object):
+    """
+    Context manager that checkpoints a flying sweep.
+
+    Subscribes to the frame counter readback and the tiff file numbers and
+    writes the frames safely collected (triggered *and* written) at most
+    every `interval` seconds. On exit the final count is written; if the
+    block raised (including RE stop/abort), the status becomes
+    "interrupted".
+
+    PARAMETERS
+
+    key *str* :
+        Checkpoint key (see `FlyCheckpoints.key()`).
+
+    counter *ophyd signal* :
+        Frame counter readback, armed to nframes + 1 and counting down
+        (`frame_counter.b_value`).
+
+    nframes *int* :
+        Frames requested in this run.
+
+    dets *list of area detector objects* :
+        Detectors writing tiff files.
+
+    frame_offset *int* :
+        Frames collected by earlier runs of the same sweep. (default : 0)
+
+    interval *float* :
+        Minimum seconds between writes of the checkpoint file. (default : 1.0)
+
+    store *FlyCheckpoints or None* :
+        Where to write. If None, `fly_checkpoints`. (default : None)
+    """
+
+    def __init__(self, key, counter, nframes, dets, frame_offset = 0, interval = 1.0, store = None):
+        self.key = key
+        self.counter = counter
+        self.nframes = nframes
+        self.dets = list(dets)
+        self.frame_offset = frame_offset
+        self.interval = interval
+        self.store = store if store is not None else fly_checkpoints
+        self._first = {}
+        self._latest = {}
+        self._tokens = []
+        self._t_saved = 0
+
+    def frames_done(self):
+        """Frames of this run both triggered and written by every det."""
+        triggered = self.nframes + 1 - self._latest.get("counter", self.nframes + 1)
+        written = [self._latest[det.name] - self._first[det.name] for det in self.dets]
+        done = min([triggered] + written)
+        return max(0, min(done, self.nframes))
+
+    def _on_value(self, name, value):
+        #runs in the CA callback thread; only cached values are used here
+        self._latest[name] = value
+        if time.time() - self._t_saved >= self.interval:
+            self._t_saved = time.time()
+            self.store.update(self.key, frames_done = self.frame_offset + self.frames_done())
+
+    def __enter__(self):
+        self._latest["counter"] = self.counter.get()
+        for det in self.dets:
+            self._first[det.name] = self._latest[det.name] = det.tiff1.file_number.get()
+
+        self._tokens = [(self.counter, self.counter.subscribe(
+            lambda value = None, **kwargs: self._on_value("counter", value), run = False
+        ))]
+        for det in self.dets:
+            signal = det.tiff1.file_number
+            self._tokens.append((signal, signal.subscribe(
+                lambda value = None, det_name = det.name, **kwargs: self._on_value(det_name, value), run = False
+            )))
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        for signal, token in self._tokens:
+            signal.unsubscribe(token)
+        self._tokens = []
+
+        #final, exact count
+        self._latest["counter"] = self.counter.get()
+        for det in self.dets:
+            self._latest[det.name] = det.tiff1.file_number.get()
+        frames_done = self.frame_offset + self.frames_done()
+        status = "interrupted" if exc_type is not None else None
+        self.store.update(self.key, frames_done = frames_done, status = status)
+        if exc_type is not None:
+            logger.warning(f"{self.key} interrupted after {frames_done} frames; resume with `resume = True`.")
+        return False
@@ -0,0 +1,266 @@
+"""
+Fly-motion kinematics: scan speed, ramp distance, taxi/fly times and
+timeouts for fly scans with an EPICS motor record (e.g., `MPEMotor`).
+
+Per the EPICS motor record, the motor starts at the base speed (VBAS),
+speeds up linearly to the full speed (VELO) in ACCL seconds, and slows
+down the same way. Motor parameters are read once per session and cached
+(see `motor_parameters()`); everything else is vectorized, so a whole
+multi-sweep plan is checked in one call.
+
+USAGE::
+
+    kin = sweep_kinematics(
+        motor = sms_aero.roty,
+        start_pos = [0, 90, 180],
+        end_pos = [90, 180, 270],
+        nframes = 900,
+        frame_time = 0.13,
+    )
+    kin["fly_timeout"]      #one timeout per sweep, in seconds
+"""
+
+__all__ = [
+    "MotorParameters",
+    "motor_parameters",
+    "clear_motor_cache",
+    "move_time",
+    "sweep_kinematics",
+]
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+logger.info(__file__)
+
+
+from collections import namedtuple
+import numpy as np
+
+
+MotorParameters = namedtuple("MotorParameters", "name vmax vbas accl mres hlm llm")
+MotorParameters.__doc__ = """Motor record fields used for fly-motion planning.
+
+vmax, vbas : maximum and base speed (.VMAX, .VBAS) in EGU/sec
+accl : time to accelerate from VBAS to full speed (.ACCL) in sec
+mres : motor step size (.MRES) in EGU/step
+hlm, llm : high and low soft limits (.HLM, .LLM) in EGU
+"""
+
+#motor name -> MotorParameters, for this session
+_motor_cache = {}
+
+
+def motor_parameters(motor, refresh = False):
+    """
+    Return the `MotorParameters` of `motor`, read once per session.
+
+    PARAMETERS
+
+    motor *ophyd EpicsMotor* :
+        Fly motor (e.g., sms_aero.roty).
+
+    refresh *bool* :
+        If True, read the fields again (e.g., after changing limits).
+        (default : False)
+    """
+
+    if refresh or motor.name not in _motor_cache:
+        params = MotorParameters(
+            name = motor.name,
+            vmax = motor.velocity.metadata["upper_ctrl_limit"],  #.VMAX
+            vbas = motor.velocity.metadata["lower_ctrl_limit"],  #.VBAS
+            accl = motor.acceleration.get(),    #.ACCL
+            mres = motor.motor_step_size.get(),     #.MRES
+            hlm = motor.high_limit_travel.get(),    #.HLM
+            llm = motor.low_limit_travel.get(),     #.LLM
+        )
+        if params.accl == 0:
+            raise ValueError(f"ACCL is not set for {motor.name}.")
+        if params.vmax == 0:
+            raise ValueError(f"VMAX is not set for {motor.name}.")
+        _motor_cache[motor.name] = params
+        logger.info(f"Cached motor parameters: {params}")
+
+    return _motor_cache[motor.name]
+
+
+def clear_motor_cache(motor = None):
+    """Forget cached motor parameters (of `motor`, or of all motors if None)."""
+    if motor is None:
+        _motor_cache.clear()
+    else:
+        _motor_cache.pop(motor.name, None)
+
+
+def move_time(params, distance, speed):
+    """
+    Time (sec) to move `distance` with a trapezoidal profile at `speed`,
+    starting and ending at VBAS. Short moves that never reach `speed`
+    use a triangular profile. Vectorized over `distance` and `speed`.
+
+    PARAMETERS
+
+    params *MotorParameters* :
+        From `motor_parameters()`.
+
+    distance *float or array* :
+        Move distance(s) in EGU.
+
+    speed *float or array* :
+        Full speed(s) in EGU/sec.
+    """
+
+    distance = np.abs(np.asarray(distance, dtype = float))
+    speed = np.asarray(speed, dtype = float)
+    vbas = params.vbas
+
+    #distance covered while speeding up and slowing down
+    ramp_distance = (speed + vbas) / 2 * params.accl
+    cruise = distance - 2 * ramp_distance
+    trapezoid = 2 * params.accl + np.clip(cruise, 0, None) / speed
+
+    #triangular: solve d/2 = vbas*t + a*t**2/2 for the time to the peak
+    with np.errstate(divide = "ignore", invalid = "ignore"):
+        accel = (speed - vbas) / params.accl
+        t_peak = (np.sqrt(vbas**2 + accel * distance) - vbas) / accel
+        triangle = np.where(accel > 0, 2 * t_peak, distance / speed)
+
+    return np.where(cruise >= 0, trapezoid, triangle)
+
+
+def sweep_kinematics(
+    motor,
+    start_pos,
+    end_pos,
+    nframes,
+    frame_time,
+    taxi_from = None,
+    taxi_speed = None,
+    timeout_factor = 1.5,
+    timeout_margin = 5.0,
+    check = True,
+):
+    """
+    Plan the motion of one or more sweeps.
+
+    Returns a dictionary of arrays (one value per sweep): start_pos,
+    end_pos, scan_delta, scan_speed, scan_time, ramp_time, ramp_distance,
+    taxi_distance, taxi_time, fly_time, taxi_timeout and fly_timeout.
+    Timeouts are `timeout_factor` times the predicted time plus
+    `timeout_margin` seconds.
+
+    The first taxi starts at `taxi_from`; later taxis start where the
+    previous sweep stopped (its end plus the ramp-down distance).
+
+    PARAMETERS
+
+    motor *ophyd EpicsMotor* :
+        Fly motor (e.g., sms_aero.roty).
+
+    start_pos, end_pos *float or array* :
+        Start and end position of each sweep in EGU.
+
+    nframes *int or array* :
+        Number of frames per sweep.
+
+    frame_time *float or array* :
+        Time per frame in seconds (exposure time + extra time + det gap).
+
+    taxi_from *float or None* :
+        Position the first taxi starts from. If None, the current
+        position of `motor`. (default : None)
+
+    taxi_speed *float, array or None* :
+        Speed of each taxi. If None, the first taxi runs at the motor's
+        current speed (.VELO) and later taxis at the scan speed of the
+        sweep before, since the motor stays staged at the scan speed
+        between sweeps (see `fastsweep_series`). (default : None)
+
+    timeout_factor *float* :
+        Safety factor applied to predicted times. (default : 1.5)
+
+    timeout_margin *float* :
+        Seconds added to the timeouts. (default : 5.0)
+
+    check *bool* :
+        If True, raise ValueError if any sweep is outside the motor's
+        position or speed limits. (default : True)
+    """
+
+    params = motor_parameters(motor)
+
+    start_pos, end_pos, nframes, frame_time = np.broadcast_arrays(
+        np.atleast_1d(np.asarray(start_pos, dtype = float)),
+        np.atleast_1d(np.asarray(end_pos, dtype = float)),
+        np.atleast_1d(np.asarray(nframes, dtype = float)),
+        np.atleast_1d(np.asarray(frame_time, dtype = float)),
+    )
+
+    sweep_range = np.abs(end_pos - start_pos)
+    direction = np.sign(end_pos - start_pos)
+    scan_time = frame_time * nframes
+    scan_speed = sweep_range / scan_time
+    scan_delta = sweep_range / nframes
+
+    #ramp from VBAS to scan speed (and back) at each end
+    ramp_time = np.full_like(scan_speed, params.accl)
+    ramp_distance = (scan_speed + params.vbas) / 2 * params.accl
+
+    #taxi to the backoff position of each sweep
+    if taxi_from is None:
+        taxi_from = motor.position
+    backoff = start_pos - direction * ramp_distance
+    stopped = end_pos + direction * ramp_distance
+    taxi_start = np.concatenate(([taxi_from], stopped[:-1]))
+    taxi_distance = np.abs(backoff - taxi_start)
+    if taxi_speed is None:
+        velocity = motor.velocity.get()     #.VELO
+        taxi_speed = np.concatenate(([velocity if velocity > 0 else params.vmax], scan_speed[:-1]))
+    taxi_time = move_time(params, taxi_distance, taxi_speed)
+
+    fly_time = 2 * ramp_time + scan_time
+
+    kin = dict(
+        start_pos = start_pos,
+        end_pos = end_pos,
+        scan_delta = scan_delta,
+        scan_speed = scan_speed,
+        scan_time = scan_time,
+        ramp_time = ramp_time,
+        ramp_distance = ramp_distance,
+        taxi_distance = taxi_distance,
+        taxi_time = taxi_time,
+        fly_time = fly_time,
+        taxi_timeout = taxi_time * timeout_factor + timeout_margin,
+        fly_timeout = fly_time * timeout_factor + timeout_margin,
+    )
+
+    #check limits for all sweeps at once
+    out_of_range = (
+        (start_pos > params.hlm) | (start_pos < params.llm)
+        | (end_pos > params.hlm) | (end_pos < params.llm)
+    )
+    too_fast = scan_speed > params.vmax
+    too_slow = scan_speed < params.vbas
+    ramp_out = (
+        (np.maximum(backoff, stopped) > params.hlm)
+        | (np.minimum(backoff, stopped) < params.llm)
+    )
+    if ramp_out.any():
+        logger.warning(f"Ramps of sweeps {np.flatnonzero(ramp_out).tolist()} pass the soft limits of {motor.name}.")
+
+    if check:
+        problems = []
+        for label, mask in (
+            (f"positions out of range [{params.llm}, {params.hlm}]", out_of_range),
+            (f"scan speed above VMAX ({params.vmax})", too_fast),
+            (f"scan speed below VBAS ({params.vbas})", too_slow),
+        ):
+            if mask.any():
+                problems.append(f"{label} for sweeps {np.flatnonzero(mask).tolist()}")
+        if problems:
+            raise ValueError(f"{motor.name}: " + "; ".join(problems) + ". Adjust nframes, scan range, or exposure time.")
+
+    return kin
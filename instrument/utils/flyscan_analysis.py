@@ -0,0 +1,171 @@
+"""
+Per-frame table of a fly scan and dropped/duplicated frame detection.
+
+After a sweep, the IC userArrayCalcs (moncnt, trcnt, Emoncnt, Etrcnt,
+cntticks) hold one value per detector pulse and `timestamp_array` holds
+the area detector timestamp of every frame that arrived, all newest
+first. `frame_table()` aligns them into one structured array (one row per
+requested frame) and `bad_frames()` lists the frames to re-acquire.
+Everything is vectorized, so an 8000-frame sweep takes milliseconds.
+
+USAGE::
+
+    table = frame_table(
+        nframes = 8000,
+        frame_time = 0.1,
+        timestamps = timestamp_array.bb_value.get(),
+        n_received = det.cam.num_images_counter.get(),
+        moncnt = sample_monitor_array.bb_value.get(),
+    )
+    report = bad_frames(table)
+    report["missing"]     #frame indices to re-acquire
+"""
+
+__all__ = [
+    "frame_table",
+    "bad_frames",
+]
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+logger.info(__file__)
+
+
+import numpy as np
+
+
+def frame_table(
+    nframes,
+    frame_time,
+    timestamps,
+    n_received = None,
+    start_pos = 0.0,
+    scan_delta = 0.0,
+    newest_first = True,
+    **ic_arrays,
+):
+    """
+    Align the per-frame arrays of a sweep into one structured array.
+
+    Each received timestamp is placed in the frame slot given by the
+    accumulated timestamp gaps (in units of `frame_time`), so a gap of two
+    frame times leaves one empty (missing) slot and a gap of ~zero marks a
+    duplicated frame. A missing first frame cannot be told from a late
+    start; frames that never arrived at the end of the sweep show up as
+    missing.
+
+    Returns a structured array with `nframes` rows and the fields
+    frame, omega, timestamp, dt, received, duplicates, and one field per
+    keyword in `ic_arrays`.
+
+    PARAMETERS
+
+    nframes *int* :
+        Number of frames requested.
+
+    frame_time *float* :
+        Expected time between frames in seconds
+        (exposure time + extra time + det gap).
+
+    timestamps *array* :
+        Detector timestamps from `timestamp_array.bb_value`.
+
+    n_received *int* :
+        Number of frames the detector received (e.g.,
+        `det.cam.num_images_counter`). (default : `nframes`)
+
+    start_pos *float* :
+        Starting position of the sweep, for the omega column. (default : 0.0)
+
+    scan_delta *float* :
+        Signed step per frame, for the omega column. (default : 0.0)
+
+    newest_first *bool* :
+        True if the arrays hold the newest frame at index 0, as the
+        userArrayCalcs do ("C?(BB>>1)+AA:BB"). (default : True)
+
+    ic_arrays *arrays* :
+        Per-pulse arrays (e.g., moncnt = ..., trcnt = ...), `nframes`
+        values each.
+    """
+
+    if frame_time <= 0:
+        raise ValueError("frame_time must be positive.")
+    if n_received is None:
+        n_received = nframes
+    n_received = int(min(n_received, len(timestamps)))
+
+    def _ordered(array, npoints):
+        array = np.asarray(array, dtype = float)[:npoints]
+        return array[::-1] if newest_first else array
+
+    fields = [
+        ("frame", np.int64),
+        ("omega", np.float64),
+        ("timestamp", np.float64),
+        ("dt", np.float64),
+        ("received", np.bool_),
+        ("duplicates", np.int64),
+    ]
+    fields += [(key, np.float64) for key in ic_arrays]
+    table = np.zeros(nframes, dtype = fields)
+
+    frames = np.arange(nframes)
+    table["frame"] = frames
+    table["omega"] = start_pos + (frames + 0.5) * scan_delta
+    table["timestamp"] = np.nan
+    table["dt"] = np.nan
+
+    for key, array in ic_arrays.items():
+        values = _ordered(array, nframes)
+        table[key] = np.nan
+        table[key][:len(values)] = values
+
+    if n_received == 0:
+        return table
+
+    #place each received frame in its slot from the accumulated gaps
+    ts = _ordered(timestamps, n_received)
+    steps = np.rint(np.diff(ts) / frame_time).astype(np.int64)
+    steps = np.clip(steps, 0, None)     #clock going backwards: treat as duplicate
+    slots = np.concatenate(([0], np.cumsum(steps)))
+
+    in_range = slots < nframes
+    if not in_range.all():
+        logger.warning(f"{np.count_nonzero(~in_range)} frames arrived after the last expected slot.")
+
+    counts = np.bincount(slots[in_range], minlength = nframes)[:nframes]
+    table["received"] = counts > 0
+    table["duplicates"] = np.clip(counts - 1, 0, None)
+
+    #first timestamp per slot (duplicates keep the earliest)
+    first = np.concatenate(([True], steps > 0)) & in_range
+    table["timestamp"][slots[first]] = ts[first]
+    table["dt"][1:] = np.diff(table["timestamp"])
+
+    return table
+
+
+def bad_frames(table):
+    """
+    Summarize a table from `frame_table()`.
+
+    Returns a dictionary with the frame indices that are missing (to be
+    re-acquired), the frame indices that were received more than once,
+    and "ok" (True if there are neither).
+
+    PARAMETERS
+
+    table *structured array* :
+        Output of `frame_table()`.
+    """
+
+    missing = table["frame"][~table["received"]]
+    duplicated = table["frame"][table["duplicates"] > 0]
+    return dict(
+        missing = missing,
+        duplicated = duplicated,
+        ok = not (len(missing) or len(duplicated)),
+    )
@@ -0,0 +1,234 @@
+"""
+Persistent registry of detector readout gaps.
+
+The gap is the time between the end of one exposure and the earliest
+start of the next (minimum safe acquire_period - acquire_time). It
+depends on the detector, its ADcore version, binning and trigger mode, so
+those make up the registry key. Values are measured by
+`plans/gap_calibration.calibrate_gap()` and read by the fly plans through
+`detector_gap()`. Detectors that were never calibrated fall back to
+`DEFAULT_GAPS` (the values formerly hard-coded in the fly plans).
+
+The registry is a JSON file, by default
+`~/.config/Bluesky_det_gaps.json`; set `DETECTOR_GAP_REGISTRY` in
+`iconfig.yml` to change it.
+
+USAGE::
+
+    detector_gap(ge1)                   #seconds
+    gap_registry.show()
+"""
+
+__all__ = [
+    "DEFAULT_GAPS",
+    "GapRegistry",
+    "gap_registry",
+    "detector_gap",
+]
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+logger.info(__file__)
+
+
+from .. import iconfig
+import datetime
+import json
+import pathlib
+import pyRestTable
+import threading
+
+
+#fallback readout gaps in seconds (formerly hard-coded in fastsweep and enfly)
+DEFAULT_GAPS = {
+    "pixirad" : 0.05,
+    "ge1" : 0.15,
+    "ge2" : 0.15,
+    "ge3" : 0.15,
+    "ge4" : 0.15,
+    "varex20idff" : 0.067,
+}
+
+
+def _get_registry_path():
+    path = iconfig.get("DETECTOR_GAP_REGISTRY")
+    if path is None:
+        path = pathlib.Path.home() / ".config" / "Bluesky_det_gaps.json"
+    return pathlib.Path(path)
+
+
+class GapRegistry(object):
+    """
+    Minimum safe readout gaps per (detector, ADcore version, binning,
+    trigger mode), kept in a JSON file.
+
+    PARAMETERS
+
+    path *str or pathlib.Path* :
+        JSON file holding the registry (created on first write).
+    """
+
+    def __init__(self, path):
+        self.path = pathlib.Path(path)
+        self._lock = threading.Lock()
+        self._entries = None
+
+    def _load(self):
+        if self._entries is None:
+            try:
+                self._entries = json.loads(self.path.read_text())
+            except FileNotFoundError:
+                self._entries = {}
+            except ValueError:
+                logger.warning(f"Could not parse {self.path}, starting an empty gap registry.")
+                self._entries = {}
+        return self._entries
+
+    def _save(self):
+        self.path.parent.mkdir(parents = True, exist_ok = True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self._entries, indent = 2, sort_keys = True))
+        tmp.replace(self.path)  #atomic, so readers never see half a file
+
+    @staticmethod
+    def key(det, trigger_mode = None):
+        """
+        Registry key of `det` in its current configuration:
+        "name|ADcore version|binning|trigger mode".
+
+        PARAMETERS
+
+        det *area detector object* :
+            Detector made by `make_det()`.
+
+        trigger_mode *str or None* :
+            Trigger mode to look up. If None, the current trigger mode.
+            (default : None)
+        """
+        cam = det.cam
+        try:
+            version = cam.adcore_version.get()
+        except Exception:
+            version = "unknown"
+        try:
+            binning = f"{cam.bin_x.get()}x{cam.bin_y.get()}"
+        except Exception:
+            binning = "1x1"
+        if trigger_mode is None:
+            try:
+                trigger_mode = cam.trigger_mode.get(as_string = True)
+            except Exception:
+                trigger_mode = "unknown"
+        return "|".join((det.name, str(version), binning, str(trigger_mode)))
+
+    def get(self, det, trigger_mode = None):
+        """Registry entry (dict) of `det`, or None if not calibrated."""
+        key = self.key(det, trigger_mode = trigger_mode)
+        with self._lock:
+            return self._load().get(key)
+
+    def record(self, det, gap, min_period, exposure_time, trigger_mode = None, **info):
+        """
+        Store a calibration result for `det` and write the registry file.
+
+        PARAMETERS
+
+        det *area detector object* :
+            Calibrated detector.
+
+        gap *float* :
+            Minimum safe readout gap in seconds.
+
+        min_period *float* :
+            Minimum safe acquire_period found at `exposure_time`.
+
+        exposure_time *float* :
+            acquire_time used for the calibration.
+
+        trigger_mode *str or None* :
+            Trigger mode used. If None, the current trigger mode.
+            (default : None)
+
+        info :
+            Anything else worth keeping (e.g., number of frames).
+        """
+        key = self.key(det, trigger_mode = trigger_mode)
+        entry = dict(
+            gap = gap,
+            min_period = min_period,
+            exposure_time = exposure_time,
+            date = datetime.datetime.now().isoformat(timespec = "seconds"),
+            **info,
+        )
+        with self._lock:
+            self._load()[key] = entry
+            self._save()
+        logger.info(f"Recorded readout gap {gap:.4f}s for {key}.")
+        return entry
+
+    def similar(self, prefix):
+        """Entries whose key starts with `prefix` (e.g., "ge1|3.10.0|1x1|")."""
+        with self._lock:
+            return [entry for key, entry in self._load().items() if key.startswith(prefix)]
+
+    def forget(self, det = None):
+        """Remove the entries of `det` (all configurations), or all entries."""
+        with self._lock:
+            entries = self._load()
+            for key in list(entries):
+                if det is None or key.split("|")[0] == det.name:
+                    entries.pop(key)
+            self._save()
+
+    def show(self):
+        """Print the registry as a table."""
+        table = pyRestTable.Table()
+        table.labels = ["detector", "ADcore", "binning", "trigger mode", "gap (s)", "min period (s)", "date"]
+        with self._lock:
+            entries = dict(self._load())
+        for key, entry in sorted(entries.items()):
+            table.addRow(key.split("|") + [f"{entry['gap']:.4f}", f"{entry['min_period']:.4f}", entry["date"]])
+        print(table)
+
+
+gap_registry = GapRegistry(_get_registry_path())
+
+
+def detector_gap(det, trigger_mode = None, default = None):
+    """
+    Readout gap (seconds) of `det` in its current configuration.
+
+    Uses the calibrated value from `gap_registry` if there is one (or the
+    largest calibrated value for another trigger mode), else `default`,
+    else `DEFAULT_GAPS`.
+
+    PARAMETERS
+
+    det *area detector object* :
+        Detector made by `make_det()`.
+
+    trigger_mode *str or None* :
+        Trigger mode the plan will use. If None, the current trigger mode.
+        (default : None)
+
+    default *float or None* :
+        Gap used if `det` was never calibrated. (default : None)
+    """
+    entry = gap_registry.get(det, trigger_mode = trigger_mode)
+    if entry is not None:
+        return entry["gap"]
+
+    #same detector, ADcore version and binning in another trigger mode:
+    #use the largest such gap (plans look this up before switching modes)
+    prefix = gap_registry.key(det, trigger_mode = trigger_mode).rsplit("|", 1)[0] + "|"
+    similar = gap_registry.similar(prefix)
+    if similar:
+        return max(entry["gap"] for entry in similar)
+    if default is None:
+        if det.name not in DEFAULT_GAPS:
+            raise KeyError(f"No readout gap known for {det.name}. Run `calibrate_gap({det.name})` first.")
+        default = DEFAULT_GAPS[det.name]
+    logger.info(f"{det.name} has no calibrated readout gap, using {default}s.")
+    return default
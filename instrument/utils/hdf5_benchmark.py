@@ -0,0 +1,477 @@
+"""
+HDF5 compression benchmarks and per-detector HDF1 profiles.
+
+`default_setup()` of the detectors used to hard-code the HDF1 compression
+(`'None'`, with BloscLZ level 5 and byte shuffle preset). This module
+measures instead: it writes synthetic or replayed real frames of each
+detector's size with `h5py`, one frame at a time as the HDF1 plugin does,
+under each codec, level, shuffle and chunk layout the plugin supports,
+and reports throughput (MB/s of raw frames) and compression ratio.
+
+`recommend_profile()` picks, among the settings that keep up with the
+frame rate (with a safety margin), the one that compresses best. Profiles
+are kept per detector in a JSON file (`~/.config/Bluesky_hdf5_profiles.json`
+by default, set `HDF5_PROFILES_FILE` in `iconfig.yml` to change it), and
+`default_setup()` writes them with `hdf5_profile_args()`; detectors
+without a profile keep `DEFAULT_HDF5_PROFILE` (the old settings).
+
+Run it on the detector PC, against the disk the IOC writes to. Blosc,
+LZ4 and bitshuffle need the `hdf5plugin` package; codecs missing locally
+are skipped and listed. N-bit and JPEG are lossy and are not tested.
+
+USAGE::
+
+    results = run_hdf5_benchmark("varex", directory = "/local/data", nframes = 50)
+    profile = recommend_profile(results, frame_rate = 15)
+    hdf5_profiles.set("varex20idff", profile, frame_rate = 15)
+    hdf5_profiles.show()
+
+    #from a shell on the detector PC
+    python -m instrument.utils.hdf5_benchmark varex --dir /local/data --rate 15 --save varex20idff
+"""
+
+__all__ = [
+    "DETECTOR_FRAMES",
+    "DEFAULT_HDF5_PROFILE",
+    "HDF5ProfileRegistry",
+    "hdf5_profiles",
+    "hdf5_profile_args",
+    "hdf5_settings",
+    "synthetic_frames",
+    "replay_frames",
+    "run_hdf5_benchmark",
+    "recommend_profile",
+    "show_hdf5_results",
+    "main",
+]
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+logger.info(__file__)
+
+
+from .. import iconfig
+import argparse
+import datetime
+import itertools
+import json
+import numpy as np
+import os
+import pathlib
+import pyRestTable
+import sys
+import tempfile
+import threading
+import time
+
+
+#frame shape (rows, columns) and dtype per detector type
+DETECTOR_FRAMES = {
+    "ge" : ((2048, 2048), "uint16"),
+    "varex" : ((2880, 2880), "uint16"),     #4343CT
+    "pixirad" : ((402, 1024), "uint16"),
+}
+
+#HDF1 settings formerly hard-coded in `default_setup()`
+DEFAULT_HDF5_PROFILE = dict(
+    compression = "None",
+    blosc_compressor = "BloscLZ",
+    blosc_level = 5,
+    blosc_shuffle = "Byte",
+)
+
+#HDF1 plugin choices (Compression, BloscCompressor, BloscShuffle)
+BLOSC_COMPRESSORS = ("BloscLZ", "LZ4", "LZ4HC", "Snappy", "ZLIB", "ZSTD")
+BLOSC_SHUFFLES = ("None", "Byte", "Bit")
+
+#chunk layouts: (frames per chunk, fraction of the rows per chunk)
+CHUNK_LAYOUTS = {
+    "frame" : (1, 1),
+    "4 frames" : (4, 1),
+    "quarter frame" : (1, 4),
+}
+
+
+def _get_profiles_path():
+    path = iconfig.get("HDF5_PROFILES_FILE")
+    if path is None:
+        path = pathlib.Path.home() / ".config" / "Bluesky_hdf5_profiles.json"
+    return pathlib.Path(path)
+
+
+def hdf5_settings(full = False):
+    """
+    HDF1 compression settings to benchmark, as dictionaries of plugin
+    attributes (without the chunk layout). The quick grid has the likely
+    candidates; `full = True` tries every compressor, level and shuffle.
+    """
+    if full:
+        compressors, levels, shuffles, zlevels = BLOSC_COMPRESSORS, (1, 3, 5, 7, 9), BLOSC_SHUFFLES, (1, 3, 6, 9)
+    else:
+        compressors, levels, shuffles, zlevels = ("BloscLZ", "LZ4", "ZSTD"), (1, 5), ("Byte", "Bit"), (1, 6)
+    settings = [dict(compression = "None")]
+    settings += [dict(compression = "zlib", zlevel = level) for level in zlevels]
+    settings += [dict(compression = "szip")]
+    settings += [dict(compression = "LZ4"), dict(compression = "BSLZ4")]
+    settings += [
+        dict(compression = "Blosc", blosc_compressor = c, blosc_level = l, blosc_shuffle = s)
+        for c, l, s in itertools.product(compressors, levels, shuffles)
+    ]
+    return settings
+
+
+def _h5py_filter(setting):
+    """`h5py.create_dataset()` keyword arguments for an HDF1 setting, or
+    None if the codec is not available here."""
+    import h5py     #only needed to run benchmarks
+
+    compression = setting["compression"]
+    if compression == "None":
+        return {}
+    if compression == "zlib":
+        return dict(compression = "gzip", compression_opts = setting.get("zlevel", 6))
+    if compression == "szip":
+        return dict(compression = "szip") if h5py.h5z.filter_avail(h5py.h5z.FILTER_SZIP) else None
+
+    try:
+        import hdf5plugin       #Blosc, LZ4 and bitshuffle filters
+    except ImportError:
+        return None
+    if compression == "LZ4":
+        return dict(hdf5plugin.LZ4())
+    if compression == "BSLZ4":
+        return dict(hdf5plugin.Bitshuffle(cname = "lz4"))
+    if compression == "Blosc":
+        shuffle = {
+            "None" : hdf5plugin.Blosc.NOSHUFFLE,
+            "Byte" : hdf5plugin.Blosc.SHUFFLE,
+            "Bit" : hdf5plugin.Blosc.BITSHUFFLE,
+        }[setting.get("blosc_shuffle", "Byte")]
+        cname = setting.get("blosc_compressor", "BloscLZ").lower()
+        return dict(hdf5plugin.Blosc(cname = cname, clevel = setting.get("blosc_level", 5), shuffle = shuffle))
+    return None
+
+
+def synthetic_frames(detector, nframes = 20, seed = 0):
+    """
+    Frames like those of `detector` ("ge", "varex" or "pixirad"): a smooth
+    background with counting noise and a few rings of diffraction peaks.
+    Real frames compress differently; prefer `replay_frames()` when a
+    recent file is at hand.
+    """
+    (rows, cols), dtype = DETECTOR_FRAMES[detector]
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:rows, 0:cols]
+    r = np.hypot(y - rows/2, x - cols/2)
+    background = 200 + 50*np.cos(r/rows*np.pi)
+    rings = sum(2000*np.exp(-((r - radius)/2.0)**2) for radius in np.linspace(0.1, 0.45, 6)*min(rows, cols))
+    mean = background + rings
+    limit = np.iinfo(dtype).max
+    frames = np.empty((nframes, rows, cols), dtype = dtype)
+    for i in range(nframes):    #one frame at a time keeps the int64 noise small
+        frames[i] = np.clip(rng.poisson(mean), 0, limit)
+    return frames
+
+
+def replay_frames(path, dataset = "/exchange/data", nframes = 20):
+    """The first `nframes` frames of `dataset` in the HDF5 file `path`."""
+    import h5py
+
+    with h5py.File(path, "r") as f:
+        data = f[dataset]
+        return data[:min(nframes, data.shape[0])]
+
+
+def _write(path, frames, setting, layout):
+    """
+    Write `frames` one at a time, repeated up to a whole number of chunks
+    (a partial last chunk is padded and would lower the ratio); returns
+    (seconds, file bytes, frame bytes written).
+    """
+    import h5py
+
+    nframes, rows, cols = frames.shape
+    frames_per_chunk, row_split = CHUNK_LAYOUTS[layout]
+    if nframes % frames_per_chunk:
+        nframes = -(-nframes // frames_per_chunk) * frames_per_chunk
+        frames = frames[np.arange(nframes) % len(frames)]
+    chunks = (frames_per_chunk, -(-rows // row_split), cols)
+    kwargs = _h5py_filter(setting)
+
+    t0 = time.perf_counter()
+    with h5py.File(path, "w") as f:
+        dset = f.create_dataset(
+            "/exchange/data",
+            shape = (0, rows, cols),
+            maxshape = (None, rows, cols),
+            dtype = frames.dtype,
+            chunks = chunks,
+            **kwargs,
+        )
+        for i, frame in enumerate(frames):
+            dset.resize(i + 1, axis = 0)
+            dset[i] = frame
+    #count the time to reach the disk, not just the page cache
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+    seconds = time.perf_counter() - t0
+    return seconds, path.stat().st_size, frames.nbytes
+
+
+def _label(setting):
+    if setting["compression"] == "Blosc":
+        return f"Blosc {setting['blosc_compressor']} {setting['blosc_level']} shuffle={setting['blosc_shuffle']}"
+    if setting["compression"] == "zlib":
+        return f"zlib {setting['zlevel']}"
+    return setting["compression"]
+
+
+def run_hdf5_benchmark(
+    detector,
+    directory = None,
+    nframes = 20,
+    frames = None,
+    settings = None,
+    layouts = tuple(CHUNK_LAYOUTS),
+    full = False,
+):
+    """
+    Benchmark HDF5 writing of `detector` frames; returns a list of result
+    dictionaries (setting, layout, mb_per_s, ratio, seconds) and prints a table.
+
+    PARAMETERS
+
+    detector *str* :
+        Detector type in `DETECTOR_FRAMES` ("ge", "varex", "pixirad").
+
+    directory *str or None* :
+        Where test files are written, i.e., the disk under test; the
+        files are deleted afterwards. If None, a temporary directory.
+        (default : None)
+
+    nframes *int* :
+        Synthetic frames to write per setting. (default : 20)
+
+    frames *array or None* :
+        Frames to write instead (e.g., from `replay_frames()`). (default : None)
+
+    settings *list of dict or None* :
+        HDF1 settings to test. If None, `hdf5_settings(full)`. (default : None)
+
+    layouts *list of str* :
+        Chunk layouts in `CHUNK_LAYOUTS`. (default : all)
+
+    full *bool* :
+        Use the full grid of settings. (default : False)
+    """
+    frames = np.asarray(frames) if frames is not None else synthetic_frames(detector, nframes = nframes)
+    settings = settings if settings is not None else hdf5_settings(full = full)
+    frame_mb = frames[0].nbytes / 1e6
+
+    results, skipped = [], []
+    with tempfile.TemporaryDirectory(dir = directory, prefix = "hdf5_benchmark_") as tmp:
+        path = pathlib.Path(tmp) / "test.h5"
+        for setting in settings:
+            if _h5py_filter(setting) is None:
+                skipped.append(_label(setting))
+                continue
+            for layout in layouts:
+                try:
+                    seconds, size, raw_bytes = _write(path, frames, setting, layout)
+                except Exception as excuse:
+                    logger.warning(f"{_label(setting)}, {layout}: {excuse}")
+                    continue
+                finally:
+                    path.unlink(missing_ok = True)
+                results.append(dict(
+                    detector = detector,
+                    setting = setting,
+                    layout = layout,
+                    frames_per_chunk = CHUNK_LAYOUTS[layout][0],
+                    row_split = CHUNK_LAYOUTS[layout][1],
+                    seconds = seconds,
+                    mb_per_s = raw_bytes / seconds / 1e6,
+                    ratio = raw_bytes / size,
+                    frame_mb = frame_mb,
+                ))
+
+    if skipped:
+        print(f"Codecs not available here (install hdf5plugin?): {', '.join(sorted(set(skipped)))}")
+    show_hdf5_results(results)
+    return results
+
+
+def show_hdf5_results(results):
+    """Print benchmark results as a table, fastest first."""
+    table = pyRestTable.Table()
+    table.labels = ["setting", "chunks", "MB/s", "frames/s", "ratio"]
+    for result in sorted(results, key = lambda r: -r["mb_per_s"]):
+        table.addRow([
+            _label(result["setting"]),
+            result["layout"],
+            f"{result['mb_per_s']:.0f}",
+            f"{result['mb_per_s'] / result['frame_mb']:.1f}",
+            f"{result['ratio']:.2f}",
+        ])
+    print(table)
+
+
+def recommend_profile(results, frame_rate, margin = 1.5):
+    """
+    HDF1 profile (dict of plugin attributes, including chunking) with the
+    best compression ratio among the settings that write at least
+    `margin` times `frame_rate` frames per second; the fastest one if none
+    does.
+
+    PARAMETERS
+
+    results *list of dict* :
+        From `run_hdf5_benchmark()`.
+
+    frame_rate *float* :
+        Frames per second the detector must sustain.
+
+    margin *float* :
+        Safety factor on the frame rate. (default : 1.5)
+    """
+    if not results:
+        raise ValueError("No benchmark results to recommend from.")
+    fast_enough = [r for r in results if r["mb_per_s"] / r["frame_mb"] >= frame_rate * margin]
+    if fast_enough:
+        best = max(fast_enough, key = lambda r: (r["ratio"], r["mb_per_s"]))
+    else:
+        best = max(results, key = lambda r: r["mb_per_s"])
+        logger.warning(f"No setting sustains {frame_rate} frames/s x {margin}; recommending the fastest.")
+    profile = dict(DEFAULT_HDF5_PROFILE, **best["setting"])
+    profile.update(num_frames_chunks = best["frames_per_chunk"], row_split = best["row_split"])
+    print(f"Recommended: {_label(best['setting'])}, {best['layout']} chunks "
+          f"({best['mb_per_s']:.0f} MB/s, ratio {best['ratio']:.2f}).")
+    return profile
+
+
+class HDF5ProfileRegistry(object):
+    """
+    HDF1 profiles per detector name, kept in a JSON file.
+
+    PARAMETERS
+
+    path *str or pathlib.Path* :
+        JSON file holding the profiles (created on first write).
+    """
+
+    def __init__(self, path):
+        self.path = pathlib.Path(path)
+        self._lock = threading.Lock()
+        self._entries = None
+
+    def _load(self):
+        if self._entries is None:
+            try:
+                self._entries = json.loads(self.path.read_text())
+            except FileNotFoundError:
+                self._entries = {}
+            except ValueError:
+                logger.warning(f"Could not parse {self.path}, starting without HDF5 profiles.")
+                self._entries = {}
+        return self._entries
+
+    def _save(self):
+        self.path.parent.mkdir(parents = True, exist_ok = True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self._entries, indent = 2, sort_keys = True))
+        tmp.replace(self.path)  #atomic, so readers never see half a file
+
+    def get(self, det_name):
+        """Profile (dict of HDF1 attributes) of `det_name`, or None."""
+        with self._lock:
+            entry = self._load().get(det_name)
+        return dict(entry["profile"]) if entry is not None else None
+
+    def set(self, det_name, profile, **info):
+        """Store `profile` for `det_name`, with `info` (e.g., frame_rate)."""
+        with self._lock:
+            self._load()[det_name] = dict(
+                profile = profile,
+                date = datetime.datetime.now().isoformat(timespec = "seconds"),
+                **info,
+            )
+            self._save()
+
+    def forget(self, det_name):
+        """Remove the profile of `det_name` (back to the default)."""
+        with self._lock:
+            self._load().pop(det_name, None)
+            self._save()
+
+    def show(self):
+        """Print the profiles as a table."""
+        table = pyRestTable.Table()
+        table.labels = ["detector", "setting", "frames/chunk", "rows/chunk", "date"]
+        with self._lock:
+            entries = dict(self._load())
+        for name, entry in sorted(entries.items()):
+            profile = entry["profile"]
+            table.addRow([
+                name,
+                _label(profile),
+                profile.get("num_frames_chunks", ""),
+                f"1/{profile['row_split']}" if profile.get("row_split") else "",
+                entry["date"],
+            ])
+        print(table)
+
+
+hdf5_profiles = HDF5ProfileRegistry(_get_profiles_path())
+
+
+def hdf5_profile_args(det):
+    """
+    Signal, value pairs for `bps.mv()` that apply the HDF1 profile of
+    `det` (or `DEFAULT_HDF5_PROFILE`), for use in `default_setup()`.
+    Settings the plugin has no signal for are left out.
+    """
+    profile = dict(DEFAULT_HDF5_PROFILE, **(hdf5_profiles.get(det.name) or {}))
+    hdf1 = det.hdf1
+    row_split = profile.pop("row_split", None)
+    if row_split:
+        profile["num_row_chunks"] = -(-det.cam.array_size.array_size_y.get() // row_split)
+        profile["num_col_chunks"] = det.cam.array_size.array_size_x.get()
+    args = []
+    for attr, value in profile.items():
+        signal = getattr(hdf1, attr, None)
+        if signal is None:
+            logger.debug(f"{hdf1.name} has no {attr}; not set.")
+            continue
+        args += [signal, value]
+    return args
+
+
+def main(argv = None):
+    """Command line entry: benchmark one detector type, optionally save its profile."""
+    parser = argparse.ArgumentParser(description = "HDF5 compression benchmarks.")
+    parser.add_argument("detector", choices = sorted(DETECTOR_FRAMES), help = "detector type")
+    parser.add_argument("--dir", default = None, help = "directory on the disk under test")
+    parser.add_argument("--frames", type = int, default = 20, help = "frames per setting")
+    parser.add_argument("--replay", default = None, help = "HDF5 file with real frames")
+    parser.add_argument("--dataset", default = "/exchange/data", help = "dataset of --replay")
+    parser.add_argument("--full", action = "store_true", help = "every codec, level and shuffle")
+    parser.add_argument("--rate", type = float, default = None, help = "frame rate to sustain")
+    parser.add_argument("--save", default = None, metavar = "DET_NAME", help = "store the recommended profile")
+    args = parser.parse_args(argv)
+
+    frames = replay_frames(args.replay, args.dataset, args.frames) if args.replay else None
+    results = run_hdf5_benchmark(args.detector, directory = args.dir, nframes = args.frames, frames = frames, full = args.full)
+    if args.rate is not None and results:
+        profile = recommend_profile(results, args.rate)
+        if args.save:
+            hdf5_profiles.set(args.save, profile, frame_rate = args.rate)
+    return 0 if results else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
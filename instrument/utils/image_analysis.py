@@ -5,6 +5,8 @@ Statistical peak analysis functions
 __all__ = [
     "analyze_image",
     "analyze_peak",
+    "bin_image",
+    "image_stats",
 ]
 
 import logging
@@ -17,7 +19,6 @@ logger.info(__file__)
 import numpy as np
 import pyRestTable
 from scipy.ndimage import center_of_mass
-from scipy.integrate import trapz
 
 
 def analyze_peak(y_arr, x_arr=None):
@@ -85,9 +86,32 @@ def analyze_peak(y_arr, x_arr=None):
     )
 
 
+def bin_image(image, binning=1):
+    """Sum `binning` x `binning` blocks of `image` (edges that do not fill a block are dropped)."""
+    image = np.asarray(image)
+    if binning <= 1:
+        return image
+    rows = image.shape[0] // binning * binning
+    cols = image.shape[1] // binning * binning
+    image = image[:rows, :cols]
+    return image.reshape(rows // binning, binning, cols // binning, binning).sum(axis=(1, 3))
+
+
+def image_stats(image, binning=1):
+    """
+    `analyze_peak()` of the column sums (horizontal) and row sums (vertical)
+    of `image`, in unbinned pixel coordinates.
+    """
+    binned = bin_image(image, binning)
+    scale = max(binning, 1)
+    # positions at the centers of the binned pixels
+    horizontal = analyze_peak(binned.sum(axis=0), np.arange(binned.shape[1]) * scale + (scale - 1) / 2)
+    vertical = analyze_peak(binned.sum(axis=1), np.arange(binned.shape[0]) * scale + (scale - 1) / 2)
+    return horizontal, vertical
+
+
 def analyze_image(image):
-    horizontal = analyze_peak(image.sum(axis=0))
-    vertical = analyze_peak(image.sum(axis=1))
+    horizontal, vertical = image_stats(image)
 
     table = pyRestTable.Table()
     table.addLabel("measure")
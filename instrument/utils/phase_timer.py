@@ -0,0 +1,196 @@
+"""
+Phase-level timing of plans (configure, stage, taxi, fly, readback,
+deconfigure, ...).
+
+`PhaseTimer.phase()` is a context manager that also works around
+`yield from` inside a plan, so it measures the real time the RunEngine
+spends on the enclosed messages. The timings are
+
+* emitted inside the run as a one-event "phase_timing" stream
+  (`PhaseTimer.emit()`), so they are stored with the run in databroker, and
+* appended as one JSON line per plan to a local metrics file
+  (`PhaseTimer.write_metrics()`) for trending across weeks.
+
+The metrics file is `~/.config/Bluesky_phase_metrics.jsonl` by default;
+set `PHASE_METRICS_FILE` in `iconfig.yml` to change it. Inside
+`metrics_scratch(path)`, timers created in the same thread write to
+`path` instead (dry runs, see `utils/plan_simulator.py`).
+
+USAGE::
+
+    timer = PhaseTimer("fastsweep")
+    with timer.phase("taxi"):
+        yield from taxi(...)
+    ...
+    yield from timer.emit()     #inside the run
+    timer.write_metrics()
+
+    load_phase_metrics("fastsweep")     #list of past timings
+"""
+
+__all__ = [
+    "PhaseTimer",
+    "load_phase_metrics",
+    "metrics_scratch",
+]
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+logger.info(__file__)
+
+
+from .. import iconfig
+from bluesky import plan_stubs as bps
+from contextlib import contextmanager
+from ophyd import Signal
+import datetime
+import json
+import pathlib
+import threading
+import time
+
+
+_scratch = threading.local()
+
+
+@contextmanager
+def metrics_scratch(path):
+    """
+    Context manager sending the metrics of timers created in this thread
+    to `path` instead of the configured file.
+    """
+    previous = getattr(_scratch, "path", None)
+    _scratch.path = pathlib.Path(path)
+    try:
+        yield _scratch.path
+    finally:
+        _scratch.path = previous
+
+
+def _get_metrics_path():
+    path = getattr(_scratch, "path", None)
+    if path is None:
+        path = iconfig.get("PHASE_METRICS_FILE")
+    if path is None:
+        path = pathlib.Path.home() / ".config" / "Bluesky_phase_metrics.jsonl"
+    return pathlib.Path(path)
+
+
+class PhaseTimer(object):
+    """
+    Collects wall-clock durations of named phases of one plan.
+
+    Phases entered more than once (e.g., "taxi" in a series of sweeps)
+    are summed.
+
+    PARAMETERS
+
+    plan_name *str* :
+        Name recorded with the timings.
+
+    metrics_file *str or pathlib.Path or None* :
+        JSONL file `write_metrics()` appends to. If None, the configured
+        default. (default : None)
+    """
+
+    def __init__(self, plan_name, metrics_file = None):
+        self.plan_name = plan_name
+        self.metrics_file = pathlib.Path(metrics_file) if metrics_file else _get_metrics_path()
+        self.timings = {}
+        self.t_start = time.time()
+
+    @contextmanager
+    def phase(self, name):
+        """Time the enclosed block as phase `name`."""
+        t0 = time.time()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + time.time() - t0
+
+    def total(self):
+        """Seconds since the timer was created."""
+        return time.time() - self.t_start
+
+    def summary(self):
+        """Timings per phase plus "other" (untimed) and "total"."""
+        total = self.total()
+        summary = dict(self.timings)
+        summary["other"] = max(total - sum(self.timings.values()), 0.0)
+        summary["total"] = total
+        return summary
+
+    def report(self):
+        """Print the timings, slowest phase first."""
+        summary = self.summary()
+        print(f"{self.plan_name} phase timing:")
+        for name, seconds in sorted(summary.items(), key = lambda item: -item[1]):
+            if name != "total":
+                print(f"   {name}: {seconds:.3f}s")
+        print(f"   total: {summary['total']:.3f}s")
+
+    def emit(self, stream_name = "phase_timing"):
+        """
+        Plan stub writing the timings so far as one event in stream
+        `stream_name`. Must be called inside a run, before it closes.
+        """
+        signals = [
+            Signal(name = f"phase_{name}", value = seconds)
+            for name, seconds in self.summary().items()
+        ]
+        yield from bps.create(name = stream_name)
+        for signal in signals:
+            yield from bps.read(signal)
+        yield from bps.save()
+
+    def write_metrics(self, **extra):
+        """
+        Append the timings as one JSON line to the metrics file.
+
+        PARAMETERS
+
+        extra :
+            Anything else to keep with this record (e.g., nframes).
+        """
+        record = dict(
+            plan = self.plan_name,
+            date = datetime.datetime.now().isoformat(timespec = "seconds"),
+            phases = self.summary(),
+            **extra,
+        )
+        try:
+            self.metrics_file.parent.mkdir(parents = True, exist_ok = True)
+            with open(self.metrics_file, "a") as f:
+                f.write(json.dumps(record, default = str) + "\n")
+        except OSError as excuse:
+            logger.warning(f"Could not write phase metrics to {self.metrics_file}: {excuse}")
+        return record
+
+
+def load_phase_metrics(plan_name = None, metrics_file = None):
+    """
+    Read past timings back from the metrics file, oldest first.
+
+    PARAMETERS
+
+    plan_name *str or None* :
+        Only return records of this plan. (default : None)
+
+    metrics_file *str or pathlib.Path or None* :
+        File to read. If None, the configured default. (default : None)
+    """
+    path = pathlib.Path(metrics_file) if metrics_file else _get_metrics_path()
+    records = []
+    if not path.exists():
+        return records
+    with open(path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if plan_name is None or record.get("plan") == plan_name:
+                records.append(record)
+    return records
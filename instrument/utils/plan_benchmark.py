@@ -0,0 +1,938 @@
+"""
+Plan-overhead benchmarks for the fly plans (fastsweep, fastsweep_series).
+
+Each benchmark runs one plan in a private RunEngine against fake devices
+(`ophyd.sim.make_fake_device` copies, set as globals of the plan's
+module for the duration of the run), so hardware time is close to zero
+and what is left is the cost of the plan itself:
+
+    messages    Msgs per command (set, wait, trigger, read, ...)
+    ca_puts     EPICS puts (counted once per call, not per retry)
+    ca_gets     EPICS gets
+    wall        wall time of the run
+    blocked     time spent in "wait", "sleep" and "wait_for"
+    overhead    wall - blocked: RunEngine and plan-side Python time
+    phases      per-phase wall time (fastsweep "phase_timing" stream)
+
+No IOC is contacted. The fakes are copies of the devices of modules that
+only create ophyd objects (`s1id_FPGAs`, `s1ide_motors`; ophyd connects
+lazily), or are built from the device class where the module contacts
+the IOC when imported: `scaler2` from `devices/scaler_classes.py` and a
+generic area detector from `make_det_class()` (`benchmark_det_class()`).
+Plans whose modules create area detectors when imported (enfly,
+hydra_setup, cont_acq) are not benchmarked.
+
+With `fake = False` the same devices are created for real, e.g., against
+the soft IOC of `instrument/sim` (`python -m instrument.sim`), which
+serves the fly scan PVs, `scaler2` and the benchmark detector. There the
+counts also depend on the IOC's state (`ConfigCache` only writes what
+differs), so compare real runs with real runs only.
+
+Results are appended to a JSONL history file
+(`~/.config/Bluesky_plan_benchmarks.jsonl` by default, set
+`BENCHMARK_HISTORY_FILE` in `iconfig.yml` to change it).
+`check_regressions()` compares new results to the median of the last
+runs of the same benchmark and reports anything that got slower (or
+chattier) by more than a threshold.
+
+USAGE::
+
+    results = run_benchmarks()                  #all of BENCHMARKS
+    results = run_benchmarks(["fastsweep"])
+
+    #from a shell; exits 1 on regression or error
+    python -m instrument.utils.plan_benchmark --threshold 0.2
+"""
+
+__all__ = [
+    "BENCHMARKS",
+    "benchmark_det_class",
+    "fake_devices",
+    "count_ca",
+    "run_benchmark",
+    "run_benchmarks",
+    "load_benchmark_history",
+    "check_regressions",
+    "main",
+]
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+logger.info(__file__)
+
+
+from .. import iconfig
+from bluesky import RunEngine
+from bluesky import plan_stubs as bps
+from contextlib import contextmanager
+from ophyd import Device
+from ophyd.utils import AlarmSeverity
+from ophyd import EpicsSignal
+from ophyd.signal import EpicsSignalBase
+from ophyd import Signal
+from ophyd.sim import FakeEpicsSignal
+from ophyd.sim import instantiate_fake_device
+from ophyd.sim import make_fake_device
+import argparse
+import datetime
+import fnmatch
+import importlib
+import json
+import pathlib
+import pyRestTable
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from .fly_checkpoint import fly_checkpoints
+from .fly_kinematics import clear_motor_cache
+from .gap_registry import DEFAULT_GAPS
+from ..devices.ad_make_dets import find_det_version
+from ..devices.ad_make_dets import make_det_class
+from ..devices.config_cache import ConfigCache
+
+
+#commands whose time is spent waiting on hardware, not in the plan/RunEngine
+BLOCKING_COMMANDS = ("wait", "sleep", "wait_for")
+
+#metrics compared by `check_regressions()`
+REGRESSION_METRICS = ("messages", "ca_puts", "ca_gets", "overhead")
+
+#fake signals reset to 0 shortly after being set to 1 (busy records, cam acquire, file capture)
+AUTO_RESET_ATTRS = ("state", "acquire", "capture")
+AUTO_RESET_DELAY = 0.01   #seconds
+
+#constructor arguments copied from real devices to their fakes
+FAKE_INSTANCE_ATTRS = ("READ_PATH", "WRITE_PATH", "default_plugin_control", "custom_plugin_control")
+
+#values seeded in every fake before the benchmark's own `values`
+#(a 1-element image, so `image1.shaped_image` can shape `array_data`)
+FAKE_VALUES = {"*.image1.ndimensions": 1, "*.image1.array_size.depth": 1, "*.image1.array_data": [0]}
+
+#ADcore version of the benchmark detector (as served by `instrument/sim`)
+BENCHMARK_ADCORE_VERSION = "3.10.0"
+
+#plugins of the benchmark detector: the cam feeds tiff1 only (like the sim detector)
+BENCHMARK_PLUGIN_CONTROL = {
+    "use_image1" : False,
+    "use_pva1" : False,
+    "use_proc1" : False,
+    "use_trans1" : False,
+    "use_over1" : False,
+    "use_roi1" : False,
+    "use_tiff1" : True,
+    "use_hdf1" : False,
+    "ndport_image1" : "",
+    "ndport_pva1" : "",
+    "ndport_proc1" : "",
+    "ndport_trans1" : "",
+    "ndport_over1" : "",
+    "ndport_roi1" : "",
+    "ndport_tiff1" : "SIM1",
+    "ndport_hdf1" : "",
+}
+
+#the main plans, queueserver style; `device_kwargs` are resolved to (fake) devices
+BENCHMARKS = [
+    dict(
+        name = "fastsweep",
+        plan = "instrument.plans.hardware_triggering:fastsweep",
+        devices = [
+            "instrument.devices.s1id_FPGAs",
+            "instrument.devices.s1ide_motors",
+        ],
+        classes = dict(
+            scaler2 = dict(cls = "instrument.devices.scaler_classes:EHutchScaler2", prefix = "1ide:S2:scaler2"),
+            det1 = dict(
+                cls = "instrument.utils.plan_benchmark:benchmark_det_class",
+                prefix = "1idSIM:",
+                kwargs = dict(READ_PATH = "/tmp/", WRITE_PATH = "/tmp/", default_plugin_control = BENCHMARK_PLUGIN_CONTROL),
+            ),
+        ),
+        kwargs = dict(
+            start_pos = 0,
+            end_pos = 10,
+            nframes = 100,
+            exposure_time = 0.01,
+            scan_folder = "benchmark",
+            file_name = "fastsweep",
+            scalers = [],
+            use_hydra = False,
+        ),
+        device_kwargs = dict(fly_motor = "sms_aero.roty", dets = ["det1"]),
+        gaps = dict(det1 = 0.05),
+        limits = {"sms_aero.roty.velocity": (0.1, 90)},
+        values = {
+            "sms_aero.roty.acceleration": 0.2,
+            "sms_aero.roty.motor_step_size": 1e-5,
+            "sms_aero.roty.high_limit_travel": 1e4,
+            "sms_aero.roty.low_limit_travel": -1e4,
+            "det1.cam.num_images_counter": 100,
+            "det1.tiff1.file_path": "/tmp/",
+            "det1.tiff1.file_name": "benchmark",
+            "det1.tiff1.file_template": "%s%s_%6.6d.tiff",
+            "det1.tiff1.file_path_exists": 1,
+        },
+        fly_values = {
+            "*_array.bb_value": [float(i) for i in range(100)],
+            #newest first, one frame time apart (exposure + 0.03 s + gap)
+            "timestamp_array.bb_value": [0.09 * i for i in reversed(range(100))],
+        },
+    ),
+    dict(
+        name = "fastsweep_series",
+        plan = "instrument.plans.hardware_triggering:fastsweep_series",
+        devices = [
+            "instrument.devices.s1id_FPGAs",
+            "instrument.devices.s1ide_motors",
+        ],
+        classes = dict(
+            scaler2 = dict(cls = "instrument.devices.scaler_classes:EHutchScaler2", prefix = "1ide:S2:scaler2"),
+            det1 = dict(
+                cls = "instrument.utils.plan_benchmark:benchmark_det_class",
+                prefix = "1idSIM:",
+                kwargs = dict(READ_PATH = "/tmp/", WRITE_PATH = "/tmp/", default_plugin_control = BENCHMARK_PLUGIN_CONTROL),
+            ),
+        ),
+        kwargs = dict(
+            sweeps = [(0, 10), (10, 20), (20, 30)],
+            nframes = 100,
+            exposure_time = 0.01,
+            scan_folder = "benchmark",
+            file_name = "fastsweep_series",
+        ),
+        device_kwargs = dict(fly_motor = "sms_aero.roty", dets = ["det1"]),
+        gaps = dict(det1 = 0.05),
+        limits = {"sms_aero.roty.velocity": (0.1, 90)},
+        values = {
+            "sms_aero.roty.acceleration": 0.2,
+            "sms_aero.roty.motor_step_size": 1e-5,
+            "sms_aero.roty.high_limit_travel": 1e4,
+            "sms_aero.roty.low_limit_travel": -1e4,
+            "det1.cam.num_images_counter": 100,
+            "det1.tiff1.file_path": "/tmp/",
+            "det1.tiff1.file_name": "benchmark",
+            "det1.tiff1.file_template": "%s%s_%6.6d.tiff",
+            "det1.tiff1.file_path_exists": 1,
+        },
+        fly_values = {
+            "*_array.bb_value": [float(i) for i in range(100)],
+            #newest first, one frame time apart (exposure + 0.03 s + gap)
+            "timestamp_array.bb_value": [0.09 * i for i in reversed(range(100))],
+        },
+    ),
+]
+
+
+class _BenchmarkDetMixin(object):
+    """Fastsweep configuration of the benchmark detector (cam PVs only)."""
+
+    def fastsweep_config(self, nframes):
+        yield from bps.mv(
+            self.cam.image_mode, "Multiple",
+            self.cam.num_images, nframes,
+            self.cam.trigger_mode, "External",
+        )
+
+
+def _make_benchmark_cam(Det_CamBase):
+    return Det_CamBase
+
+
+def benchmark_det_class():
+    """
+    Area detector class of the benchmark detector: `make_det_class()` with
+    the plugin classes of `BENCHMARK_ADCORE_VERSION`, a plain cam and no
+    hdf1. The detector modules (e.g. `pixiradv2.py`) create their
+    detectors, contacting the IOCs, when imported, so their classes are
+    not used here.
+    """
+    return make_det_class(
+        make_cam_plugin = _make_benchmark_cam,
+        plugin_classes = find_det_version("benchmark:", version = BENCHMARK_ADCORE_VERSION),
+        det_mixin = _BenchmarkDetMixin,
+        use_hdf1 = False,
+    )
+
+
+def _get_history_path():
+    path = iconfig.get("BENCHMARK_HISTORY_FILE")
+    if path is None:
+        path = pathlib.Path.home() / ".config" / "Bluesky_plan_benchmarks.jsonl"
+    return pathlib.Path(path)
+
+
+def _lookup(namespace, reference):
+    """Device (or component) named by `reference`, e.g. "sms_aero.roty"."""
+    name, *attrs = reference.split(".")
+    obj = namespace[name]
+    for attr in attrs:
+        obj = getattr(obj, attr)
+    return obj
+
+
+def _resolve_kwargs(case, namespace):
+    kwargs = dict(case.get("kwargs", {}))
+    for key, reference in case.get("device_kwargs", {}).items():
+        if isinstance(reference, (list, tuple)):
+            kwargs[key] = [_lookup(namespace, item) for item in reference]
+        else:
+            kwargs[key] = _lookup(namespace, reference)
+    return kwargs
+
+
+def _real_devices(module_names):
+    """Top-level devices and signals defined in `module_names`, by name."""
+    devices = {}
+    for module_name in module_names:
+        for name, obj in vars(importlib.import_module(module_name)).items():
+            if isinstance(obj, (Device, Signal)) and getattr(obj, "parent", None) is None:
+                devices.setdefault(name, obj)
+    return devices
+
+
+def _config_caches(module_names):
+    """`ConfigCache` objects defined in `module_names`, by name."""
+    caches = {}
+    for module_name in module_names:
+        for name, obj in vars(importlib.import_module(module_name)).items():
+            if isinstance(obj, ConfigCache):
+                caches.setdefault(name, obj)
+    return caches
+
+
+def _device_class(reference):
+    """Class named by "module:attribute"; a function is called for it."""
+    module_name, attr = reference.split(":")
+    obj = getattr(importlib.import_module(module_name), attr)
+    return obj if isinstance(obj, type) else obj()
+
+
+def _class_devices(classes, fake = True):
+    """
+    Devices built from their classes (see `BENCHMARKS`), by name: fakes,
+    or real ones if `fake` is False.
+    """
+    devices = {}
+    for name, spec in (classes or {}).items():
+        cls = _device_class(spec["cls"])
+        kwargs = dict(spec.get("kwargs", {}))
+        if fake:
+            devices[name] = instantiate_fake_device(cls, name = name, prefix = spec["prefix"], **kwargs)
+        else:
+            devices[name] = cls(spec["prefix"], name = name, **kwargs)
+    return devices
+
+
+def _make_fake(obj):
+    """Fake copy of a top-level device or EPICS signal (same name)."""
+    if isinstance(obj, Device):
+        cls = make_fake_device(type(obj))
+        #per-instance settings of area detectors (see `make_det_class()`)
+        kwargs = {attr: getattr(obj, attr) for attr in FAKE_INSTANCE_ATTRS if hasattr(obj, attr)}
+        return instantiate_fake_device(cls, name = obj.name, prefix = obj.prefix, **kwargs)
+    if isinstance(obj, EpicsSignalBase):
+        cls = FakeEpicsSignal if isinstance(obj, EpicsSignal) else make_fake_device(type(obj))
+        return cls(obj.pvname, name = obj.name, string = getattr(obj, "as_string", False))
+    return obj      #soft signals need no fake
+
+
+def _fake_signals(fake):
+    """(dotted name, fake signal) of every fake EPICS signal."""
+    if isinstance(fake, FakeEpicsSignal):
+        yield fake.name, fake
+        return
+    if not isinstance(fake, Device):
+        return
+    for walk in fake.walk_signals(include_lazy = True):
+        if isinstance(walk.item, FakeEpicsSignal):
+            yield f"{fake.name}.{walk.dotted_name}", walk.item
+
+
+def _auto_reset(signal):
+    """Let a fake busy record/acquire finish by itself after being started."""
+
+    def reset(value = None, **kwargs):
+        if value in (1, "Busy", "Acquire", "Capture"):
+            threading.Timer(AUTO_RESET_DELAY, signal.sim_put, [0]).start()
+
+    signal.subscribe(reset, run = False)
+
+
+def _auto_move(motor):
+    """Let a fake motor "move": readback follows setpoint, DMOV toggles."""
+
+    def move(value = None, **kwargs):
+        def done():
+            motor.motor_done_move.sim_put(0)
+            motor.user_readback.sim_put(value)
+            motor.motor_done_move.sim_put(1)
+        threading.Timer(AUTO_RESET_DELAY, done).start()
+
+    motor.user_setpoint.subscribe(move, run = False)
+
+
+def _fill_when_flying(fakes, fly_values):
+    """
+    Write `fly_values` (by dotted name, glob patterns allowed) to the fakes
+    whenever a flyer's fly busy record ("*.fly.state") starts, as the IOC
+    fills the IC and timestamp arrays while flying.
+    """
+    targets = [
+        (signal, value)
+        for fake in fakes.values()
+        for dotted, signal in _fake_signals(fake)
+        for pattern, value in fly_values.items()
+        if fnmatch.fnmatchcase(dotted, pattern)
+    ]
+
+    def fill(value = None, **kwargs):
+        if value in (1, "Busy"):
+            for signal, fly_value in targets:
+                signal.sim_put(fly_value)
+
+    for fake in fakes.values():
+        for dotted, signal in _fake_signals(fake):
+            if fnmatch.fnmatchcase(dotted, "*.fly.state"):
+                signal.subscribe(fill, run = False)
+
+
+def _prepare_fake(fake, values, limits):
+    """Seed values (so `.get()` is never None) and make motion complete."""
+    motors = []
+    if isinstance(fake, Device):
+        devices = [fake] + [device for _, device in fake.walk_subdevices(include_lazy = True)]
+        motors = [
+            device for device in devices
+            if all(hasattr(device, attr) for attr in ("user_setpoint", "user_readback", "motor_done_move"))
+        ]
+    for motor in motors:
+        #EpicsMotor re-reads the setpoint limits over CA when these change; fakes use `limits`
+        motor.low_limit_travel.unsubscribe_all()
+        motor.high_limit_travel.unsubscribe_all()
+
+    for dotted, signal in _fake_signals(fake):
+        #enums have no strings here: keep values as written, so `set()` reads them back
+        string, signal.as_string = signal.as_string, False
+        plugin_type = getattr(signal.parent, "_plugin_type", None) if dotted.endswith(".plugin_type") else None
+        signal.sim_put(plugin_type or ("" if string else 0))
+        for pattern, value in {**FAKE_VALUES, **values}.items():
+            if fnmatch.fnmatchcase(dotted, pattern):
+                signal.sim_put(value)
+        for pattern, (low, high) in limits.items():
+            if fnmatch.fnmatchcase(dotted, pattern):
+                signal._metadata.update(lower_ctrl_limit = low, upper_ctrl_limit = high)
+        if dotted.rsplit(".", 1)[-1] in AUTO_RESET_ATTRS:
+            _auto_reset(signal)
+
+    for motor in motors:
+        motor.user_readback.alarm_severity = AlarmSeverity.NO_ALARM   #read when a move is done
+        motor.motor_done_move.sim_put(1)
+        _auto_move(motor)
+
+
+def _fake_config_cache(cache, fakes_by_real):
+    """Same `ConfigCache`, but over the fake copies of its devices."""
+
+    def fake_of(obj):
+        root = obj.root
+        if root not in fakes_by_real:
+            return None
+        if obj is root:
+            return fakes_by_real[root]
+        return getattr(fakes_by_real[root], obj.dotted_name)
+
+    return ConfigCache(
+        name = cache.name,
+        devices = [fake_of(device) for device in cache._devices if fake_of(device) is not None],
+        always_write = [fake_of(signal) for signal in cache._always_write if fake_of(signal) is not None],
+    )
+
+
+@contextmanager
+def _plan_globals(devices, plan_modules):
+    """Set `devices` (by name) as globals of `plan_modules`, restored on exit."""
+    missing = object()
+    saved = []
+    for module_name in plan_modules:
+        module = importlib.import_module(module_name)
+        for name, device in devices.items():
+            saved.append((module, name, vars(module).get(name, missing)))
+            setattr(module, name, device)
+    clear_motor_cache()
+    try:
+        yield devices
+    finally:
+        for module, name, original in reversed(saved):
+            if original is missing:
+                delattr(module, name)
+            else:
+                setattr(module, name, original)
+        clear_motor_cache()
+
+
+@contextmanager
+def fake_devices(device_modules, plan_modules, values = None, limits = None, classes = None, fly_values = None):
+    """
+    Context manager replacing the devices of `device_modules` with fakes
+    in the namespace of each of `plan_modules`, and adding fakes built
+    from `classes`. Yields the fakes by name; the real devices are put
+    back on exit.
+
+    PARAMETERS
+
+    device_modules *list of str* :
+        Modules defining the devices (e.g., "instrument.devices.s1id_FPGAs").
+        They are imported, so they must not contact IOCs when imported.
+
+    plan_modules *list of str* :
+        Modules whose globals are replaced (e.g., "instrument.plans.hardware_triggering").
+
+    values *dict or None* :
+        Initial values of fake signals by dotted name; glob patterns
+        allowed (e.g., "*_array.bb_value"). (default : None)
+
+    limits *dict or None* :
+        (low, high) control limits of fake signals by dotted name (e.g.,
+        the fly motor velocity, read as VBAS/VMAX). (default : None)
+
+    classes *dict or None* :
+        Devices made from their class instead, name -> dict(cls =
+        "module:Class", prefix = ..., kwargs = ...), for devices whose
+        modules contact IOCs when imported (scalers, area detectors).
+        `cls` may also name a function returning the class. (default : None)
+
+    fly_values *dict or None* :
+        Values written to fake signals (by dotted name, glob patterns
+        allowed) when a flyer starts flying, e.g. the IC and timestamp
+        arrays the IOC fills during a sweep. (default : None)
+    """
+
+    values = values or {}
+    limits = limits or {}
+    real = _real_devices(device_modules)
+
+    fakes = {}
+    fakes_by_real = {}
+    for name, obj in real.items():
+        try:
+            fake = _make_fake(obj)
+        except Exception as excuse:
+            logger.warning(f"No fake for {name}, using the real one: {excuse}")
+            continue
+        if fake is not obj:
+            _prepare_fake(fake, values, limits)
+        fakes[name] = fakes_by_real[obj] = fake
+
+    for name, fake in _class_devices(classes, fake = True).items():
+        _prepare_fake(fake, values, limits)
+        fakes[name] = fake
+
+    if fly_values:
+        _fill_when_flying(fakes, fly_values)
+
+    #caches of real devices would never match the fakes
+    for name, cache in _config_caches(device_modules).items():
+        fakes[name] = _fake_config_cache(cache, fakes_by_real)
+
+    with _plan_globals(fakes, plan_modules):
+        yield fakes
+
+
+class count_ca(object):
+    """
+    Context manager counting EPICS gets and puts (real and fake signals)
+    from all threads. Nested calls (e.g., `set()` calling `put()`) are
+    counted once.
+    """
+
+    #(class, method, signals counted); EPICS signals reach `Signal.put`
+    #only from ophyd itself (e.g., monitor updates), so there only fakes count
+    _patched = (
+        (Signal, "get", (FakeEpicsSignal,)), (Signal, "put", (FakeEpicsSignal,)),
+        (EpicsSignalBase, "get", (EpicsSignalBase,)), (EpicsSignal, "put", (EpicsSignalBase,)),
+        (FakeEpicsSignal, "get", (FakeEpicsSignal,)), (FakeEpicsSignal, "put", (FakeEpicsSignal,)),
+    )
+
+    def __init__(self):
+        self.gets = 0
+        self.puts = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._originals = []
+
+    def _wrap(self, original, kind, counted):
+        counter = self
+
+        def wrapper(signal, *args, **kwargs):
+            depth = getattr(counter._local, "depth", 0)
+            if depth == 0 and isinstance(signal, counted):
+                with counter._lock:
+                    setattr(counter, kind, getattr(counter, kind) + 1)
+            counter._local.depth = depth + 1
+            try:
+                return original(signal, *args, **kwargs)
+            finally:
+                counter._local.depth = depth
+
+        return wrapper
+
+    def __enter__(self):
+        for cls, method, counted in self._patched:
+            original = cls.__dict__.get(method)
+            if original is None:
+                continue
+            self._originals.append((cls, method, original))
+            setattr(cls, method, self._wrap(original, method + "s", counted))
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        for cls, method, original in reversed(self._originals):
+            setattr(cls, method, original)
+        self._originals = []
+        return False
+
+
+@contextmanager
+def _scratch_files():
+    """Keep benchmark runs out of the real phase metrics and checkpoints."""
+    with tempfile.TemporaryDirectory(prefix = "plan_benchmark_") as tmp:
+        tmp = pathlib.Path(tmp)
+        saved = iconfig.get("PHASE_METRICS_FILE"), fly_checkpoints.path, fly_checkpoints._records
+        iconfig["PHASE_METRICS_FILE"] = str(tmp / "phase_metrics.jsonl")
+        fly_checkpoints.path, fly_checkpoints._records = tmp / "fly_checkpoints.json", None
+        try:
+            yield tmp
+        finally:
+            if saved[0] is None:
+                iconfig.pop("PHASE_METRICS_FILE", None)
+            else:
+                iconfig["PHASE_METRICS_FILE"] = saved[0]
+            fly_checkpoints.path, fly_checkpoints._records = saved[1], saved[2]
+
+
+@contextmanager
+def _default_gaps(gaps):
+    """Readout gaps of the benchmark detectors (never calibrated), see `DEFAULT_GAPS`."""
+    saved = {name: DEFAULT_GAPS.get(name) for name in gaps or {}}
+    DEFAULT_GAPS.update(gaps or {})
+    try:
+        yield
+    finally:
+        for name, gap in saved.items():
+            if gap is None:
+                DEFAULT_GAPS.pop(name, None)
+            else:
+                DEFAULT_GAPS[name] = gap
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd = pathlib.Path(__file__).parent,
+            capture_output = True, text = True, timeout = 5,
+        ).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def run_benchmark(case, RE = None, fake = True):
+    """
+    Run one benchmark and return its result (dict, see module docstring).
+    Errors are caught and reported in the result ("status" : "error").
+
+    PARAMETERS
+
+    case *dict* :
+        One entry like those of `BENCHMARKS`.
+
+    RE *RunEngine or None* :
+        RunEngine to use; a private one if None. Do not pass the session
+        RunEngine, its callbacks would also receive the documents.
+        (default : None)
+
+    fake *bool* :
+        If True, run against fake devices; else the real devices (e.g.,
+        the simulation IOC). (default : True)
+    """
+
+    if RE is None:
+        RE = RunEngine({}, context_managers = [])
+
+    module_name, plan_name = case["plan"].split(":")
+    result = dict(
+        name = case["name"],
+        plan = plan_name,
+        fake = fake,
+        date = datetime.datetime.now().isoformat(timespec = "seconds"),
+        revision = _git_revision(),
+        status = "ok",
+    )
+
+    commands = {}
+    command_time = {}
+    last = dict(command = None, t = None)
+
+    def msg_hook(msg):
+        t = time.perf_counter()
+        if last["command"] is not None:
+            command_time[last["command"]] = command_time.get(last["command"], 0.0) + t - last["t"]
+        commands[msg.command] = commands.get(msg.command, 0) + 1
+        last.update(command = msg.command, t = t)
+
+    phases = {}
+    descriptors = set()
+
+    def phase_callback(name, doc):
+        if name == "descriptor" and doc.get("name") == "phase_timing":
+            descriptors.add(doc["uid"])
+        elif name == "event" and doc["descriptor"] in descriptors:
+            phases.update({key[len("phase_"):]: value for key, value in doc["data"].items()})
+
+    plan_modules = [module_name] + list(case.get("patch", ()))
+    token = RE.subscribe(phase_callback)
+    RE.msg_hook = msg_hook
+    try:
+        if fake:
+            devices = fake_devices(
+                case.get("devices", ()),
+                plan_modules,
+                values = case.get("values"),
+                limits = case.get("limits"),
+                classes = case.get("classes"),
+                fly_values = case.get("fly_values"),
+            )
+        else:
+            #session EPICS timeouts (ophyd's default connection timeout is 1 s)
+            importlib.import_module("..epics_signal_config", __package__)
+            real = _real_devices(case.get("devices", ()))
+            real.update(_config_caches(case.get("devices", ())))
+            real.update(_class_devices(case.get("classes"), fake = False))
+            devices = _plan_globals(real, plan_modules)
+
+        with _scratch_files(), _default_gaps(case.get("gaps")), devices as namespace, count_ca() as ca:
+            plan = getattr(importlib.import_module(module_name), plan_name)
+            kwargs = _resolve_kwargs(case, namespace)
+            t0 = time.perf_counter()
+            try:
+                RE(plan(*case.get("args", ()), **kwargs))
+            finally:
+                t1 = time.perf_counter()
+                if last["command"] is not None:
+                    command_time[last["command"]] = command_time.get(last["command"], 0.0) + t1 - last["t"]
+    except Exception as excuse:
+        logger.exception(f"Benchmark {case['name']} failed.")
+        result.update(status = "error", error = f"{type(excuse).__name__}: {excuse}")
+        return result
+    finally:
+        RE.msg_hook = None
+        RE.unsubscribe(token)
+
+    wall = t1 - t0
+    blocked = sum(command_time.get(command, 0.0) for command in BLOCKING_COMMANDS)
+    result.update(
+        messages = sum(commands.values()),
+        commands = commands,
+        command_time = command_time,
+        ca_gets = ca.gets,
+        ca_puts = ca.puts,
+        wall = wall,
+        blocked = blocked,
+        overhead = wall - blocked,
+        phases = phases,
+    )
+    return result
+
+
+def load_benchmark_history(name = None, path = None):
+    """
+    Past benchmark results, oldest first.
+
+    PARAMETERS
+
+    name *str or None* :
+        Only results of this benchmark. (default : None)
+
+    path *str or pathlib.Path or None* :
+        History file. If None, the configured default. (default : None)
+    """
+    path = pathlib.Path(path) if path else _get_history_path()
+    records = []
+    if not path.exists():
+        return records
+    with open(path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if name is None or record.get("name") == name:
+                records.append(record)
+    return records
+
+
+def _record(results, path = None):
+    path = pathlib.Path(path) if path else _get_history_path()
+    try:
+        path.parent.mkdir(parents = True, exist_ok = True)
+        with open(path, "a") as f:
+            for result in results:
+                f.write(json.dumps(result, default = str) + "\n")
+    except OSError as excuse:
+        logger.warning(f"Could not write benchmark history to {path}: {excuse}")
+
+
+def check_regressions(results, history = None, threshold = 0.2, window = 5, min_seconds = 0.05):
+    """
+    Compare `results` to the median of the last `window` good results of
+    the same benchmark. Returns a list of problems (str); empty if none.
+    Benchmarks that errored are problems too.
+
+    PARAMETERS
+
+    results *list of dict* :
+        From `run_benchmarks()`.
+
+    history *list of dict or None* :
+        Earlier results. If None, `load_benchmark_history()`. (default : None)
+
+    threshold *float* :
+        Allowed relative increase (0.2 = 20%). (default : 0.2)
+
+    window *int* :
+        Number of earlier results the baseline is taken from. (default : 5)
+
+    min_seconds *float* :
+        Increases of `overhead` smaller than this are ignored (timer
+        noise). (default : 0.05)
+    """
+
+    if history is None:
+        history = load_benchmark_history()
+
+    problems = []
+    for result in results:
+        if result["status"] != "ok":
+            problems.append(f"{result['name']}: {result.get('error')}")
+            continue
+        earlier = [
+            record for record in history
+            if record.get("name") == result["name"]
+            and record.get("fake") == result["fake"]
+            and record.get("status") == "ok"
+        ][-window:]
+        if not earlier:
+            continue
+        for metric in REGRESSION_METRICS:
+            baseline = statistics.median(record[metric] for record in earlier)
+            value = result[metric]
+            if baseline <= 0 or value <= baseline * (1 + threshold):
+                continue
+            if metric == "overhead" and value - baseline < min_seconds:
+                continue
+            problems.append(
+                f"{result['name']}: {metric} {value:.4g} vs. {baseline:.4g}"
+                f" (+{100*(value/baseline - 1):.0f}%, median of {len(earlier)})"
+            )
+    return problems
+
+
+def run_benchmarks(
+    names = None,
+    fake = True,
+    record = True,
+    threshold = 0.2,
+    window = 5,
+    history_file = None,
+    print_summary = True,
+):
+    """
+    Run benchmarks from `BENCHMARKS`, check them for regressions and
+    append them to the history. Returns (results, problems).
+
+    PARAMETERS
+
+    names *list of str or None* :
+        Benchmarks to run. If None, all. (default : None)
+
+    fake *bool* :
+        Fake devices (True) or the real ones (False). (default : True)
+
+    record *bool* :
+        If True, append the results to the history file. (default : True)
+
+    threshold *float* :
+        Allowed relative increase, see `check_regressions()`. (default : 0.2)
+
+    window *int* :
+        History depth of the baseline. (default : 5)
+
+    history_file *str or pathlib.Path or None* :
+        History file. If None, the configured default. (default : None)
+
+    print_summary *bool* :
+        If True, print a table and the problems. (default : True)
+    """
+
+    cases = [case for case in BENCHMARKS if names is None or case["name"] in names]
+    unknown = set(names or ()) - {case["name"] for case in cases}
+    if unknown:
+        raise KeyError(f"Unknown benchmarks: {sorted(unknown)}. Known: {[case['name'] for case in BENCHMARKS]}")
+
+    RE = RunEngine({}, context_managers = [])
+    results = [run_benchmark(case, RE = RE, fake = fake) for case in cases]
+
+    history = load_benchmark_history(path = history_file)
+    problems = check_regressions(results, history = history, threshold = threshold, window = window)
+    if record:
+        _record(results, path = history_file)
+
+    if print_summary:
+        table = pyRestTable.Table()
+        table.labels = ["benchmark", "status", "msgs", "puts", "gets", "wall (s)", "overhead (s)", "ms/msg"]
+        for result in results:
+            if result["status"] != "ok":
+                table.addRow([result["name"], result["status"]] + [""] * 6)
+                continue
+            per_msg = 1000 * result["overhead"]/result["messages"] if result["messages"] else 0
+            table.addRow([
+                result["name"], result["status"], result["messages"], result["ca_puts"], result["ca_gets"],
+                f"{result['wall']:.3f}", f"{result['overhead']:.3f}", f"{per_msg:.2f}",
+            ])
+        print(table)
+        for problem in problems:
+            print(f"REGRESSION: {problem}")
+
+    return results, problems
+
+
+def main(argv = None):
+    """Command line entry; returns 1 if a benchmark regressed or failed."""
+    parser = argparse.ArgumentParser(description = "Plan-overhead benchmarks.")
+    parser.add_argument("names", nargs = "*", help = "benchmarks to run (default: all)")
+    parser.add_argument("--threshold", type = float, default = 0.2, help = "allowed relative increase")
+    parser.add_argument("--window", type = int, default = 5, help = "history depth of the baseline")
+    parser.add_argument("--real", action = "store_true", help = "use real devices (e.g., the sim IOC)")
+    parser.add_argument("--no-record", action = "store_true", help = "do not append to the history")
+    parser.add_argument("--history", default = None, help = "history file")
+    args = parser.parse_args(argv)
+
+    results, problems = run_benchmarks(
+        names = args.names or None,
+        fake = not args.real,
+        record = not args.no_record,
+        threshold = args.threshold,
+        window = args.window,
+        history_file = args.history,
+    )
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,451 @@
+"""
+Dry-run duration estimator for a queue of plans.
+
+Like bluesky's `summarize_plan` (see `framework/initialize.py`), the
+plans are only iterated: every message is looked at and none is sent to
+the hardware. Moves, triggers, kickoffs and completes get an already
+finished status back (so plans that poll `status.done` go on), reads get
+None. Instead of printing the messages, each one is given an
+estimated duration from the fly-motion kinematics
+(`utils/fly_kinematics.py`), the detector gap registry
+(`utils/gap_registry.py`) and a few EPICS
+latencies, and the time is booked to a phase:
+
+    config      PV writes, staging
+    taxi        taxiing to the backoff position
+    fly         flying (PSO busy record or flyer kickoff/complete)
+    move        motor moves of step plans
+    acquire     detector/scaler exposures of step and software-triggered plans
+    readout     reads, event documents, flyer collect
+    file_close  unstaging area detectors (files closing)
+
+Values are read from devices (cached CA monitors) where a plan does so
+itself; values written earlier in the same plan are taken from the
+simulation.
+
+What plans do besides yielding messages stays out of the real state:
+the write-if-different caches (`ConfigCache.scratch()`), the fly
+checkpoints and the phase metrics file are replaced by scratch copies
+for the dry run, and plans that would touch the hardware directly check
+`in_dry_run()` and skip it (e.g., `enfly` darks). The scratch copies
+are per thread, so a plan running in the RunEngine meanwhile still
+writes to the real files.
+
+USAGE::
+
+    queue = [
+        (fastsweep, dict(start_pos=0, end_pos=360, nframes=3600, ...)),
+        dict(name="diode_align", kwargs=dict(diode_id="saxs_in_e")),
+    ]
+    estimate_queue(queue)
+"""
+
+__all__ = [
+    "DEFAULT_COSTS",
+    "PlanSimulator",
+    "estimate_queue",
+    "in_dry_run",
+]
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+logger.info(__file__)
+
+
+from bluesky.simulators import summarize_plan
+from contextlib import contextmanager
+from ophyd.status import StatusBase
+import numpy as np
+import pathlib
+import pyRestTable
+import tempfile
+import threading
+
+from .fly_checkpoint import fly_checkpoints
+from .fly_kinematics import motor_parameters
+from .fly_kinematics import move_time
+from .gap_registry import detector_gap
+from .phase_timer import metrics_scratch
+from ..devices.config_cache import ConfigCache
+
+
+PHASES = ("config", "taxi", "fly", "move", "acquire", "readout", "file_close")
+
+#seconds per message, measured roughly on the 1-ID network
+DEFAULT_COSTS = dict(
+    put = 0.005,        #one PV write incl. completion
+    read = 0.002,       #one device read
+    trigger = 0.01,     #trigger of a plain signal (e.g., .PROC)
+    event = 0.005,      #create/save of an event document
+    run = 0.05,         #open_run/close_run
+    collect_per_frame = 2e-5,   #flyer collect, per frame of the event page
+    file_close = 0.5,   #per area detector, closing files on unstage
+)
+
+#commands answered with a finished status (see `PlanSimulator.response()`)
+STATUS_COMMANDS = ("set", "trigger", "kickoff", "complete")
+
+#set while a plan is iterated by `PlanSimulator.run()`, per thread
+_dry_run = threading.local()
+
+
+def in_dry_run():
+    """
+    True while `PlanSimulator` iterates a plan in this thread. Plans check
+    it around anything they do to the hardware outside messages (direct
+    `stage()`, file reads), which a dry run must skip.
+    """
+    return getattr(_dry_run, "active", False)
+
+
+@contextmanager
+def _scratch_state():
+    """Dry runs write checkpoints, metrics and cached values to scratch only."""
+    with tempfile.TemporaryDirectory(prefix = "plan_simulator_") as tmp:
+        tmp = pathlib.Path(tmp)
+        _dry_run.active = True
+        try:
+            with ConfigCache.scratch(), metrics_scratch(tmp / "phase_metrics.jsonl"):
+                with fly_checkpoints.scratch(tmp / "fly_checkpoints.json"):
+                    yield tmp
+        finally:
+            _dry_run.active = False
+
+
+
+class PlanSimulator(object):
+    """
+    Iterates a plan without hardware and books estimated time per phase.
+
+    PARAMETERS
+
+    fly_motor *ophyd EpicsMotor or None* :
+        Motor driven by the PSO flyer in this plan (taxi/fly estimates).
+        (default : None)
+
+    costs *dict or None* :
+        Overrides for `DEFAULT_COSTS`. (default : None)
+
+    gaps *dict or None* :
+        Readout gaps by detector name, overriding `detector_gap()`.
+        (default : None)
+    """
+
+    def __init__(self, fly_motor = None, costs = None, gaps = None):
+        self.fly_motor = fly_motor
+        self.costs = dict(DEFAULT_COSTS, **(costs or {}))
+        self.gaps = dict(gaps or {})
+        self.reset()
+
+    def reset(self):
+        self.clock = 0.0
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self.num_messages = 0
+        self._state = {}        #object -> simulated value
+        self._pending = {}      #group -> [(finish time, phase)]
+        self._flying = {}       #flyer -> (finish time, nframes)
+
+    #---- simulated device state
+
+    def _value(self, signal, default = None):
+        """Simulated value of `signal`, else its (monitored) value."""
+        if signal in self._state:
+            return self._state[signal]
+        try:
+            return signal.get()
+        except Exception:
+            return default
+
+    def _position(self, motor):
+        if motor in self._state:
+            return self._state[motor]
+        try:
+            return motor.position
+        except Exception:
+            return 0.0
+
+    #---- bookkeeping
+
+    def _spend(self, seconds, phase):
+        """Time spent in the plan thread itself (not waited on)."""
+        self.clock += seconds
+        self.phases[phase] += seconds
+
+    def _start(self, group, seconds, phase):
+        """Start an action that finishes `seconds` from now."""
+        self._pending.setdefault(group, []).append((self.clock + seconds, phase))
+
+    def _wait(self, group):
+        statuses = self._pending.pop(group, [])
+        if not statuses:
+            return
+        finish, phase = max(statuses)
+        if finish > self.clock:
+            self.phases[phase] += finish - self.clock
+            self.clock = finish
+
+    #---- estimates
+
+    def _is_motor(self, obj):
+        return hasattr(obj, "user_setpoint") and hasattr(obj, "acceleration")
+
+    def _flyer_of(self, obj):
+        """The PSO flyer of a taxi/fly busy record (or the flyer itself)."""
+        parent = getattr(obj, "parent", None)
+        for candidate in (obj, parent):
+            if candidate is not None and hasattr(candidate, "start_position") and hasattr(candidate, "slew_speed"):
+                return candidate
+        return None
+
+    def _sweep(self, flyer):
+        """(start, end, speed, ramp distance, nframes) of the configured sweep."""
+        start = self._value(flyer.start_position, 0.0)
+        end = self._value(flyer.end_position, 0.0)
+        speed = self._value(flyer.slew_speed, 0.0) or 1.0
+        delta = self._value(flyer.scan_delta, 0.0)
+        nframes = int(round(abs(end - start)/delta)) if delta else 0
+        ramp = 0.0
+        if self.fly_motor is not None:
+            params = motor_parameters(self.fly_motor)
+            ramp = (speed + params.vbas)/2 * params.accl
+        return start, end, speed, ramp, nframes
+
+    def _taxi_time(self, flyer):
+        start, end, speed, ramp, _ = self._sweep(flyer)
+        if self.fly_motor is None:
+            return 0.0
+        params = motor_parameters(self.fly_motor)
+        backoff = start - np.sign(end - start) * ramp
+        distance = abs(backoff - self._position(self.fly_motor))
+        self._state[self.fly_motor] = backoff
+        taxi_speed = self._value(self.fly_motor.velocity, params.vmax) or params.vmax  #.VELO, scan speed once staged
+        return float(move_time(params, distance, taxi_speed))
+
+    def _fly_time(self, flyer):
+        start, end, speed, ramp, nframes = self._sweep(flyer)
+        accl = motor_parameters(self.fly_motor).accl if self.fly_motor is not None else 0.0
+        if self.fly_motor is not None:
+            self._state[self.fly_motor] = end + np.sign(end - start) * ramp
+        return 2 * accl + abs(end - start)/speed, nframes
+
+    def _move_time(self, motor, target):
+        try:
+            params = motor_parameters(motor)
+        except Exception:
+            return self.costs["put"]
+        speed = self._value(motor.velocity, params.vmax) or params.vmax
+        distance = abs(target - self._position(motor))
+        self._state[motor] = target
+        return float(move_time(params, distance, speed))
+
+    def _acquire_time(self, det):
+        cam = det.cam
+        num_images = self._value(cam.num_images, 1) or 1
+        period = self._value(cam.acquire_period, 0.0) or 0.0
+        exposure = self._value(cam.acquire_time, 0.0) or 0.0
+        if det.name in self.gaps:
+            gap = self.gaps[det.name]
+        else:
+            gap = detector_gap(det, default = 0.0)
+        period = max(period, exposure + gap)
+        return num_images * period
+
+    def _stage_sig_count(self, obj):
+        count = len(getattr(obj, "stage_sigs", {}))
+        for attr in getattr(obj, "_sub_devices", ()):
+            count += self._stage_sig_count(getattr(obj, attr))
+        return count
+
+    def _apply_stage_sigs(self, obj):
+        for key, value in getattr(obj, "stage_sigs", {}).items():
+            signal = getattr(obj, key, None) if isinstance(key, str) else key
+            if signal is not None:
+                self._state[signal] = value
+        for attr in getattr(obj, "_sub_devices", ()):
+            self._apply_stage_sigs(getattr(obj, attr))
+
+    #---- messages
+
+    def handle(self, msg):
+        """Book the estimated time of one message."""
+        self.num_messages += 1
+        command, obj = msg.command, msg.obj
+        group = msg.kwargs.get("group")
+        costs = self.costs
+
+        if command == "set":
+            target = msg.args[0] if msg.args else None
+            if self._is_motor(obj):
+                self._start(group, self._move_time(obj, target), "move")
+            else:
+                self._state[obj] = target
+                self._start(group, costs["put"], "config")
+
+        elif command == "trigger":
+            flyer = self._flyer_of(obj)
+            if flyer is not None and obj is getattr(flyer, "taxi", None):
+                self._start(group, self._taxi_time(flyer), "taxi")
+            elif flyer is not None and obj is getattr(flyer, "fly", None):
+                self._start(group, self._fly_time(flyer)[0], "fly")
+            elif hasattr(obj, "cam"):
+                self._start(group, self._acquire_time(obj), "acquire")
+            elif hasattr(obj, "preset_time"):
+                self._start(group, self._value(obj.preset_time, costs["trigger"]) or costs["trigger"], "acquire")
+            else:
+                self._start(group, costs["trigger"], "config")
+
+        elif command == "kickoff":
+            seconds, nframes = self._fly_time(obj)
+            self._flying[obj] = (self.clock + seconds, nframes)
+            self._start(group, 0.0, "fly")
+
+        elif command == "complete":
+            finish, _ = self._flying.get(obj, (self.clock, 0))
+            self._start(group, max(finish - self.clock, 0.0), "fly")
+
+        elif command == "collect":
+            _, nframes = self._flying.get(obj, (0, 0))
+            self._spend(costs["event"] + nframes * costs["collect_per_frame"], "readout")
+
+        elif command == "wait":
+            self._wait(group)
+
+        elif command == "sleep":
+            self._spend(msg.args[0], "acquire")
+
+        elif command == "stage":
+            self._apply_stage_sigs(obj)
+            self._spend(self._stage_sig_count(obj) * costs["put"], "config")
+
+        elif command == "unstage":
+            self._spend(self._stage_sig_count(obj) * costs["put"], "config")
+            if hasattr(obj, "cam"):
+                self._spend(costs["file_close"], "file_close")
+
+        elif command in ("read", "describe"):
+            self._spend(costs["read"], "readout")
+
+        elif command in ("create", "save", "drop"):
+            self._spend(costs["event"], "readout")
+
+        elif command in ("open_run", "close_run"):
+            self._spend(costs["run"], "readout")
+
+    def response(self, msg):
+        """
+        What the RunEngine would return for `msg`: a finished status for
+        moves, triggers and flyer kickoff/complete, else None (reads then
+        use their defaults, as with `summarize_plan`).
+        """
+        if msg.command in STATUS_COMMANDS:
+            status = StatusBase()
+            status.set_finished()
+            return status
+        return None
+
+    def run(self, plan):
+        """
+        Iterate `plan` (a generator) and return the estimated time per
+        phase, plus "total" and "messages". Runs against scratch caches,
+        checkpoints and metrics (see the module docstring).
+        """
+        self.reset()
+        with _scratch_state():
+            response = None
+            while True:
+                try:
+                    msg = plan.send(response)
+                except StopIteration:
+                    break
+                self.handle(msg)
+                response = self.response(msg)
+        for group in list(self._pending):
+            self._wait(group)
+
+        result = dict(self.phases)
+        result["total"] = self.clock
+        result["messages"] = self.num_messages
+        return result
+
+
+def _resolve(item, namespace):
+    """Return (name, plan function, args, kwargs) of a queue item."""
+    if isinstance(item, dict):
+        name = item["name"]
+        plan = namespace[name] if isinstance(name, str) else name
+        return getattr(plan, "__name__", str(name)), plan, item.get("args", ()), item.get("kwargs", {})
+    plan, kwargs = item
+    return plan.__name__, plan, (), kwargs
+
+
+def estimate_queue(
+    queue,
+    namespace = None,
+    costs = None,
+    gaps = None,
+    verbose = False,
+    print_summary = True,
+):
+    """
+    Estimate the wall time of a queue of plans without moving anything.
+
+    Returns a list with one dictionary per item (plan name and seconds per
+    phase, see `PlanSimulator`) and prints a table with the totals.
+
+    PARAMETERS
+
+    queue *list* :
+        Items as (plan function, kwargs) tuples, or as queueserver-style
+        dictionaries with "name", "args" and "kwargs".
+
+    namespace *dict or None* :
+        Where plan names are looked up. If None, the console namespace
+        (`__main__`). (default : None)
+
+    costs *dict or None* :
+        Overrides for `DEFAULT_COSTS`. (default : None)
+
+    gaps *dict or None* :
+        Readout gaps by detector name, overriding `detector_gap()`.
+        (default : None)
+
+    verbose *bool* :
+        If True, also print bluesky's `summarize_plan` for each item.
+        (default : False)
+
+    print_summary *bool* :
+        If True, print the table. (default : True)
+    """
+
+    if namespace is None:
+        import __main__
+        namespace = vars(__main__)
+
+    results = []
+    for item in queue:
+        name, plan, args, kwargs = _resolve(item, namespace)
+        if verbose:
+            print(f"---- {name} ----")
+            summarize_plan(plan(*args, **kwargs))
+
+        sim = PlanSimulator(fly_motor = kwargs.get("fly_motor"), costs = costs, gaps = gaps)
+        result = sim.run(plan(*args, **kwargs))
+        result["plan"] = name
+        results.append(result)
+
+    if print_summary:
+        table = pyRestTable.Table()
+        table.labels = ["plan"] + list(PHASES) + ["total (s)"]
+        for result in results:
+            table.addRow([result["plan"]] + [f"{result[phase]:.1f}" for phase in PHASES] + [f"{result['total']:.1f}"])
+        totals = {phase: sum(result[phase] for result in results) for phase in PHASES}
+        grand_total = sum(result["total"] for result in results)
+        table.addRow(["TOTAL"] + [f"{totals[phase]:.1f}" for phase in PHASES] + [f"{grand_total:.1f}"])
+        print(table)
+        if grand_total:
+            slowest = max(totals, key = totals.get)
+            print(f"Estimated queue time {grand_total/60:.1f} min; {slowest} dominates ({100*totals[slowest]/grand_total:.0f}%).")
+
+    return results
@@ -0,0 +1,254 @@
+"""
+Port graph of the plugins of an area detector built by `make_det()`.
+
+The `*_plugin_control` dictionaries in the detector modules wire each
+plugin's `nd_array_port` by hand. `plugin_graph()` reads the live port
+names, inputs, `enable` and `array_callbacks` of the cam and every plugin
+and links them, so the report shows what actually feeds what:
+
+- *idle* : enabled, but it is not a sink and feeds no plugin that leads
+  to one (by default only the file writers and image1 count as sinks; pva1
+  has no client count PV, so pass `sinks` with "pva1" if a viewer is
+  connected);
+- *no input* : enabled, but its source is disabled, missing or not passing
+  arrays on right now (e.g. cam callbacks off between scans).
+
+Each plugin's queue use and dropped arrays are listed too, to see which
+plugin limits the frame rate. `disable_idle_plugins()` switches the plugins
+that lead to no sink off through the detector's `custom_plugin_control`,
+so the `det.enable_plugins()` of fastsweep and cont_acq keeps them off;
+sinks, and plugins feeding them, are never disabled, even without input.
+
+USAGE::
+
+    show_plugin_graph(ge1)
+    idle_plugins(ge1)                               #['over1', 'pva1']
+    saved = yield from disable_idle_plugins(ge1)    #in a plan, before fastsweep
+    yield from restore_idle_plugins(ge1, saved)     #previous plugin control again
+"""
+
+__all__ = [
+    "PLUGIN_NAMES",
+    "SINK_PLUGINS",
+    "disable_idle_plugins",
+    "idle_plugins",
+    "plugin_graph",
+    "restore_idle_plugins",
+    "show_plugin_graph",
+]
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+logger.info(__file__)
+
+
+import pyRestTable
+
+from .plan_simulator import in_dry_run
+
+
+#plugin attributes of `MPEAreaDetector`, in data-flow order
+PLUGIN_NAMES = ("image1", "pva1", "proc1", "trans1", "over1", "roi1", "tiff1", "hdf1")
+
+#enabled leaves that are useful by themselves (files written, image shown)
+SINK_PLUGINS = ("tiff1", "hdf1", "image1")
+
+
+def _read(obj, attr, as_string = False):
+    """Value of `obj.attr`, or None if the signal is absent or unreadable."""
+    signal = getattr(obj, attr, None)
+    if signal is None:
+        return None
+    try:
+        return signal.get(as_string = True) if as_string else signal.get()
+    except Exception as excuse:
+        logger.debug(f"Could not read {signal.name}: {excuse}")
+        return None
+
+
+def _on(value):
+    """True for enabled enum values ("Enable", "Yes", 1)."""
+    if isinstance(value, str):
+        return value.strip().lower() in ("enable", "enabled", "yes", "1")
+    return bool(value)
+
+
+def plugin_graph(det, sinks = SINK_PLUGINS):
+    """
+    Read the live plugin wiring of `det` and return a dictionary of nodes
+    (cam first), keyed by attribute name. Each node is a dictionary with
+    the plugin's `port`, `source` (its `nd_array_port`), `enabled`,
+    `callbacks` (arrays passed on), `consumers` (enabled plugins reading
+    its port), queue `queue_size`, `queue_used` and `dropped` arrays,
+    `useful` (a sink or leading to one) and a `status` ("source",
+    "feeds ...", "sink", "idle", "no input", "disabled").
+
+    PARAMETERS
+
+    det *area detector object* :
+        Detector made with `make_det()`.
+
+    sinks *list of str* :
+        Plugins that are useful as leaves. (default : `SINK_PLUGINS`)
+    """
+    nodes = {}
+    nodes["cam"] = dict(
+        port = _read(det.cam, "port_name"),
+        source = None,
+        enabled = True,
+        callbacks = _on(_read(det.cam, "array_callbacks", as_string = True)),
+        queue_size = None,
+        queue_used = None,
+        dropped = None,
+    )
+    for name in PLUGIN_NAMES:
+        if name not in det.component_names:
+            continue
+        plugin = getattr(det, name)
+        queue_size = _read(plugin, "queue_size")
+        queue_free = _read(plugin, "queue_free")
+        nodes[name] = dict(
+            port = _read(plugin, "port_name"),
+            source = _read(plugin, "nd_array_port"),
+            enabled = _on(_read(plugin, "enable", as_string = True)),
+            callbacks = _on(_read(plugin, "array_callbacks", as_string = True)),
+            queue_size = queue_size,
+            queue_used = queue_size - queue_free if None not in (queue_size, queue_free) else None,
+            dropped = _read(plugin, "dropped_arrays"),
+        )
+
+    by_port = {node["port"]: name for name, node in nodes.items() if node["port"]}
+    for name, node in nodes.items():
+        node["consumers"] = [
+            other for other, o in nodes.items()
+            if o["enabled"] and o["source"] is not None and str(o["source"]).strip() == node["port"]
+        ]
+
+    #useful: a sink, or feeding a useful plugin (so proc1 -> over1 alone is idle too)
+    useful = {name for name, node in nodes.items() if node["enabled"] and name in sinks}
+    changed = True
+    while changed:
+        changed = False
+        for name, node in nodes.items():
+            if name not in useful and node["enabled"] and any(c in useful for c in node["consumers"]):
+                useful.add(name)
+                changed = True
+
+    for name, node in nodes.items():
+        node["useful"] = name in useful
+        upstream = nodes.get(by_port.get(str(node["source"]).strip())) if node["source"] is not None else None
+        if name == "cam":
+            node["status"] = "source"
+        elif not node["enabled"]:
+            node["status"] = "disabled"
+        elif upstream is None or not upstream["enabled"] or not upstream["callbacks"]:
+            node["status"] = "no input"
+        elif name not in useful:
+            node["status"] = "idle"
+        elif node["consumers"]:
+            node["status"] = "feeds " + ", ".join(node["consumers"])
+        else:
+            node["status"] = "sink"
+    return nodes
+
+
+def idle_plugins(det, sinks = SINK_PLUGINS, nodes = None):
+    """
+    Names of the enabled plugins of `det` that lead to no sink (see
+    `plugin_graph()`). Sinks and the plugins feeding them are not idle,
+    even while they get no input (e.g. cam callbacks off).
+    """
+    nodes = nodes if nodes is not None else plugin_graph(det, sinks = sinks)
+    return [
+        name for name, node in nodes.items()
+        if name != "cam" and node["enabled"] and not node["useful"] and name not in sinks
+    ]
+
+
+def show_plugin_graph(det, sinks = SINK_PLUGINS):
+    """
+    Print the plugin graph of `det` as a table, with queue use and dropped
+    arrays; plugins that dropped arrays or have a full queue are the ones
+    limiting the frame rate. Returns the nodes of `plugin_graph()`.
+    """
+    nodes = plugin_graph(det, sinks = sinks)
+    table = pyRestTable.Table()
+    table.labels = ["plugin", "port", "input", "enabled", "status", "queue", "dropped"]
+    for name, node in nodes.items():
+        queue = f"{node['queue_used']}/{node['queue_size']}" if node["queue_used"] is not None else ""
+        table.addRow([
+            name,
+            node["port"],
+            node["source"] or "",
+            node["enabled"],
+            node["status"],
+            queue,
+            node["dropped"] if node["dropped"] is not None else "",
+        ])
+    print(f"{det.name} plugin graph:")
+    print(table)
+
+    worst = max(
+        (name for name in nodes if nodes[name]["dropped"]),
+        key = lambda name: nodes[name]["dropped"],
+        default = None,
+    )
+    if worst is not None:
+        print(f"Most dropped arrays: {worst} ({nodes[worst]['dropped']}).")
+    return nodes
+
+
+def disable_idle_plugins(det, sinks = SINK_PLUGINS, keep = ()):
+    """
+    Plan stub: disable the idle plugins of `det` (see `idle_plugins()`).
+    They are set to "use_<plugin>": False in `det.custom_plugin_control`
+    and applied with `det.enable_plugins()`, so later `enable_plugins()`
+    calls (e.g. in fastsweep) keep them off. Returns the entries they
+    replaced ("use_<plugin>" -> previous value, None if there was none),
+    for `restore_idle_plugins()`. In a dry run the plugin control is left
+    as it is.
+
+    PARAMETERS
+
+    det *area detector object* :
+        Detector made with `make_det()`.
+
+    sinks *list of str* :
+        Plugins that are useful as leaves. (default : `SINK_PLUGINS`)
+
+    keep *list of str* :
+        Plugins never disabled, e.g. "pva1" while a viewer is open.
+        (default : ())
+    """
+    names = [name for name in idle_plugins(det, sinks = sinks) if name not in keep]
+    changes = {f"use_{name}": False for name in names}
+    saved = {key: det.custom_plugin_control.get(key) for key in changes}
+    if names:
+        logger.info(f"Disabling idle plugins of {det.name}: {', '.join(names)}.")
+        if in_dry_run():
+            yield from det.enable_plugins(custom_plugin_control = {**det.custom_plugin_control, **changes})
+        else:
+            det.custom_plugin_control.update(changes)
+            yield from det.enable_plugins()
+    return saved
+
+
+def restore_idle_plugins(det, saved):
+    """
+    Plan stub: put back the plugin control entries of `det` replaced by
+    `disable_idle_plugins()` (`saved`, as it returned them), removing the
+    ones that did not exist before, and apply them with
+    `det.enable_plugins()`. In a dry run the plugin control is left as it
+    is.
+    """
+    if saved:
+        logger.info(f"Restoring plugin control of {det.name}: {', '.join(saved)}.")
+        if not in_dry_run():
+            for key, value in saved.items():
+                if value is None:
+                    det.custom_plugin_control.pop(key, None)
+                else:
+                    det.custom_plugin_control[key] = value
+        yield from det.enable_plugins()